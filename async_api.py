@@ -0,0 +1,364 @@
+"""
+Asyncio facade for the social network backend
+Mirrors the functions in main.py as coroutines. The blocking database calls run on a
+dedicated thread pool, so they never block the event loop, and a semaphore caps how
+many of them are in flight at once.
+"""
+
+# Disabling some noisy linting for peewee _meta references
+# pylint: disable=E1101, W0212
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import AsyncIterator, Callable, Iterable
+
+from playhouse.pool import PooledDatabase
+
+import main
+from follows import FollowCollection
+from socialnetwork_model import UsersTable
+from user_status import PAGE_SIZE, SEARCH_LIMIT, UserStatus, UserStatusCollection
+from users import UserCollection, Users
+
+# Default number of worker threads, and of database calls allowed in flight
+MAX_WORKERS = 4
+
+
+class _LoadAbandoned(Exception):
+    """
+    Raised in the loader by its progress callback once the stream consumer is gone
+    """
+
+
+class AsyncSocialNetwork:
+    """
+    Runs UserCollection, UserStatusCollection and FollowCollection calls on a
+    dedicated executor
+    Use as an async context manager, or call aclose() when done
+    """
+
+    def __init__(
+        self,
+        user_collection: UserCollection | None = None,
+        status_collection: UserStatusCollection | None = None,
+        follow_collection: FollowCollection | None = None,
+        max_workers: int = MAX_WORKERS,
+        max_concurrency: int | None = None,
+    ):
+        self.user_collection = user_collection or main.init_user_collection()
+        self.status_collection = status_collection or main.init_status_collection()
+        self.follow_collection = follow_collection or main.init_follow_collection()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="socialnetwork-db"
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency or max_workers)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """
+        Waits for running calls to finish and shuts the executor down
+        """
+        await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self._executor.shutdown, wait=True)
+        )
+
+    async def _run(self, func: Callable, *args, **kwargs):
+        """
+        Runs a blocking call on the executor, waiting for a free slot first
+        """
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, functools.partial(_call, func, *args, **kwargs)
+            )
+
+    # Users
+
+    async def load_users(self, filename: str, **options) -> tuple[int, int]:
+        return await self._run(
+            main.load_users, filename, self.user_collection, **options
+        )
+
+    async def add_user(
+        self, user_id: str, email: str, user_name: str, user_last_name: str
+    ) -> bool:
+        return await self._run(
+            main.add_user,
+            user_id,
+            email,
+            user_name,
+            user_last_name,
+            self.user_collection,
+        )
+
+    async def update_user(
+        self, user_id: str, email: str, user_name: str, user_last_name: str
+    ) -> bool:
+        return await self._run(
+            main.update_user,
+            user_id,
+            email,
+            user_name,
+            user_last_name,
+            self.user_collection,
+        )
+
+    async def delete_user(self, user_id: str) -> bool:
+        return await self._run(main.delete_user, user_id, self.user_collection)
+
+    async def purge_users(self, user_ids: Iterable[str]) -> tuple[int, int]:
+        return await self._run(main.purge_users, list(user_ids), self.user_collection)
+
+    async def search_user(self, user_id: str, log: bool = False) -> Users:
+        return await self._run(main.search_user, user_id, log, self.user_collection)
+
+    # Statuses
+
+    async def load_status_updates(self, filename: str, **options) -> tuple[int, int]:
+        return await self._run(
+            main.load_status_updates, filename, self.status_collection, **options
+        )
+
+    async def add_status(self, status_id: str, user_id: str, status_text: str) -> bool:
+        return await self._run(
+            main.add_status,
+            status_id,
+            user_id,
+            status_text,
+            self.status_collection,
+            self.user_collection,
+        )
+
+    async def update_status(self, status_id: str, status_text: str) -> bool:
+        return await self._run(
+            main.update_status, status_id, status_text, self.status_collection
+        )
+
+    async def delete_status(self, status_id: str) -> bool:
+        return await self._run(main.delete_status, status_id, self.status_collection)
+
+    async def search_status(self, status_id: str, log: bool = False) -> UserStatus:
+        return await self._run(
+            main.search_status, status_id, log, self.status_collection
+        )
+
+    async def search_statuses(
+        self, query: str, limit: int = SEARCH_LIMIT
+    ) -> list[UserStatus]:
+        return await self._run(
+            main.search_statuses, query, limit, self.status_collection
+        )
+
+    async def get_user_statuses(
+        self, user_id: str, after: str | None = None, limit: int = PAGE_SIZE
+    ) -> list[UserStatus]:
+        return await self._run(
+            main.get_user_statuses, user_id, after, limit, self.status_collection
+        )
+
+    async def get_user_timeline(
+        self,
+        user_id: str,
+        before: tuple[datetime, str] | None = None,
+        limit: int = PAGE_SIZE,
+    ) -> list[UserStatus]:
+        return await self._run(
+            main.get_user_timeline, user_id, before, limit, self.status_collection
+        )
+
+    # Follows
+
+    async def load_follows(self, filename: str, **options) -> tuple[int, int]:
+        return await self._run(
+            main.load_follows, filename, self.follow_collection, **options
+        )
+
+    async def follow_user(self, follower: str, followee: str) -> bool:
+        return await self._run(
+            main.follow_user, follower, followee, self.follow_collection
+        )
+
+    async def unfollow_user(self, follower: str, followee: str) -> bool:
+        return await self._run(
+            main.unfollow_user, follower, followee, self.follow_collection
+        )
+
+    async def refresh_fanout(self) -> int:
+        return await self._run(main.refresh_fanout, self.follow_collection)
+
+    async def get_news_feed(
+        self,
+        user_id: str,
+        limit: int = PAGE_SIZE,
+        cursor: tuple[datetime, str] | None = None,
+    ) -> list[UserStatus]:
+        return await self._run(
+            main.get_news_feed, user_id, limit, cursor, self.follow_collection
+        )
+
+    # Exports
+
+    async def export_users(self, filename: str, **options) -> tuple[int, float] | None:
+        return await self._run(main.export_users, filename, **options)
+
+    async def export_status_updates(
+        self, filename: str, **options
+    ) -> tuple[int, float] | None:
+        return await self._run(main.export_status_updates, filename, **options)
+
+    # Batch variants, each batch runs as one executor call inside one transaction
+
+    async def add_users(self, users: Iterable[tuple[str, str, str, str]]) -> list[bool]:
+        """
+        Adds (user_id, email, user_name, user_last_name) tuples, one result per user
+        """
+        return await self._run(main.add_users, list(users), self.user_collection)
+
+    async def update_users(
+        self, users: Iterable[tuple[str, str, str, str]]
+    ) -> list[bool]:
+        """
+        Updates (user_id, email, user_name, user_last_name) tuples, one result per user
+        """
+        return await self._run(main.update_users, list(users), self.user_collection)
+
+    async def delete_users(self, user_ids: Iterable[str]) -> list[bool]:
+        """
+        Deletes users one by one in one transaction, one result per user_id
+        """
+        return await self._run(main.delete_users, list(user_ids), self.user_collection)
+
+    async def search_users(self, user_ids: Iterable[str]) -> list[Users]:
+        """
+        Searches several users in one executor call
+        """
+        return await self._run(
+            _each,
+            main.search_user,
+            [(user_id, False) for user_id in user_ids],
+            self.user_collection,
+        )
+
+    async def add_statuses(
+        self, statuses: Iterable[tuple[str, str, str]]
+    ) -> list[bool]:
+        """
+        Adds (status_id, user_id, status_text) tuples, one result per status
+        """
+        return await self._run(
+            main.add_statuses,
+            list(statuses),
+            self.status_collection,
+            self.user_collection,
+        )
+
+    async def update_statuses(self, statuses: Iterable[tuple[str, str]]) -> list[bool]:
+        """
+        Updates (status_id, status_text) tuples, one result per status
+        """
+        return await self._run(
+            main.update_statuses, list(statuses), self.status_collection
+        )
+
+    async def delete_statuses(self, status_ids: Iterable[str]) -> list[bool]:
+        """
+        Deletes statuses in one transaction, one result per status_id
+        """
+        return await self._run(
+            main.delete_statuses, list(status_ids), self.status_collection
+        )
+
+    async def search_status_ids(self, status_ids: Iterable[str]) -> list[UserStatus]:
+        """
+        Searches several statuses in one executor call
+        """
+        return await self._run(
+            _each,
+            main.search_status,
+            [(status_id, False) for status_id in status_ids],
+            self.status_collection,
+        )
+
+    # Streaming loaders
+
+    def iter_load_users(
+        self, filename: str, **options
+    ) -> AsyncIterator[tuple[int, int]]:
+        """
+        Loads users and yields the running (new_count, skipped_count) after every batch
+        """
+        return self._stream_load(
+            main.load_users, filename, self.user_collection, options
+        )
+
+    def iter_load_status_updates(
+        self, filename: str, **options
+    ) -> AsyncIterator[tuple[int, int]]:
+        """
+        Loads statuses and yields the running (new_count, skipped_count) after every batch
+        """
+        return self._stream_load(
+            main.load_status_updates, filename, self.status_collection, options
+        )
+
+    async def _stream_load(
+        self, loader: Callable, filename: str, collection, options: dict
+    ) -> AsyncIterator[tuple[int, int]]:
+        """
+        Runs a loader on the executor and relays its per-batch progress to the caller
+        If the caller stops early (breaks out or is cancelled), the loader is stopped
+        at its next batch, which rolls back whatever it had not committed, and is
+        awaited before the stream closes, so it never outlives the stream
+        """
+        loop = asyncio.get_running_loop()
+        progress = asyncio.Queue()
+        abandoned = threading.Event()
+
+        def report(new_count: int, skipped_count: int):
+            if abandoned.is_set():
+                raise _LoadAbandoned()
+            loop.call_soon_threadsafe(progress.put_nowait, (new_count, skipped_count))
+
+        load = asyncio.ensure_future(
+            self._run(loader, filename, collection, progress=report, **options)
+        )
+        load.add_done_callback(lambda _: progress.put_nowait(None))
+        try:
+            while (counts := await progress.get()) is not None:
+                yield counts
+        finally:
+            if not load.done():
+                abandoned.set()
+            # Re-raise any error from the loader
+            try:
+                await load
+            except _LoadAbandoned:
+                pass
+
+
+def _call(func: Callable, *args, **kwargs):
+    """
+    Runs func on a worker thread
+    A pooled connection goes back to the pool afterwards; other databases keep
+    their connection open for the life of the worker thread
+    """
+    database = UsersTable._meta.database
+    try:
+        return func(*args, **kwargs)
+    finally:
+        if isinstance(database, PooledDatabase) and not database.in_transaction():
+            database.close()
+
+
+def _each(func: Callable, arguments: Iterable[tuple], *collections) -> list:
+    """
+    Calls func once per argument tuple and returns the results in order
+    """
+    return [func(*args, *collections) for args in arguments]
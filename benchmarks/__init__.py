@@ -0,0 +1,4 @@
+"""
+Benchmarks for the social network backend
+Run each module with python -m benchmarks.<name> from the project root
+"""
@@ -0,0 +1,147 @@
+"""
+Measures news feed latency against the size of the follow graph
+Read side: a reader following k accounts gets a page of their feed merged on read
+(one timeline query per followed account, heap-merged) and from a precomputed feed
+(one index range of FeedTable); the crossover sets follows.FANOUT_MIN_FOLLOWING.
+Write side: a status of an account with n followers costs one FeedTable row per
+follower that has a precomputed feed, timed for growing n.
+
+Usage: python -m benchmarks.feed [--following 10 100 300 1000 3000]
+                                 [--followers 0 100 1000 10000] [--calls 200]
+"""
+
+# pylint: disable=E1101, E1120, W0212
+
+import argparse
+import os
+import tempfile
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from peewee import SqliteDatabase, chunked
+
+import database_utils
+from benchmarks.suite import time_calls
+from follows import FollowCollection
+from socialnetwork_model import (
+    FanoutTable,
+    FeedTable,
+    FollowsTable,
+    UsersTable,
+    UserStatusTable,
+)
+from user_status import UserStatusCollection
+
+FOLLOWING = (10, 100, 300, 1000, 3000)
+FOLLOWERS = (0, 100, 1000, 10_000)
+# Statuses per followed account and feed page size
+STATUSES_PER_ACCOUNT = 20
+PAGE = 20
+CALLS = 200
+MODELS = [UsersTable, UserStatusTable, FollowsTable, FanoutTable, FeedTable]
+
+
+def populate(authors: int, readers: int):
+    """
+    Adds authors with STATUSES_PER_ACCOUNT statuses each, and readers without any
+    The authors post in turn, so every feed interleaves all the accounts it follows
+    """
+    start = datetime(2026, 1, 1)
+    users = [(f"a{i}", "a@example.com", "A", "B") for i in range(authors)]
+    users += [(f"r{i}", "r@example.com", "R", "B") for i in range(readers)]
+    statuses = (
+        (
+            f"a{i}_{j}",
+            f"a{i}",
+            "status text",
+            start + timedelta(minutes=i + j * authors),
+        )
+        for i in range(authors)
+        for j in range(STATUSES_PER_ACCOUNT)
+    )
+    with UsersTable._meta.database.atomic():
+        UsersTable.insert_many(
+            users,
+            fields=[
+                UsersTable.user_id,
+                UsersTable.user_email,
+                UsersTable.user_name,
+                UsersTable.user_last_name,
+            ],
+        ).execute()
+        for chunk in chunked(statuses, 1000):
+            UserStatusTable.insert_many(
+                chunk,
+                fields=[
+                    UserStatusTable.status_id,
+                    UserStatusTable.user_id,
+                    UserStatusTable.status_text,
+                    UserStatusTable.created_at,
+                ],
+            ).execute()
+
+
+def read_side(follows: FollowCollection, following: list[int], calls: int):
+    """
+    Times a feed page of readers following each count of accounts, both ways
+    """
+    print(
+        f"{'following':>10}{'merged p50':>14}{'p95':>10}{'precomputed p50':>18}{'p95':>10}"
+    )
+    for index, count in enumerate(following):
+        reader = f"r{index}"
+        follows.bulk_add_follows((reader, f"a{i}") for i in range(count))
+        merged = time_calls(follows.get_news_feed, [(reader, PAGE)] * calls)
+        FanoutTable.insert(user_id=reader).execute()
+        precomputed = time_calls(follows.get_news_feed, [(reader, PAGE)] * calls)
+        print(
+            f"{count:>10}{merged['p50_ms']:>12.3f}ms{merged['p95_ms']:>8.3f}ms"
+            f"{precomputed['p50_ms']:>16.3f}ms{precomputed['p95_ms']:>8.3f}ms"
+        )
+
+
+def write_side(follows: FollowCollection, followers: list[int], calls: int):
+    """
+    Times adding statuses to accounts followed by each count of precomputed feeds
+    """
+    statuses = UserStatusCollection()
+    offset = len(FOLLOWING)
+    print(f"{'followers':>10}{'add_status p50':>16}{'p95':>10}")
+    for index, count in enumerate(followers):
+        author = f"a{index}"
+        readers = [f"r{offset + i}" for i in range(count)]
+        follows.bulk_add_follows((reader, author) for reader in readers)
+        FanoutTable.insert_many([(reader,) for reader in readers]).execute()
+        timings = time_calls(
+            statuses.add_status,
+            [(f"{author}_new{i}", author, "new status") for i in range(calls)],
+        )
+        print(f"{count:>10}{timings['p50_ms']:>14.3f}ms{timings['p95_ms']:>8.3f}ms")
+        FanoutTable.delete().where(FanoutTable.user_id.in_(readers)).execute()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--following", type=int, nargs="+", default=list(FOLLOWING))
+    parser.add_argument("--followers", type=int, nargs="+", default=list(FOLLOWERS))
+    parser.add_argument("--calls", type=int, default=CALLS)
+    args = parser.parse_args()
+
+    authors = max(*args.following, len(args.followers))
+    readers = len(args.following) + max(args.followers)
+    with tempfile.TemporaryDirectory() as directory:
+        database = SqliteDatabase(
+            os.path.join(directory, "feed.db"), pragmas={"foreign_keys": 1}
+        )
+        with database.bind_ctx(MODELS), patch("database_utils.logger"):
+            database_utils.ensure_tables(database)
+            populate(authors, readers)
+            follows = FollowCollection()
+            print(f"{authors} accounts with {STATUSES_PER_ACCOUNT} statuses each")
+            read_side(follows, args.following, args.calls)
+            write_side(follows, args.followers, args.calls)
+        database.close()
+
+
+if __name__ == "__main__":
+    main()
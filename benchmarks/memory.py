@@ -0,0 +1,129 @@
+"""
+Compares the memory used to materialize large result sets
+The model path builds a peewee model instance per row and copies it into a record
+with a per-instance __dict__ (how search results used to be built); the tuple path
+reads plain tuples into the slotted Users and UserStatus records
+
+Usage: python -m benchmarks.memory [--rows 1000000]
+"""
+
+# pylint: disable=W0212
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from peewee import SqliteDatabase
+
+from socialnetwork_model import UsersTable, UserStatusTable
+from user_status import UserStatusCollection
+from users import UserCollection
+
+ROWS = 1_000_000
+MODELS = [UsersTable, UserStatusTable]
+
+
+class DictUser:
+    """
+    Users record with a per-instance __dict__, for comparison
+    """
+
+    def __init__(self, user_id, email, user_name, user_last_name):
+        self.user_id = user_id
+        self.user_email = email
+        self.user_name = user_name
+        self.user_last_name = user_last_name
+
+
+class DictStatus:
+    """
+    UserStatus record with a per-instance __dict__, for comparison
+    """
+
+    def __init__(self, status_id, user_id, status_text):
+        self.status_id = status_id
+        self.user_id = user_id
+        self.status_text = status_text
+
+
+def users_from_models() -> list:
+    return [
+        DictUser(row.user_id, row.user_email, row.user_name, row.user_last_name)
+        for row in UsersTable.select()
+    ]
+
+
+def statuses_from_models() -> list:
+    # user_id_id is the raw column; row.user_id would add a query per row
+    return [
+        DictStatus(row.status_id, row.user_id_id, row.status_text)
+        for row in UserStatusTable.select()
+    ]
+
+
+def users_from_tuples() -> list:
+    return list(UserCollection().iter_users())
+
+
+def statuses_from_tuples() -> list:
+    return list(UserStatusCollection().iter_statuses())
+
+
+def populate(rows: int):
+    """
+    Fills the bound database with rows users and one status per user
+    """
+    users = UserCollection()
+    statuses = UserStatusCollection()
+    users.bulk_add_users(
+        (f"user{i:07d}", f"user{i}@example.com", "First", "Last") for i in range(rows)
+    )
+    statuses.bulk_add_statuses(
+        (f"status{i:07d}", f"user{i:07d}", f"Status text number {i}")
+        for i in range(rows)
+    )
+
+
+def measure(materialize) -> tuple[int, int, float]:
+    """
+    Returns the peak and retained bytes allocated by materialize, and its seconds
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = materialize()
+    seconds = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak, retained, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=ROWS)
+    args = parser.parse_args()
+
+    database = SqliteDatabase(":memory:")
+    with database.bind_ctx(MODELS):
+        database.create_tables(MODELS)
+        populate(args.rows)
+
+        print(f"{args.rows} rows")
+        print(f"{'path':<22}{'peak MiB':>10}{'retained MiB':>14}{'seconds':>9}")
+        for name, materialize in (
+            ("users via models", users_from_models),
+            ("users via tuples", users_from_tuples),
+            ("statuses via models", statuses_from_models),
+            ("statuses via tuples", statuses_from_tuples),
+        ):
+            peak, retained, seconds = measure(materialize)
+            print(
+                f"{name:<22}{peak / 2**20:>10.1f}{retained / 2**20:>14.1f}"
+                f"{seconds:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+Micro-benchmarks for the public functions in main.py
+Every operation runs against a :memory: and a file-backed database at each scale.
+Single-row operations are timed call by call and reported as ops/s with p50/p95/p99
+latencies; loads and exports are timed as one call and reported as rows/s.
+Results are saved as JSON, and --compare prints the change between two saved runs.
+
+Usage:
+    python -m benchmarks.suite [--scales 10000 100000 1000000] [--databases memory file]
+                               [--ops 1000] [--output results.json]
+    python -m benchmarks.suite --compare before.json after.json
+"""
+
+# pylint: disable=W0212
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Iterable
+
+from peewee import SQL, SqliteDatabase
+
+import database_utils
+import main
+from dataset_generator import WORDS, generate_statuses, generate_users
+from log_helper import LOG_FORMAT, is_business_record, logger
+from socialnetwork_model import (
+    FanoutTable,
+    FeedTable,
+    FollowsTable,
+    UsersTable,
+    UserStatusTable,
+)
+
+SCALES = (10_000, 100_000, 1_000_000)
+DATABASES = ("memory", "file")
+# Calls timed per single-row operation
+OPS = 1000
+SEED = 42
+MODELS = [UsersTable, UserStatusTable, FollowsTable, FanoutTable, FeedTable]
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    index = min(
+        len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1)
+    )
+    return sorted_values[index]
+
+
+def time_calls(func: Callable, arguments: Iterable[tuple]) -> dict:
+    """
+    Calls func once per argument tuple and summarizes the latencies
+    """
+    latencies = []
+    for args in arguments:
+        start = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        "count": len(latencies),
+        "seconds": total,
+        "ops_per_sec": len(latencies) / total if total else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def time_bulk(func: Callable, *args) -> dict:
+    """
+    Times one call that processes many rows; func returns its row count
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    rows = result[0] if isinstance(result, tuple) else result
+    return {
+        "count": rows,
+        "seconds": seconds,
+        "ops_per_sec": rows / seconds if seconds else 0.0,
+        "p50_ms": None,
+        "p95_ms": None,
+        "p99_ms": None,
+    }
+
+
+def write_dataset(directory: str, scale: int, seed: int) -> tuple[str, str]:
+    """
+    Writes scale users and scale Zipf-distributed statuses with dataset_generator
+    """
+    users_path = os.path.join(directory, "accounts.csv")
+    statuses_path = os.path.join(directory, "status_updates.csv")
+    generate_users(users_path, scale, seed)
+    generate_statuses(statuses_path, scale, scale, seed)
+    return users_path, statuses_path
+
+
+def sample_ids(model, rng: random.Random, count: int) -> list[str]:
+    """
+    Picks up to count primary keys by rowid, so the same dataset gives the same sample
+    """
+    max_rowid = model._meta.database.execute_sql(
+        f"SELECT max(rowid) FROM {model._meta.table_name}"
+    ).fetchone()[0]
+    rowids = rng.sample(range(1, max_rowid + 1), min(count, max_rowid))
+    key = model._meta.primary_key
+    query = model.select(key).where(SQL("rowid").in_(rowids))
+    return [row[0] for row in query.tuples()]
+
+
+def run_scale(
+    database: SqliteDatabase, directory: str, scale: int, ops: int, seed: int
+) -> dict:
+    """
+    Loads a dataset of the given scale into database and times every operation
+    Returns {operation: summary}
+    """
+    rng = random.Random(seed)
+    users_path, statuses_path = write_dataset(directory, scale, seed)
+    user_collection = main.init_user_collection()
+    status_collection = main.init_status_collection()
+    results = {}
+
+    with database.bind_ctx(MODELS):
+        database.connect(reuse_if_open=True)
+        database_utils.ensure_tables(database)
+
+        results["load_users"] = time_bulk(main.load_users, users_path, user_collection)
+        results["load_status_updates"] = time_bulk(
+            main.load_status_updates, statuses_path, status_collection
+        )
+
+        user_ids = sample_ids(UsersTable, rng, ops)
+        status_ids = sample_ids(UserStatusTable, rng, ops)
+        results["search_user"] = time_calls(
+            main.search_user,
+            [(user_id, False, user_collection) for user_id in user_ids],
+        )
+        results["search_status"] = time_calls(
+            main.search_status,
+            [(status_id, False, status_collection) for status_id in status_ids],
+        )
+        results["get_user_statuses"] = time_calls(
+            main.get_user_statuses,
+            [(user_id, None, 20, status_collection) for user_id in user_ids],
+        )
+        results["get_user_timeline"] = time_calls(
+            main.get_user_timeline,
+            [(user_id, None, 20, status_collection) for user_id in user_ids],
+        )
+        results["search_statuses"] = time_calls(
+            main.search_statuses,
+            [
+                (" ".join(rng.sample(WORDS, 2)), 20, status_collection)
+                for _ in range(ops)
+            ],
+        )
+
+        new_users = [f"bench_user{i}" for i in range(ops)]
+        new_statuses = [f"bench_status{i}" for i in range(ops)]
+        results["add_user"] = time_calls(
+            main.add_user,
+            [
+                (u, f"{u}@example.com", "New", "User", user_collection)
+                for u in new_users
+            ],
+        )
+        results["update_user"] = time_calls(
+            main.update_user,
+            [
+                (u, f"{u}@example.org", "Changed", "User", user_collection)
+                for u in new_users
+            ],
+        )
+        results["add_status"] = time_calls(
+            main.add_status,
+            [
+                (
+                    s,
+                    rng.choice(user_ids),
+                    "benchmark status",
+                    status_collection,
+                    user_collection,
+                )
+                for s in new_statuses
+            ],
+        )
+        results["update_status"] = time_calls(
+            main.update_status,
+            [(s, "benchmark status changed", status_collection) for s in new_statuses],
+        )
+        results["delete_status"] = time_calls(
+            main.delete_status, [(s, status_collection) for s in new_statuses]
+        )
+        results["delete_user"] = time_calls(
+            main.delete_user, [(u, user_collection) for u in new_users]
+        )
+
+        results["export_users"] = time_bulk(
+            main.export_users, os.path.join(directory, "export_users.csv")
+        )
+        results["export_status_updates"] = time_bulk(
+            main.export_status_updates, os.path.join(directory, "export_statuses.csv")
+        )
+        database.close()
+    return results
+
+
+def open_database(kind: str, directory: str) -> SqliteDatabase:
+    """
+    Returns a fresh database of the given kind with the main database's pragmas
+    """
+    path = ":memory:" if kind == "memory" else os.path.join(directory, "bench.db")
+    return SqliteDatabase(path, pragmas={"foreign_keys": 1})
+
+
+def run(scales: list[int], databases: list[str], ops: int, seed: int) -> dict:
+    """
+    Runs every scale against every database kind and returns the full report
+    """
+    report = {
+        "meta": {
+            "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "ops": ops,
+            "seed": seed,
+        },
+        "results": [],
+    }
+    for scale in scales:
+        for kind in databases:
+            with tempfile.TemporaryDirectory() as directory:
+                database = open_database(kind, directory)
+                print(f"{kind} database, {scale} rows", file=sys.stderr)
+                results = run_scale(database, directory, scale, ops, seed)
+            for operation, summary in results.items():
+                report["results"].append(
+                    {
+                        "database": kind,
+                        "scale": scale,
+                        "operation": operation,
+                        **summary,
+                    }
+                )
+                print(format_row(operation, summary), file=sys.stderr)
+    return report
+
+
+def format_row(operation: str, summary: dict) -> str:
+    """
+    One progress line for an operation
+    """
+    line = f"  {operation:<24}{summary['ops_per_sec']:>12.0f}/s"
+    if summary["p50_ms"] is not None:
+        line += (
+            f"  p50 {summary['p50_ms']:.3f}ms  p95 {summary['p95_ms']:.3f}ms"
+            f"  p99 {summary['p99_ms']:.3f}ms"
+        )
+    return line
+
+
+def compare(before_path: str, after_path: str):
+    """
+    Prints the throughput and p95 change of every operation found in both reports
+    """
+
+    def load(path):
+        with open(path, encoding="utf-8") as report_file:
+            report = json.load(report_file)
+        return {
+            (entry["database"], entry["scale"], entry["operation"]): entry
+            for entry in report["results"]
+        }
+
+    before, after = load(before_path), load(after_path)
+    print(
+        f"{'database':<8}{'scale':>9}  {'operation':<24}{'ops/s':>12}{'change':>9}{'p95':>10}"
+    )
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        change = (
+            (new["ops_per_sec"] / old["ops_per_sec"] - 1) * 100
+            if old["ops_per_sec"]
+            else 0.0
+        )
+        p95 = ""
+        if old["p95_ms"] and new["p95_ms"]:
+            p95 = f"{(new['p95_ms'] / old['p95_ms'] - 1) * 100:+.1f}%"
+        database, scale, operation = key
+        print(
+            f"{database:<8}{scale:>9}  {operation:<24}{new['ops_per_sec']:>12.0f}"
+            f"{change:>+8.1f}%{p95:>10}"
+        )
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scales", type=int, nargs="+", default=list(SCALES))
+    parser.add_argument(
+        "--databases", nargs="+", choices=DATABASES, default=list(DATABASES)
+    )
+    parser.add_argument("--ops", type=int, default=OPS)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    # Keep logging in the measured cost, but away from the project log file
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger.remove()
+        # Same sink options as the project log, see log_helper
+        logger.add(
+            os.path.join(log_dir, "bench.log"),
+            level="INFO",
+            format=LOG_FORMAT,
+            filter=is_business_record,
+            enqueue=True,
+        )
+        report = run(args.scales, args.databases, args.ops, args.seed)
+        logger.remove()
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(report, output, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,172 @@
+"""
+Bounded least-recently-used cache with a time to live
+Used as an optional read-through cache in front of the collection search methods
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+# Default number of entries kept and seconds each entry stays valid
+CACHE_MAX_SIZE = 10000
+CACHE_TTL = 300.0
+
+# Returned by get() when a key is not cached, since None is a cacheable value
+MISSING = object()
+
+# Number of invalidation counters keys are hashed onto; keys sharing a counter only
+# cost each other a skipped put, and the counters stay bounded however many keys
+# are invalidated
+GENERATION_SLOTS = 4096
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache whose entries expire ttl seconds after they are stored
+    Entries can carry a tag so every entry for the same owner can be dropped at once
+    A read-through takes generation(key) before reading the source and passes it to
+    put(), which skips the value if the key was invalidated in between, so a stale
+    read never lands in the cache after the write that made it stale
+    """
+
+    def __init__(
+        self,
+        max_size: int = CACHE_MAX_SIZE,
+        ttl: float | None = CACHE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (expires_at, tag, value), least recently used first
+        self._entries = OrderedDict()
+        # tag -> keys stored with that tag
+        self._tags = {}
+        # Bumped by invalidate() for the key's slot, and by invalidate_tag() and
+        # clear() as a whole, since those drop keys they cannot name in advance
+        self._generations = [0] * GENERATION_SLOTS
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Returns the cached value, or MISSING if the key is absent or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            expires_at, _, value = entry
+            if expires_at is not None and expires_at <= self._clock():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def generation(self, key: Hashable) -> tuple[int, int]:
+        """
+        Returns the token to pass to put() for a value read after this call
+        """
+        with self._lock:
+            return self._generation(key)
+
+    def put(
+        self,
+        key: Hashable,
+        value: Any,
+        tag: Hashable = None,
+        generation: tuple[int, int] | None = None,
+    ):
+        """
+        Stores a value, evicting the least recently used entry when full
+        With a generation from generation(), the value is dropped instead if the key
+        was invalidated since
+        """
+        expires_at = self._clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if generation is not None and generation != self._generation(key):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, tag, value)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        """
+        Drops a single entry
+        """
+        with self._lock:
+            self._generations[hash(key) % GENERATION_SLOTS] += 1
+            if key in self._entries:
+                self._remove(key)
+                self.invalidations += 1
+
+    def invalidate_tag(self, tag: Hashable):
+        """
+        Drops every entry stored with the tag
+        """
+        with self._lock:
+            self._epoch += 1
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        """
+        Drops every entry, keeping the statistics
+        """
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns hit, miss, eviction and size statistics for sizing the cache
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _generation(self, key: Hashable) -> tuple[int, int]:
+        """
+        Returns the current generation of a key, the lock must be held
+        """
+        return self._generations[hash(key) % GENERATION_SLOTS], self._epoch
+
+    def _remove(self, key: Hashable):
+        """
+        Removes an entry and its tag reference, the lock must be held
+        """
+        _, tag, _ = self._entries.pop(key)
+        if tag is not None:
+            keys = self._tags[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
@@ -0,0 +1,84 @@
+"""
+Checkpoint sidecar files for resumable imports
+After every committed batch the importer records the byte offset and row number
+it reached, so a rerun after a crash continues from there instead of starting over
+"""
+
+import hashlib
+import json
+import os
+
+from log_helper import logger
+
+# Bytes before the checkpoint offset that are hashed to detect a changed input file
+FINGERPRINT_BYTES = 4096
+
+
+class ImportCheckpoint:
+    """
+    Reads and writes the checkpoint sidecar of an import file
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.path = f"{filename}.checkpoint"
+
+    def _fingerprint(self, offset: int) -> str:
+        """
+        Hashes the bytes just before offset in the import file
+        """
+        start = max(0, offset - FINGERPRINT_BYTES)
+        with open(self.filename, mode="rb") as csvfile:
+            csvfile.seek(start)
+            return hashlib.sha1(csvfile.read(offset - start)).hexdigest()
+
+    def load(self) -> dict | None:
+        """
+        Returns the saved position and counts, or None if there is no usable checkpoint
+        A checkpoint whose file contents no longer match is ignored
+        """
+        try:
+            with open(self.path, mode="r", encoding="utf-8") as sidecar:
+                state = json.load(sidecar)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"Ignoring unreadable checkpoint '{self.path}': {e}")
+            return None
+
+        if state.get("fingerprint") != self._fingerprint(state.get("offset", 0)):
+            logger.error(
+                f"Ignoring checkpoint '{self.path}': '{self.filename}' has changed."
+            )
+            return None
+        logger.info(
+            f"Resuming import of '{self.filename}' after row {state['row']} "
+            f"(byte {state['offset']})."
+        )
+        return state
+
+    def save(self, offset: int, row: int, new_count: int, skipped_count: int):
+        """
+        Records the position after the last committed batch
+        """
+        state = {
+            "offset": offset,
+            "row": row,
+            "new_count": new_count,
+            "skipped_count": skipped_count,
+            "fingerprint": self._fingerprint(offset),
+        }
+        # Write to a temporary file and swap it in so a crash never leaves half a checkpoint
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, mode="w", encoding="utf-8") as sidecar:
+            json.dump(state, sidecar)
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        """
+        Removes the checkpoint once the import has finished
+        """
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
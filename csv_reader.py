@@ -0,0 +1,288 @@
+"""
+Reads import csv files in batches while tracking byte offsets
+The files are read in binary mode so the offset after every row is exact,
+which lets an interrupted import seek straight back to where it stopped
+Large files can also be split into byte ranges that start on record boundaries
+and parsed and validated by a pool of worker processes
+"""
+
+import csv
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from enum import Enum
+from typing import BinaryIO, Generator, Iterator
+
+from validation import RowValidator
+
+# Bytes of csv parsed by a worker process per task
+PARSE_RANGE_BYTES = 8 * 1024 * 1024
+# Bytes read at a time while scanning for record boundaries
+SCAN_CHUNK_BYTES = 1024 * 1024
+
+
+class RowBatch(list):
+    """
+    A list of row tuples plus the position in the file just after its last row
+    rejected holds the (row, reason) pairs that validation removed from the batch
+    """
+
+    def __init__(
+        self,
+        rows=(),
+        end_offset: int = 0,
+        end_row: int = 0,
+        rejected: list[tuple[tuple, str]] | None = None,
+    ):
+        super().__init__(rows)
+        self.end_offset = end_offset
+        self.end_row = end_row
+        self.rejected = rejected or []
+
+
+def validate_batch(batch: RowBatch, validator: RowValidator) -> RowBatch:
+    """
+    Returns the batch with its invalid rows moved to its rejected list
+    """
+    valid, invalid = validator.validate(batch)
+    if not invalid:
+        return batch
+    return RowBatch(valid, batch.end_offset, batch.end_row, invalid)
+
+
+class _LineReader:
+    """
+    Feeds decoded lines to csv.reader and counts the bytes consumed
+    csv.reader pulls exactly the lines of one record at a time, so after each
+    record the offset points at the start of the next one
+    """
+
+    def __init__(self, csvfile: BinaryIO, offset: int, end: int | None = None):
+        self._csvfile = csvfile
+        self.offset = offset
+        self.end = end
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if self.end is not None and self.offset >= self.end:
+            raise StopIteration
+        line = self._csvfile.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode("utf-8")
+
+
+def read_header(csvfile: BinaryIO) -> tuple[list[str], int]:
+    """
+    Returns the lowercased header names and the byte offset of the first data row
+    """
+    csvfile.seek(0)
+    lines = _LineReader(csvfile, 0)
+    header = next(csv.reader(lines), [])
+    return [name.lower() for name in header], lines.offset
+
+
+def _positions(header: list[str], fields: type[Enum]) -> list[int | None]:
+    """
+    Returns the csv column of every field, None for fields missing from the header
+    """
+    # Use the fields enum for mapping csv columns to data model columns
+    return [
+        header.index(field.value) if field.value in header else None for field in fields
+    ]
+
+
+def _parse(
+    lines: _LineReader,
+    positions: list[int | None],
+    batch_size: int,
+    row_number: int,
+) -> Iterator[RowBatch]:
+    """
+    Yields batches of row tuples from lines
+    """
+    batch = RowBatch()
+    for record in csv.reader(lines):
+        # Skip blank lines the same way csv.DictReader does
+        if not record:
+            continue
+        row_number += 1
+
+        values = tuple(
+            record[i] if i is not None and i < len(record) else None for i in positions
+        )
+        batch.append(values)
+
+        if len(batch) >= batch_size:
+            batch.end_offset = lines.offset
+            batch.end_row = row_number
+            yield batch
+            batch = RowBatch()
+
+    if batch:
+        batch.end_offset = lines.offset
+        batch.end_row = row_number
+        yield batch
+
+
+def read_batches(
+    csvfile: BinaryIO,
+    fields: type[Enum],
+    batch_size: int,
+    offset: int = 0,
+    row_number: int = 0,
+) -> Iterator[RowBatch]:
+    """
+    Yields batches of row tuples ordered like the fields enum
+    Values are not checked here; a column missing from the header or from a short
+    row reads as None
+    Reading starts at offset (after the header when 0); row_number is the number
+    of data rows before that offset
+    """
+    header, header_end = read_header(csvfile)
+    offset = max(offset, header_end)
+    csvfile.seek(offset)
+    yield from _parse(
+        _LineReader(csvfile, offset),
+        _positions(header, fields),
+        batch_size,
+        row_number,
+    )
+
+
+def _record_starts(csvfile: BinaryIO, start: int, targets: Iterator[int]) -> list[int]:
+    """
+    Returns the start of the first record after each target offset, reading from
+    start (which must itself be a record start)
+    A newline ends a record only outside a quoted field, which is exactly when an
+    even number of quote characters come before it since an escaped quote is
+    written twice, so counting quotes in large chunks finds the boundaries without
+    parsing the file
+    """
+    starts = []
+    target = next(targets, None)
+    csvfile.seek(start)
+    position = start
+    quoted = 0
+    while target is not None:
+        chunk = csvfile.read(SCAN_CHUNK_BYTES)
+        if not chunk:
+            break
+        index = 0
+        while target is not None:
+            newline = chunk.find(b"\n", max(index, target - position))
+            if newline == -1:
+                break
+            quoted ^= chunk.count(b'"', index, newline) & 1
+            index = newline + 1
+            if not quoted:
+                starts.append(position + index)
+                while target is not None and target <= position + index:
+                    target = next(targets, None)
+        quoted ^= chunk.count(b'"', index) & 1
+        position += len(chunk)
+    return starts
+
+
+def split_ranges(
+    csvfile: BinaryIO, start: int, range_bytes: int = PARSE_RANGE_BYTES
+) -> list[tuple[int, int]]:
+    """
+    Splits the file from start to its end into (start, end) byte ranges of about
+    range_bytes, each beginning and ending on a record boundary
+    Quoted fields spanning several lines are never split
+    """
+    size = csvfile.seek(0, os.SEEK_END)
+    targets = iter(range(start + range_bytes, size, range_bytes))
+    bounds = [start, *_record_starts(csvfile, start, targets), size]
+    return [(first, last) for first, last in zip(bounds, bounds[1:]) if first < last]
+
+
+def _parse_range(
+    filename: str,
+    positions: list[int | None],
+    batch_size: int,
+    start: int,
+    end: int,
+    validator: RowValidator | None,
+) -> list[RowBatch]:
+    """
+    Worker process body: parses one byte range into batches, validated by validator
+    when one is given
+    end_row of every batch is counted from the start of the range
+    """
+    with open(filename, mode="rb") as csvfile:
+        csvfile.seek(start)
+        lines = _LineReader(csvfile, start, end)
+        batches = _parse(lines, positions, batch_size, 0)
+        if validator is None:
+            return list(batches)
+        return [validate_batch(batch, validator) for batch in batches]
+
+
+def _collect(future: Future, row_number: int) -> Generator[RowBatch, None, int]:
+    """
+    Yields the batches of a parsed range with absolute row numbers
+    Returns the number of data rows read up to the end of the range
+    """
+    batches = future.result()
+    for batch in batches:
+        batch.end_row += row_number
+        yield batch
+    return batches[-1].end_row if batches else row_number
+
+
+def read_batches_parallel(
+    filename: str,
+    fields: type[Enum],
+    batch_size: int,
+    offset: int = 0,
+    row_number: int = 0,
+    workers: int | None = None,
+    range_bytes: int | None = None,
+    validator: RowValidator | None = None,
+) -> Iterator[RowBatch]:
+    """
+    Yields the same batches as read_batches, parsed by a pool of worker processes
+    The file is split into ranges of about range_bytes on record boundaries, and
+    every worker parses whole ranges; batches come back in file order, and at most
+    two parsed ranges per worker wait to be consumed, so memory stays bounded
+    With a validator the workers also validate every batch, as validate_batch does,
+    so both CPU-bound stages run in parallel
+    workers defaults to the number of CPUs, range_bytes to PARSE_RANGE_BYTES
+    """
+    with open(filename, mode="rb") as csvfile:
+        header, header_end = read_header(csvfile)
+        ranges = split_ranges(
+            csvfile, max(offset, header_end), range_bytes or PARSE_RANGE_BYTES
+        )
+    if not ranges:
+        return
+    positions = _positions(header, fields)
+    workers = min(workers or os.cpu_count() or 1, len(ranges))
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = deque()
+        for start, end in ranges:
+            pending.append(
+                pool.submit(
+                    _parse_range,
+                    filename,
+                    positions,
+                    batch_size,
+                    start,
+                    end,
+                    validator,
+                )
+            )
+            if len(pending) >= 2 * workers:
+                row_number = yield from _collect(pending.popleft(), row_number)
+        while pending:
+            row_number = yield from _collect(pending.popleft(), row_number)
+    finally:
+        # An import stopped early should not wait for ranges nobody will read
+        pool.shutdown(wait=True, cancel_futures=True)
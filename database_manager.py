@@ -2,20 +2,350 @@
 Handles database connection state.
 Peewee uses lazy initialization to automatically open a database connection but does not automatically close the connection.
 The database manager uses explicit open/close actions for cleaner context management.
+The main database is pooled: each thread checks out its own connection and close_db returns it to the pool.
 """
 
-from peewee import SqliteDatabase
+import heapq
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from peewee import Database, QueryEvent, SqliteDatabase
+from playhouse.pool import MaxConnectionsExceeded, PooledSqliteDatabase
+
+from log_helper import LOG_FORMAT, logger, query_log_path, slow_query_log_path
+
+# SQLite caps the number of bound parameters in a single statement (32766 since 3.32)
+SQLITE_MAX_VARIABLES = 32766
+
+# Connection pool settings for the main database
+POOL_MAX_CONNECTIONS = 8
+# Seconds a thread waits for a free connection before giving up
+POOL_WAIT_TIMEOUT = 10
+# Seconds a connection may sit unused in the pool before it is closed
+POOL_IDLE_TIMEOUT = 60
+# Seconds after which a connection is recycled no matter how it is used
+POOL_STALE_TIMEOUT = 600
+
+# Statements taking longer than this many seconds go to the slow-query log
+SLOW_QUERY_SECONDS = 0.05
+# Longest statement text written to the query logs, bulk inserts can be huge
+TRACE_SQL_CHARS = 500
+# Slow queries kept in memory by a QueryTracer
+SLOW_QUERY_HISTORY = 100
+# Only these statements have a query plan worth explaining
+EXPLAINABLE = re.compile(r"^\s*(SELECT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+# A plan step reading a whole table, as opposed to SCAN ... USING [COVERING] INDEX
+# or a scan of a virtual table such as the full-text index
+FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(?!.*\b(USING|VIRTUAL TABLE)\b)")
+
+
+class MeteredPooledSqliteDatabase(PooledSqliteDatabase):
+    """
+    SQLite connection pool with idle timeouts and checkout metrics
+    Peewee keeps connection state per thread, so every thread checks out its own
+    connection and the models can share one database object across a thread pool
+    A connection returned by one thread may be checked out by another, so sqlite3's
+    same-thread check is turned off; a connection is still only used by one thread
+    at a time
+    """
+
+    def __init__(self, database, idle_timeout: float | None = None, **kwargs):
+        kwargs.setdefault("check_same_thread", False)
+        self._idle_timeout = idle_timeout
+        # Time each pooled connection was last returned, keyed like the pool itself
+        self._returned_at = {}
+        self._waiting = threading.local()
+        self._metrics_lock = threading.Lock()
+        self.metrics = {"checkouts": 0, "waits": 0, "wait_seconds": 0.0, "recycled": 0}
+        super().__init__(database, **kwargs)
+
+    def connect(self, reuse_if_open=False):
+        self._waiting.waited = False
+        start = time.monotonic()
+        try:
+            return super().connect(reuse_if_open)
+        finally:
+            # Only checkouts that found the pool full count as waits
+            if self._waiting.waited:
+                with self._metrics_lock:
+                    self.metrics["waits"] += 1
+                    self.metrics["wait_seconds"] += time.monotonic() - start
+
+    def _connect(self):
+        with self._pool_lock:
+            self._close_idle_expired()
+            try:
+                conn = super()._connect()
+            except MaxConnectionsExceeded:
+                self._waiting.waited = True
+                raise
+            self._returned_at.pop(self.conn_key(conn), None)
+            with self._metrics_lock:
+                self.metrics["checkouts"] += 1
+            return conn
+
+    def _close(self, conn, close_conn=False):
+        with self._pool_lock:
+            super()._close(conn, close_conn)
+            # Remember when the connection went back to the pool, unless it was closed
+            if any(entry[2] is conn for entry in self._connections):
+                self._returned_at[self.conn_key(conn)] = time.time()
+
+    def _is_stale(self, timestamp):
+        stale = super()._is_stale(timestamp)
+        if stale:
+            with self._metrics_lock:
+                self.metrics["recycled"] += 1
+        return stale
+
+    def _close_idle_expired(self):
+        """
+        Closes pooled connections that have been unused for longer than the idle timeout
+        """
+        if not self._idle_timeout:
+            return
+        cutoff = time.time() - self._idle_timeout
+        keep = []
+        for entry in self._connections:
+            key = self.conn_key(entry[2])
+            if self._returned_at.get(key, cutoff) < cutoff:
+                self._returned_at.pop(key, None)
+                self._close_raw(entry[2])
+                with self._metrics_lock:
+                    self.metrics["recycled"] += 1
+            else:
+                keep.append(entry)
+        if len(keep) != len(self._connections):
+            heapq.heapify(keep)
+            self._connections = keep
+
+    def pool_stats(self) -> dict:
+        """
+        Returns the pool metrics plus the current number of in-use and idle connections
+        """
+        with self._pool_lock:
+            in_use = len(self._in_use)
+            idle = len(self._connections)
+        with self._metrics_lock:
+            return {**self.metrics, "in_use": in_use, "idle": idle}
+
+
+class QueryTracer:
+    """
+    Opt-in SQL tracer built on peewee's query hooks
+    Logs every statement with its duration to the query log, and statements slower
+    than slow_seconds to the slow-query log together with their EXPLAIN QUERY PLAN,
+    flagging plans that scan a whole table
+    The duration covers executing the statement up to its first row; rows fetched
+    later by the caller are not included
+    Use as a context manager, or call attach() and detach()
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        slow_seconds: float = SLOW_QUERY_SECONDS,
+        log_statements: bool = True,
+        explain: bool = True,
+        query_log: str = query_log_path,
+        slow_query_log: str = slow_query_log_path,
+    ):
+        self.database = database
+        self.slow_seconds = slow_seconds
+        self.log_statements = log_statements
+        self.explain = explain
+        self.query_log = query_log
+        self.slow_query_log = slow_query_log
+        self.statements = 0
+        self.total_seconds = 0.0
+        self.slow_statements = 0
+        self.slow_queries = deque(maxlen=SLOW_QUERY_HISTORY)
+        self._plans = {}
+        self._lock = threading.Lock()
+        self._sink_ids = []
+        self._logger = logger.bind(channel="sql")
+        self._slow_logger = logger.bind(channel="slow_sql")
+
+    def __enter__(self):
+        self.attach()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.detach()
+
+    def attach(self):
+        """
+        Starts tracing every statement run through the database
+        """
+        if self in self.database.query_hooks:
+            return
+        if self.log_statements:
+            self._sink_ids.append(
+                logger.add(
+                    self.query_log,
+                    format=LOG_FORMAT,
+                    filter=lambda record: record["extra"].get("channel") == "sql",
+                )
+            )
+        self._sink_ids.append(
+            logger.add(
+                self.slow_query_log,
+                format=LOG_FORMAT,
+                filter=lambda record: record["extra"].get("channel") == "slow_sql",
+            )
+        )
+        self.database.query_hooks.append(self)
+
+    def detach(self):
+        """
+        Stops tracing and closes the trace logs
+        """
+        if self in self.database.query_hooks:
+            self.database.query_hooks.remove(self)
+        for sink_id in self._sink_ids:
+            logger.remove(sink_id)
+        self._sink_ids = []
+
+    def __call__(self, event: QueryEvent):
+        with self._lock:
+            self.statements += 1
+            self.total_seconds += event.duration
+        sql = (
+            event.sql
+            if len(event.sql) <= TRACE_SQL_CHARS
+            else (f"{event.sql[:TRACE_SQL_CHARS]}... ({len(event.sql)} chars)")
+        )
+        params = len(event.params or ())
+        failed = f" failed: {event.exception}" if event.exception else ""
+        if self.log_statements:
+            self._logger.info(
+                f"{event.duration * 1000:.3f}ms {sql} [{params} params]{failed}"
+            )
+        if event.duration < self.slow_seconds:
+            return
+        with self._lock:
+            self.slow_statements += 1
+
+        plan = self._explain(event) if self.explain else []
+        full_scan = any(FULL_SCAN.match(step) for step in plan)
+        self.slow_queries.append(
+            {
+                "sql": event.sql,
+                "seconds": event.duration,
+                "plan": plan,
+                "full_scan": full_scan,
+            }
+        )
+        message = f"{event.duration * 1000:.3f}ms {sql} [{params} params]{failed}"
+        if full_scan:
+            message += " FULL TABLE SCAN"
+        if plan:
+            message += "\n    " + "\n    ".join(plan)
+        self._slow_logger.warning(message)
+
+    def _explain(self, event: QueryEvent) -> list[str]:
+        """
+        Returns the EXPLAIN QUERY PLAN steps of a statement, cached by statement text
+        """
+        if event.exception or not EXPLAINABLE.match(event.sql):
+            return []
+        with self._lock:
+            plan = self._plans.get(event.sql)
+        if plan is not None:
+            return plan
+        try:
+            # A raw cursor, so the EXPLAIN itself is not traced
+            cursor = self.database.cursor()
+            cursor.execute(f"EXPLAIN QUERY PLAN {event.sql}", event.params or ())
+            plan = [row[-1] for row in cursor.fetchall()]
+        except Exception as e:  # pylint: disable=broad-except
+            plan = [f"EXPLAIN QUERY PLAN failed: {e}"]
+        with self._lock:
+            self._plans[event.sql] = plan
+        return plan
+
+    def stats(self) -> dict:
+        """
+        Returns the number and total time of traced statements, and the slow count
+        """
+        with self._lock:
+            return {
+                "statements": self.statements,
+                "total_seconds": self.total_seconds,
+                "slow": self.slow_statements,
+            }
+
+
+def pooled_db(filename: str) -> MeteredPooledSqliteDatabase:
+    """
+    Returns a connection pool over a database file, configured like the main database
+    SQLite does not enable foreign keys by default
+    """
+    return MeteredPooledSqliteDatabase(
+        filename,
+        pragmas={"foreign_keys": 1},
+        # Pooled connections move between threads, see MeteredPooledSqliteDatabase
+        check_same_thread=False,
+        max_connections=POOL_MAX_CONNECTIONS,
+        timeout=POOL_WAIT_TIMEOUT,
+        idle_timeout=POOL_IDLE_TIMEOUT,
+        stale_timeout=POOL_STALE_TIMEOUT,
+    )
 
-from log_helper import logger
 
 # Define the database
 # peewee will automatically create the database the first time a connection is made
-# SQLite does not enable foreign keys by default
-db = SqliteDatabase("socialnetwork.db", pragmas={"foreign_keys": 1})
+db = pooled_db("socialnetwork.db")
 
 # Create an in-memory testing database
 temp_db = SqliteDatabase(":memory:", pragmas={"foreign_keys": 1})
 
+# Named sets of performance pragmas that can be applied to an open connection
+# synchronous: 0 = OFF, 1 = NORMAL, 2 = FULL, 3 = EXTRA
+# cache_size: negative values are KiB, positive values are pages
+# temp_store: 0 = DEFAULT (file), 2 = MEMORY
+PRAGMA_PROFILES = {
+    # SQLite's own defaults, with peewee's default 5 second busy timeout
+    "default": {
+        "journal_mode": "delete",
+        "synchronous": 2,
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": 0,
+        "busy_timeout": 5000,
+    },
+    # Large imports: favor write throughput, a crash may lose the import in progress
+    "bulk_load": {
+        "journal_mode": "wal",
+        "synchronous": 0,
+        "cache_size": -262144,
+        "mmap_size": 268435456,
+        "temp_store": 2,
+        "busy_timeout": 30000,
+    },
+    # Mostly reads: big page cache and memory mapping, readers never block the writer
+    "read_heavy": {
+        "journal_mode": "wal",
+        "synchronous": 1,
+        "cache_size": -131072,
+        "mmap_size": 1073741824,
+        "temp_store": 2,
+        "busy_timeout": 5000,
+    },
+    # Every commit is synced to disk before it returns
+    "durable": {
+        "journal_mode": "wal",
+        "synchronous": 3,
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": 0,
+        "busy_timeout": 10000,
+    },
+}
+
 
 def open_db(database: SqliteDatabase):
     """
@@ -33,3 +363,41 @@ def close_db(database: SqliteDatabase):
     if not database.is_closed():
         database.close()
         logger.info("Database connection closed.")
+
+
+def get_pragmas(database: SqliteDatabase) -> dict:
+    """
+    Returns the current value of every pragma covered by the profiles
+    """
+    return {key: database.pragma(key) for key in PRAGMA_PROFILES["default"]}
+
+
+def apply_profile(database: SqliteDatabase, profile: str | dict):
+    """
+    Applies a named profile (or a dictionary of pragmas) to the current connection
+    Must be called outside of a transaction, SQLite ignores journal_mode and
+    rejects synchronous changes inside one
+    """
+    pragmas = PRAGMA_PROFILES[profile] if isinstance(profile, str) else profile
+    for key, value in pragmas.items():
+        database.pragma(key, value)
+
+
+@contextmanager
+def bulk_load_profile(database: SqliteDatabase):
+    """
+    Switches the current connection to the bulk_load profile and restores
+    the previous pragmas afterwards
+    """
+    if database.in_transaction():
+        # The profile cannot be switched inside a transaction, run with the current one
+        logger.info("Bulk load profile skipped: a transaction is already open.")
+        yield
+        return
+
+    previous = get_pragmas(database)
+    apply_profile(database, "bulk_load")
+    try:
+        yield
+    finally:
+        apply_profile(database, previous)
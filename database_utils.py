@@ -2,13 +2,113 @@
 Handles database state
 """
 
-from peewee import SqliteDatabase
+from contextlib import contextmanager
+
+from peewee import IntegrityError, SqliteDatabase
+from playhouse.migrate import SqliteMigrator, migrate
 
 # Disabling some noisy linting for peewee _meta references
 # pylint: disable=W0212, E1101
 
 from log_helper import logger
-from socialnetwork_model import BaseModel
+from socialnetwork_model import (
+    BaseModel,
+    FanoutTable,
+    FeedTable,
+    FollowsTable,
+    UserStatusTable,
+)
+
+# Version of the schema built by ensure_tables, recorded in PRAGMA user_version
+# Bump it whenever a model, index or the full-text index changes, so existing
+# databases are verified and upgraded on their next start
+SCHEMA_VERSION = 4
+
+# FTS5 index over UserStatusTable.status_text, stored as an external content table
+# so the text is not duplicated; the triggers below keep it in sync with the table
+STATUS_TABLE = UserStatusTable._meta.table_name
+STATUS_SEARCH_TABLE = f"{STATUS_TABLE}_fts"
+STATUS_SEARCH_TRIGGERS = {
+    f"{STATUS_SEARCH_TABLE}_insert": f"""
+        AFTER INSERT ON {STATUS_TABLE} BEGIN
+            INSERT INTO {STATUS_SEARCH_TABLE} (rowid, status_text)
+            VALUES (new.rowid, new.status_text);
+        END""",
+    f"{STATUS_SEARCH_TABLE}_delete": f"""
+        AFTER DELETE ON {STATUS_TABLE} BEGIN
+            INSERT INTO {STATUS_SEARCH_TABLE} ({STATUS_SEARCH_TABLE}, rowid, status_text)
+            VALUES ('delete', old.rowid, old.status_text);
+        END""",
+    f"{STATUS_SEARCH_TABLE}_update": f"""
+        AFTER UPDATE OF status_text ON {STATUS_TABLE} BEGIN
+            INSERT INTO {STATUS_SEARCH_TABLE} ({STATUS_SEARCH_TABLE}, rowid, status_text)
+            VALUES ('delete', old.rowid, old.status_text);
+            INSERT INTO {STATUS_SEARCH_TABLE} (rowid, status_text)
+            VALUES (new.rowid, new.status_text);
+        END""",
+}
+
+# The trigger that indexes each new status, suspended during bulk inserts
+STATUS_SEARCH_INSERT_TRIGGER = f"{STATUS_SEARCH_TABLE}_insert"
+
+# Bulk inserts of fewer statuses than this keep the per-row triggers; larger ones
+# suspend the insert triggers and index only the new rows in one INSERT ... SELECT,
+# so the cost follows the size of the import and not of the table
+DEFER_SEARCH_MIN_ROWS = 1_000
+
+
+# Precomputed news feeds of the users in FanoutTable, kept in sync by these triggers
+# when statuses are added, follows change or a user is added to or removed from
+# FanoutTable; deleted statuses and users leave the feeds through their foreign keys
+FEED_TABLE = FeedTable._meta.table_name
+FOLLOWS_TABLE = FollowsTable._meta.table_name
+FANOUT_TABLE = FanoutTable._meta.table_name
+FEED_TRIGGERS = {
+    f"{FEED_TABLE}_status_insert": f"""
+        AFTER INSERT ON {STATUS_TABLE} BEGIN
+            INSERT OR IGNORE INTO {FEED_TABLE} (user_id, status_id, created_at)
+            SELECT f.follower, new.status_id, new.created_at
+            FROM {FOLLOWS_TABLE} AS f
+            JOIN {FANOUT_TABLE} AS o ON o.user_id = f.follower
+            WHERE f.followee = new.user_id;
+        END""",
+    f"{FEED_TABLE}_follow_insert": f"""
+        AFTER INSERT ON {FOLLOWS_TABLE}
+        WHEN EXISTS (SELECT 1 FROM {FANOUT_TABLE} WHERE user_id = new.follower) BEGIN
+            INSERT OR IGNORE INTO {FEED_TABLE} (user_id, status_id, created_at)
+            SELECT new.follower, s.status_id, s.created_at
+            FROM {STATUS_TABLE} AS s WHERE s.user_id = new.followee;
+        END""",
+    f"{FEED_TABLE}_follow_delete": f"""
+        AFTER DELETE ON {FOLLOWS_TABLE}
+        WHEN EXISTS (SELECT 1 FROM {FANOUT_TABLE} WHERE user_id = old.follower) BEGIN
+            DELETE FROM {FEED_TABLE} WHERE user_id = old.follower AND status_id IN (
+                SELECT status_id FROM {STATUS_TABLE} WHERE user_id = old.followee
+            );
+        END""",
+    f"{FEED_TABLE}_fanout_insert": f"""
+        AFTER INSERT ON {FANOUT_TABLE} BEGIN
+            INSERT OR IGNORE INTO {FEED_TABLE} (user_id, status_id, created_at)
+            SELECT new.user_id, s.status_id, s.created_at
+            FROM {FOLLOWS_TABLE} AS f
+            JOIN {STATUS_TABLE} AS s ON s.user_id = f.followee
+            WHERE f.follower = new.user_id;
+        END""",
+    f"{FEED_TABLE}_fanout_delete": f"""
+        AFTER DELETE ON {FANOUT_TABLE} BEGIN
+            DELETE FROM {FEED_TABLE} WHERE user_id = old.user_id;
+        END""",
+}
+
+# The feed trigger that fires once per new status, suspended with the index triggers
+STATUS_FEED_TRIGGER = f"{FEED_TABLE}_status_insert"
+
+
+def is_unique_violation(error: IntegrityError) -> bool:
+    """
+    Returns True if an IntegrityError comes from a primary key or unique conflict
+    """
+    return "UNIQUE constraint failed" in str(error)
 
 
 def current_tables(database: SqliteDatabase):
@@ -18,9 +118,25 @@ def current_tables(database: SqliteDatabase):
     return database.get_tables()
 
 
+def current_indexes(database: SqliteDatabase, table_name: str) -> set[str]:
+    """
+    Returns the names of the existing indexes on a table
+    """
+    return {index.name for index in database.get_indexes(table_name)}
+
+
+def current_columns(database: SqliteDatabase, table_name: str) -> set[str]:
+    """
+    Returns the names of the existing columns of a table
+    """
+    return {column.name for column in database.get_columns(table_name)}
+
+
 def ensure_tables(database: SqliteDatabase):
     """
-    Ensures tables exist
+    Ensures tables, their columns and their indexes exist
+    Columns added to a model after its table was created must be nullable or have
+    a default, since existing rows get no value
     """
 
     # Collect all existing tables
@@ -44,6 +160,218 @@ def ensure_tables(database: SqliteDatabase):
     else:
         logger.info("All required tables already exist.")
 
+    # Tables created by an older version of the models may be missing newer columns
+    migrator = SqliteMigrator(database)
+    columns_added = []
+    for model in models:
+        if model in tables_to_create:
+            continue
+        existing_columns = current_columns(database, model._meta.table_name)
+        for field in model._meta.sorted_fields:
+            if field.column_name not in existing_columns:
+                migrate(
+                    migrator.add_column(
+                        model._meta.table_name, field.column_name, field
+                    )
+                )
+                columns_added.append(f"{model._meta.table_name}.{field.column_name}")
+    if columns_added:
+        logger.info(f"Added columns: {columns_added}")
+
+    # ... and newer indexes
+    indexes_created = []
+    for model in models:
+        if model in tables_to_create:
+            continue
+        existing_indexes = current_indexes(database, model._meta.table_name)
+        model._schema.create_indexes(safe=True)
+        indexes_created.extend(
+            current_indexes(database, model._meta.table_name) - existing_indexes
+        )
+    if indexes_created:
+        logger.info(f"Created indexes: {sorted(indexes_created)}")
+
+    ensure_status_search(database)
+    ensure_feed_triggers(database)
+    database.pragma("user_version", SCHEMA_VERSION)
+
+
+def schema_version(database: SqliteDatabase) -> int:
+    """
+    Returns the schema version recorded in the database, 0 if it was never verified
+    """
+    return database.pragma("user_version")
+
+
+def ensure_schema(database: SqliteDatabase) -> bool:
+    """
+    Runs ensure_tables unless the database already records the current schema version
+    Reading the version is a single pragma, while ensure_tables inspects every table,
+    index and trigger
+    Returns True if ensure_tables ran
+    """
+    if schema_version(database) == SCHEMA_VERSION:
+        logger.info(f"Schema version {SCHEMA_VERSION} already verified.")
+        return False
+    ensure_tables(database)
+    return True
+
+
+def current_triggers(database: SqliteDatabase) -> set[str]:
+    """
+    Returns the names of the existing triggers in the database
+    """
+    cursor = database.execute_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+    )
+    return {name for (name,) in cursor.fetchall()}
+
+
+def ensure_status_search(database: SqliteDatabase):
+    """
+    Ensures the status full-text index and its sync triggers exist
+    The index is rebuilt in one pass whenever it or any trigger had to be created,
+    since statuses written without the triggers are missing from it
+    """
+    missing_triggers = set(STATUS_SEARCH_TRIGGERS) - current_triggers(database)
+    if STATUS_SEARCH_TABLE in current_tables(database) and not missing_triggers:
+        return
+
+    with database.atomic():
+        database.execute_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {STATUS_SEARCH_TABLE} USING fts5("
+            f"status_text, content='{STATUS_TABLE}', content_rowid='rowid')"
+        )
+        _create_status_search_triggers(database)
+        rebuild_status_search(database)
+    logger.info(f"Built full-text index '{STATUS_SEARCH_TABLE}'.")
+
+
+def rebuild_status_search(database: SqliteDatabase):
+    """
+    Rebuilds the status full-text index from the current contents of the table
+    """
+    database.execute_sql(
+        f"INSERT INTO {STATUS_SEARCH_TABLE} ({STATUS_SEARCH_TABLE}) VALUES ('rebuild')"
+    )
+
+
+def index_new_statuses(database: SqliteDatabase, after_rowid: int):
+    """
+    Adds the statuses with a rowid above after_rowid to the full-text index
+    in one set-based INSERT, for statuses written while the insert trigger was off
+    """
+    database.execute_sql(
+        f"INSERT INTO {STATUS_SEARCH_TABLE} (rowid, status_text) "
+        f"SELECT rowid, status_text FROM {STATUS_TABLE} WHERE rowid > ?",
+        (after_rowid,),
+    )
+
+
+def _create_status_search_triggers(database: SqliteDatabase):
+    """
+    Creates the triggers that keep the status full-text index in sync
+    """
+    for name, body in STATUS_SEARCH_TRIGGERS.items():
+        database.execute_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+def ensure_feed_triggers(database: SqliteDatabase):
+    """
+    Ensures the triggers that maintain the precomputed news feeds exist
+    The feeds are rebuilt whenever a trigger had to be created, since writes made
+    without it are missing from them
+    """
+    missing_triggers = set(FEED_TRIGGERS) - current_triggers(database)
+    if not missing_triggers:
+        return
+
+    with database.atomic():
+        for name, body in FEED_TRIGGERS.items():
+            database.execute_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+        rebuild_feeds(database)
+    logger.info(f"Created feed triggers: {sorted(missing_triggers)}")
+
+
+def rebuild_feeds(database: SqliteDatabase):
+    """
+    Rebuilds the precomputed news feeds of every user in FanoutTable
+    """
+    database.execute_sql(f"DELETE FROM {FEED_TABLE}")
+    fill_feeds(database)
+
+
+def fill_feeds(database: SqliteDatabase, after_rowid: int = 0):
+    """
+    Adds the statuses with a rowid above after_rowid to the precomputed news feeds
+    in one set-based INSERT, for statuses written while the feed trigger was off
+    """
+    database.execute_sql(
+        f"INSERT OR IGNORE INTO {FEED_TABLE} (user_id, status_id, created_at) "
+        f"SELECT f.follower, s.status_id, s.created_at FROM {FANOUT_TABLE} AS o "
+        f"JOIN {FOLLOWS_TABLE} AS f ON f.follower = o.user_id "
+        f"JOIN {STATUS_TABLE} AS s ON s.user_id = f.followee "
+        f"WHERE s.rowid > ?",
+        (after_rowid,),
+    )
+
+
+@contextmanager
+def deferred_status_search(
+    database: SqliteDatabase, min_rows: int = DEFER_SEARCH_MIN_ROWS
+):
+    """
+    Suspends the per-row insert triggers of the full-text index and the news feeds
+    for a bulk insert into UserStatusTable
+    The rows inserted meanwhile, found by their rowid above the largest one before
+    the triggers were dropped, are then indexed and fanned out with one INSERT each;
+    the update and delete triggers stay in place
+    Yields a function the writer calls with the number of rows it is about to write;
+    the triggers are only dropped once min_rows rows were reported, so smaller
+    writes are handled row by row
+    The schema version reads 0 while the triggers are gone, so if the process dies
+    before they are back the next ensure_schema repairs them
+    Does nothing if the database has no full-text index
+    """
+    if STATUS_SEARCH_TABLE not in current_tables(database):
+        yield lambda rows: None
+        return
+
+    version = schema_version(database)
+    feed_trigger = STATUS_FEED_TRIGGER in current_triggers(database)
+    reported = 0
+    deferred = False
+    last_rowid = 0
+
+    def add_rows(rows: int):
+        nonlocal reported, deferred, last_rowid
+        reported += rows
+        if deferred or reported < min_rows:
+            return
+        database.pragma("user_version", 0)
+        database.execute_sql(f"DROP TRIGGER IF EXISTS {STATUS_SEARCH_INSERT_TRIGGER}")
+        if feed_trigger:
+            database.execute_sql(f"DROP TRIGGER IF EXISTS {STATUS_FEED_TRIGGER}")
+        cursor = database.execute_sql(f"SELECT MAX(rowid) FROM {STATUS_TABLE}")
+        last_rowid = cursor.fetchone()[0] or 0
+        deferred = True
+
+    add_rows(0)
+    try:
+        yield add_rows
+    finally:
+        if deferred:
+            with database.atomic():
+                index_new_statuses(database, last_rowid)
+                _create_status_search_triggers(database)
+                if feed_trigger:
+                    fill_feeds(database, last_rowid)
+                    database.execute_sql(
+                        f"CREATE TRIGGER IF NOT EXISTS {STATUS_FEED_TRIGGER} "
+                        f"{FEED_TRIGGERS[STATUS_FEED_TRIGGER]}"
+                    )
+                database.pragma("user_version", version)
+
 
 def drop_tables(database: SqliteDatabase):
     """
@@ -62,7 +390,10 @@ def drop_tables(database: SqliteDatabase):
     ]
 
     if models_to_drop:
+        # The full-text index reads from UserStatusTable, so it goes first
+        database.execute_sql(f"DROP TABLE IF EXISTS {STATUS_SEARCH_TABLE}")
         database.drop_tables(models_to_drop, safe=True)
+        database.pragma("user_version", 0)
         logger.info(
             f"Dropped tables: {[model._meta.table_name for model in models_to_drop]}"
         )
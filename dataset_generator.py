@@ -0,0 +1,246 @@
+"""
+Generates large synthetic accounts and status update csv files for stress testing
+Output is deterministic for a given seed and uses the same columns as accounts.csv and
+status_updates.csv. Statuses per user follow a Zipf distribution, so a few users post
+most of the statuses. Duplicate rows, rows with a missing field and statuses for
+unknown users can be injected at configurable rates. Rows are written as they are
+generated, so memory use stays constant for any number of rows.
+
+Usage: python dataset_generator.py --users 1000000 --statuses 10000000 [--seed 1]
+           [--zipf 1.1] [--duplicates 0.01] [--missing 0.001] [--orphans 0.001]
+           [--output-dir .]
+"""
+
+import argparse
+import csv
+import math
+import os
+import random
+import time
+from collections import deque
+
+FIRST_NAMES = (
+    "Ada Alan Ana Ben Brittaney Carla Chen Dara Eli Emma Farah Gus Hana Ivan Isabel "
+    "Jon Keri Lena Marco Nia Omar Pia Quinn Raj Sara Tom Uma Vic Wen Yara Zoe"
+).split()
+LAST_NAMES = (
+    "Avivah Baker Cruz Diaz Evans Fox Gentry Hart Ito Jones Kim Lopez Moss Nunez "
+    "Olsen Park Quist Royce Stone Tran Usman Vega Wolfe Xu Young Zola"
+).split()
+DOMAINS = ("goodmail.com", "funmail.com", "example.com", "mailbox.org")
+# Words the status texts are built from
+WORDS = (
+    "coffee morning sunset travel music garden rain city book friend weekend "
+    "project dinner movie ocean mountain river train coding bread happy thinkable "
+    "existence hug aback sky cooing fireman withstand grotesque year"
+).split()
+STATUS_WORDS = 5
+
+USER_HEADER = ["USER_ID", "NAME", "LASTNAME", "EMAIL"]
+STATUS_HEADER = ["STATUS_ID", "USER_ID", "STATUS_TEXT"]
+
+# Recently written rows that a duplicate is copied from
+DUPLICATE_WINDOW = 1000
+
+
+class ZipfSampler:
+    """
+    Draws ranks 1..n with probability proportional to 1 / rank**exponent
+    Uses rejection-inversion sampling, so it needs no table of n probabilities
+    (Hormann and Derflinger, "Rejection-inversion to generate variates from
+    monotone discrete distributions", 1996)
+    """
+
+    def __init__(self, n: int, exponent: float, rng: random.Random):
+        if n < 1 or exponent <= 0:
+            raise ValueError("Zipf sampling needs n >= 1 and exponent > 0")
+        self.n = n
+        self.exponent = exponent
+        self._rng = rng
+        self._h_integral_x1 = self._h_integral(1.5) - 1.0
+        self._h_integral_n = self._h_integral(n + 0.5)
+        self._s = 2.0 - self._h_integral_inverse(self._h_integral(2.5) - self._h(2.0))
+
+    def sample(self) -> int:
+        while True:
+            u = self._h_integral_n + self._rng.random() * (
+                self._h_integral_x1 - self._h_integral_n
+            )
+            x = self._h_integral_inverse(u)
+            k = min(self.n, max(1, int(x + 0.5)))
+            if k - x <= self._s or u >= self._h_integral(k + 0.5) - self._h(k):
+                return k
+
+    def _h(self, x: float) -> float:
+        return math.exp(-self.exponent * math.log(x))
+
+    def _h_integral(self, x: float) -> float:
+        log_x = math.log(x)
+        return _expm1_ratio((1.0 - self.exponent) * log_x) * log_x
+
+    def _h_integral_inverse(self, x: float) -> float:
+        t = max(-1.0, x * (1.0 - self.exponent))
+        return math.exp(_log1p_ratio(t) * x)
+
+
+def _log1p_ratio(x: float) -> float:
+    """
+    log1p(x) / x, accurate near 0
+    """
+    if abs(x) > 1e-8:
+        return math.log1p(x) / x
+    return 1.0 - x * (0.5 - x * (1.0 / 3.0 - 0.25 * x))
+
+
+def _expm1_ratio(x: float) -> float:
+    """
+    expm1(x) / x, accurate near 0
+    """
+    if abs(x) > 1e-8:
+        return math.expm1(x) / x
+    return 1.0 + x * 0.5 * (1.0 + x / 3.0 * (1.0 + 0.25 * x))
+
+
+def user_row(index: int, seed: int) -> list[str]:
+    """
+    The accounts row of the index-th user, computed without any stored state
+    """
+    mixed = (index * 2654435761 + seed) & 0xFFFFFFFF
+    first = FIRST_NAMES[mixed % len(FIRST_NAMES)]
+    last = LAST_NAMES[(mixed >> 8) % len(LAST_NAMES)]
+    user_id = f"{first}.{last}{index}"
+    return [user_id, first, last, f"{user_id}@{DOMAINS[(mixed >> 16) % len(DOMAINS)]}"]
+
+
+def _rank_to_index(users: int, seed: int):
+    """
+    Returns a function mapping Zipf ranks onto user indexes
+    An affine bijection scatters the heaviest posters across the user file
+    """
+    multiplier = 2654435761 % users or 1
+    while math.gcd(multiplier, users) != 1:
+        multiplier += 1
+    offset = seed % users
+    return lambda rank: (multiplier * (rank - 1) + offset) % users
+
+
+class _Injector:
+    """
+    Decides per row whether to write a duplicate or blank a field
+    """
+
+    def __init__(self, rng: random.Random, duplicate_rate: float, missing_rate: float):
+        self._rng = rng
+        self.duplicate_rate = duplicate_rate
+        self.missing_rate = missing_rate
+        self._recent = deque(maxlen=DUPLICATE_WINDOW)
+        self.counts = {"rows": 0, "duplicates": 0, "missing": 0}
+
+    def write(self, writer, row: list[str]):
+        if self.missing_rate and self._rng.random() < self.missing_rate:
+            row = list(row)
+            row[self._rng.randrange(len(row))] = ""
+            self.counts["missing"] += 1
+        writer.writerow(row)
+        self._recent.append(row)
+        self.counts["rows"] += 1
+
+        if self.duplicate_rate and self._rng.random() < self.duplicate_rate:
+            writer.writerow(self._rng.choice(self._recent))
+            self.counts["rows"] += 1
+            self.counts["duplicates"] += 1
+
+
+def generate_users(
+    filename: str,
+    users: int,
+    seed: int = 0,
+    duplicate_rate: float = 0.0,
+    missing_rate: float = 0.0,
+) -> dict:
+    """
+    Writes users accounts rows to filename
+    Returns the number of rows written and of injected duplicates and missing fields
+    """
+    rng = random.Random(f"users-{seed}")
+    injector = _Injector(rng, duplicate_rate, missing_rate)
+    with open(filename, mode="w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(USER_HEADER)
+        for index in range(users):
+            injector.write(writer, user_row(index, seed))
+    return injector.counts
+
+
+def generate_statuses(
+    filename: str,
+    users: int,
+    statuses: int,
+    seed: int = 0,
+    zipf_exponent: float = 1.1,
+    duplicate_rate: float = 0.0,
+    missing_rate: float = 0.0,
+    orphan_rate: float = 0.0,
+) -> dict:
+    """
+    Writes statuses status update rows to filename, posted by the users generated
+    with the same users count and seed
+    Returns the number of rows written and of injected duplicates, missing fields
+    and orphans
+    """
+    rng = random.Random(f"statuses-{seed}")
+    sampler = ZipfSampler(users, zipf_exponent, rng)
+    rank_to_index = _rank_to_index(users, seed)
+    injector = _Injector(rng, duplicate_rate, missing_rate)
+    orphans = 0
+    with open(filename, mode="w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(STATUS_HEADER)
+        for index in range(statuses):
+            if orphan_rate and rng.random() < orphan_rate:
+                user_id = f"Ghost.User{index}"
+                orphans += 1
+            else:
+                user_id = user_row(rank_to_index(sampler.sample()), seed)[0]
+            text = " ".join(rng.choices(WORDS, k=STATUS_WORDS))
+            injector.write(writer, [f"{user_id}_{index}", user_id, text])
+    return {**injector.counts, "orphans": orphans}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, required=True)
+    parser.add_argument("--statuses", type=int, required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="row rate")
+    parser.add_argument("--missing", type=float, default=0.0, help="row rate")
+    parser.add_argument("--orphans", type=float, default=0.0, help="status rate")
+    parser.add_argument("--output-dir", default=".")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    users_path = os.path.join(args.output_dir, "accounts.csv")
+    statuses_path = os.path.join(args.output_dir, "status_updates.csv")
+
+    start = time.perf_counter()
+    counts = generate_users(
+        users_path, args.users, args.seed, args.duplicates, args.missing
+    )
+    print(f"{users_path}: {counts} in {time.perf_counter() - start:.1f}s")
+    start = time.perf_counter()
+    counts = generate_statuses(
+        statuses_path,
+        args.users,
+        args.statuses,
+        args.seed,
+        args.zipf,
+        args.duplicates,
+        args.missing,
+        args.orphans,
+    )
+    print(f"{statuses_path}: {counts} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Classes to manage the follow graph and build news feeds from it
+"""
+
+# Disabling some noisy linting for peewee FollowsTable references
+# pylint: disable=E1101, E1120, W0212
+
+import heapq
+from datetime import datetime
+from itertools import islice
+from typing import Iterable
+
+from peewee import JOIN, DatabaseError, IntegrityError, Tuple, chunked, fn
+
+from database_manager import SQLITE_MAX_VARIABLES
+from database_utils import is_unique_violation
+from instrumentation import count_rows, timed
+from log_helper import logger, sample
+from socialnetwork_model import FanoutTable, FeedTable, FollowsTable, UserStatusTable
+from user_status import PAGE_SIZE, TIMELINE_FIELDS, UserStatus
+
+# Users following at least this many accounts get a precomputed feed
+# A merged feed runs one index query per followed account, while a precomputed feed
+# is a single index range; see python -m benchmarks.feed for where the two cross
+FANOUT_MIN_FOLLOWING = 200
+
+# Column order used by the bulk insert path, matches the follow argument order
+BULK_FIELDS = [FollowsTable.follower, FollowsTable.followee]
+
+# Newest statuses of one followed account, read from the timeline index
+# The same two statements run once per followed account, so they are plain SQL that
+# sqlite3 prepares once; rows start with (created_at, status_id), the feed order
+STATUS_TABLE = UserStatusTable._meta.table_name
+STREAM_SQL = (
+    f"SELECT created_at, status_id, user_id, status_text FROM {STATUS_TABLE} "
+    f"WHERE user_id = ? ORDER BY created_at DESC, status_id DESC LIMIT ?"
+)
+STREAM_BEFORE_SQL = (
+    f"SELECT created_at, status_id, user_id, status_text FROM {STATUS_TABLE} "
+    f"WHERE user_id = ? AND (created_at, status_id) < (?, ?) "
+    f"ORDER BY created_at DESC, status_id DESC LIMIT ?"
+)
+
+
+class FollowCollection:
+    """
+    Collection of follows between users
+    Users following at least min_following accounts get a precomputed feed; follow
+    and unfollow keep that membership current for the follower they change, while
+    bulk_add_follows leaves it to refresh_fanout
+    """
+
+    def __init__(self, min_following: int = FANOUT_MIN_FOLLOWING):
+        self.min_following = min_following
+
+    def _heavy_followers(self, min_following: int, follower: str | None = None):
+        """
+        Returns a query of the followers following at least min_following accounts,
+        only follower when one is given
+        """
+        query = FollowsTable.select(FollowsTable.follower)
+        if follower is not None:
+            query = query.where(FollowsTable.follower == follower)
+        return query.group_by(FollowsTable.follower).having(
+            fn.COUNT(FollowsTable.followee) >= min_following
+        )
+
+    @timed("FollowCollection.follow")
+    def follow(self, follower: str, followee: str) -> bool:
+        """
+        Makes follower follow followee
+        A single INSERT, an existing follow is reported by the primary key conflict
+        and an unknown user by the foreign keys
+        A follower reaching min_following follows gets a precomputed feed
+        """
+        try:
+            with FollowsTable._meta.database.atomic():
+                FollowsTable.insert(follower=follower, followee=followee).execute()
+                FanoutTable.insert_from(
+                    self._heavy_followers(self.min_following, follower),
+                    [FanoutTable.user_id],
+                ).on_conflict_ignore().execute()
+            return True
+        except IntegrityError as e:
+            if is_unique_violation(e):
+                if sample("duplicate_follow"):
+                    logger.error(
+                        "Follow failed: '{}' already follows '{}'.", follower, followee
+                    )
+            elif sample("follow_failed"):
+                logger.error(
+                    "Failed to save follow '{}' -> '{}': {}", follower, followee, e
+                )
+            return False
+        except DatabaseError as e:
+            if sample("follow_failed"):
+                logger.error(
+                    "Failed to save follow '{}' -> '{}': {}", follower, followee, e
+                )
+            return False
+
+    @timed("FollowCollection.unfollow")
+    def unfollow(self, follower: str, followee: str) -> bool:
+        """
+        Makes follower stop following followee
+        A single DELETE, a missing follow is reported by a rowcount of zero
+        A follower dropping below min_following follows loses its precomputed feed
+        """
+        try:
+            with FollowsTable._meta.database.atomic():
+                deleted = (
+                    FollowsTable.delete()
+                    .where(
+                        FollowsTable.follower == follower,
+                        FollowsTable.followee == followee,
+                    )
+                    .execute()
+                )
+                FanoutTable.delete().where(
+                    FanoutTable.user_id == follower,
+                    FanoutTable.user_id.not_in(
+                        self._heavy_followers(self.min_following, follower)
+                    ),
+                ).execute()
+        except DatabaseError as e:
+            if sample("unfollow_failed"):
+                logger.error(
+                    "Failed to delete follow '{}' -> '{}': {}", follower, followee, e
+                )
+            return False
+
+        if not deleted:
+            if sample("missing_follow"):
+                logger.error(
+                    "Unfollow failed: '{}' does not follow '{}'.", follower, followee
+                )
+            return False
+        return True
+
+    @timed("FollowCollection.bulk_add_follows", rows=count_rows)
+    def bulk_add_follows(self, follows: Iterable[tuple[str, str]]) -> int:
+        """
+        Adds many (follower, followee) follows with multi-row inserts
+        Follows that already exist are ignored
+        Returns the number of follows actually inserted
+        """
+        inserted = 0
+        for chunk in chunked(follows, SQLITE_MAX_VARIABLES // len(BULK_FIELDS)):
+            inserted += (
+                FollowsTable.insert_many(chunk, fields=BULK_FIELDS)
+                .on_conflict_ignore()
+                .as_rowcount()
+                .execute()
+            )
+        return inserted
+
+    def get_following(self, user_id: str) -> list[str]:
+        """
+        Returns the user_ids a user follows, read from the primary key index
+        """
+        query = FollowsTable.select(FollowsTable.followee).where(
+            FollowsTable.follower == user_id
+        )
+        return [followee for (followee,) in query.tuples()]
+
+    def get_followers(self, user_id: str) -> list[str]:
+        """
+        Returns the user_ids following a user, read from the (followee, follower) index
+        """
+        query = FollowsTable.select(FollowsTable.follower).where(
+            FollowsTable.followee == user_id
+        )
+        return [follower for (follower,) in query.tuples()]
+
+    @timed("FollowCollection.refresh_fanout")
+    def refresh_fanout(self, min_following: int | None = None) -> int:
+        """
+        Precomputes the feeds of the users following at least min_following accounts
+        (self.min_following by default) and drops the precomputed feeds of everyone
+        else; needed after bulk_add_follows, which does not track membership
+        Feeds are filled and emptied by the FanoutTable triggers, and stay current
+        as statuses and follows are added afterwards
+        Returns the number of users with a precomputed feed
+        """
+        if min_following is None:
+            min_following = self.min_following
+        heavy = self._heavy_followers(min_following)
+        with FanoutTable._meta.database.atomic():
+            FanoutTable.delete().where(FanoutTable.user_id.not_in(heavy)).execute()
+            FanoutTable.insert_from(
+                heavy, [FanoutTable.user_id]
+            ).on_conflict_ignore().execute()
+            count = FanoutTable.select().count()
+        logger.info(f"{count} users have a precomputed news feed.")
+        return count
+
+    @timed("FollowCollection.get_news_feed")
+    def get_news_feed(
+        self,
+        user_id: str,
+        limit: int = PAGE_SIZE,
+        cursor: tuple[datetime, str] | None = None,
+    ) -> list[UserStatus]:
+        """
+        Returns up to limit statuses of the accounts a user follows, newest first
+        Pass the (created_at, status_id) of the last status of the previous page as
+        cursor to get the next, older page, like get_user_timeline
+        Users in FanoutTable read their precomputed feed; for everyone else every
+        followed account's timeline is opened as a cursor on the timeline index and
+        the cursors are heap-merged, so only the rows that can still reach the page
+        are read
+        """
+        precomputed = (
+            FanoutTable.select().where(FanoutTable.user_id == user_id).exists()
+        )
+        if precomputed:
+            return self._precomputed_feed(user_id, limit, cursor)
+
+        database = UserStatusTable._meta.database
+        if cursor is None:
+            sql, after = STREAM_SQL, ()
+        else:
+            sql, after = STREAM_BEFORE_SQL, tuple(cursor)
+        streams = [
+            database.execute_sql(sql, (followee, *after, limit))
+            for followee in self.get_following(user_id)
+        ]
+        rows = islice(heapq.merge(*streams, reverse=True), limit)
+        to_datetime = UserStatusTable.created_at.python_value
+        return [
+            UserStatus(status_id, owner, status_text, to_datetime(created_at))
+            for created_at, status_id, owner, status_text in rows
+        ]
+
+    def _precomputed_feed(
+        self, user_id: str, limit: int, cursor: tuple[datetime, str] | None
+    ) -> list[UserStatus]:
+        """
+        Reads a page of a precomputed feed from the (user_id, created_at, status_id)
+        index of FeedTable, joining each entry to its status
+        """
+        query = (
+            FeedTable.select(*TIMELINE_FIELDS)
+            .join(
+                UserStatusTable,
+                JOIN.INNER,
+                on=FeedTable.status_id == UserStatusTable.status_id,
+            )
+            .where(FeedTable.user_id == user_id)
+        )
+        if cursor is not None:
+            query = query.where(
+                Tuple(FeedTable.created_at, FeedTable.status_id) < Tuple(*cursor)
+            )
+        query = query.order_by(
+            FeedTable.created_at.desc(), FeedTable.status_id.desc()
+        ).limit(limit)
+        return [UserStatus(*row) for row in query.tuples()]
@@ -0,0 +1,169 @@
+"""
+Overlaps csv parsing with database writes during imports
+A reader thread parses batches ahead of the writer and hands them over through a bounded
+queue, so the parser and the writer run at the same time while memory stays bounded.
+The thread that iterates the pipeline is the single writer; SQLite connections are
+per-thread, so the writes stay on the connection that owns the import transaction.
+"""
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+# Number of parsed batches allowed to wait for the writer
+QUEUE_SIZE = 4
+
+# Marks the end of the parsed batches in the queue
+_DONE = object()
+
+
+class ThroughputStats:
+    """
+    Counters for comparing the parse stage with the write stage of an import
+    """
+
+    def __init__(self):
+        self.rows_parsed = 0
+        self.rows_written = 0
+        self.parse_seconds = 0.0
+        self.write_seconds = 0.0
+        # Time the reader spent blocked on a full queue (the writer is the bottleneck)
+        self.reader_blocked_seconds = 0.0
+        # Time the writer spent waiting on an empty queue (the parser is the bottleneck)
+        self.writer_starved_seconds = 0.0
+
+    @property
+    def parse_rate(self) -> float:
+        """
+        Rows parsed per second of parsing
+        """
+        return self.rows_parsed / self.parse_seconds if self.parse_seconds else 0.0
+
+    @property
+    def write_rate(self) -> float:
+        """
+        Rows written per second of writing
+        """
+        return self.rows_written / self.write_seconds if self.write_seconds else 0.0
+
+    def __str__(self):
+        return (
+            f"parsed {self.rows_parsed} rows at {self.parse_rate:.0f} rows/s, "
+            f"wrote {self.rows_written} rows at {self.write_rate:.0f} rows/s, "
+            f"reader blocked {self.reader_blocked_seconds:.2f}s, "
+            f"writer starved {self.writer_starved_seconds:.2f}s"
+        )
+
+
+class ImportPipeline:
+    """
+    Iterates batches of parsed rows, optionally parsing them on a reader thread
+    Use as a context manager so the reader thread is always stopped
+    """
+
+    def __init__(
+        self,
+        batches: Iterable[list],
+        threaded: bool = True,
+        queue_size: int = QUEUE_SIZE,
+        stats: ThroughputStats | None = None,
+    ):
+        self._batches = batches
+        self.threaded = threaded
+        self.stats = stats if stats is not None else ThroughputStats()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        if self.threaded:
+            self._thread = threading.Thread(
+                target=self._read, name="csv-reader", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Stops the reader thread and waits for it to finish
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __iter__(self) -> Iterator[list]:
+        if not self.threaded:
+            yield from self._parse()
+            return
+
+        while True:
+            start = time.perf_counter()
+            item = self._queue.get()
+            self.stats.writer_starved_seconds += time.perf_counter() - start
+            if item is _DONE:
+                return
+            # Errors raised while parsing are re-raised on the writer thread
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    @contextmanager
+    def writing(self, row_count: int):
+        """
+        Times the write of a batch of row_count rows
+        """
+        start = time.perf_counter()
+        yield
+        self.stats.write_seconds += time.perf_counter() - start
+        self.stats.rows_written += row_count
+
+    def _parse(self) -> Iterator[list]:
+        """
+        Yields the parsed batches while timing the parser
+        """
+        batches = iter(self._batches)
+        while True:
+            start = time.perf_counter()
+            try:
+                batch = next(batches)
+            except StopIteration:
+                return
+            finally:
+                self.stats.parse_seconds += time.perf_counter() - start
+            self.stats.rows_parsed += len(batch)
+            yield batch
+
+    def _read(self):
+        """
+        Reader thread body: parses batches into the queue until done or stopped
+        """
+        try:
+            for batch in self._parse():
+                if not self._put(batch):
+                    return
+            self._put(_DONE)
+        except Exception as e:  # pylint: disable=broad-except
+            self._put(e)
+
+    def _put(self, item) -> bool:
+        """
+        Puts an item on the queue, giving up if the pipeline is stopped
+        Returns False if the item was not queued
+        """
+        start = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            self.stats.reader_blocked_seconds += time.perf_counter() - start
@@ -0,0 +1,249 @@
+"""
+Per-operation latency instrumentation
+Collection methods and loaders are wrapped with @timed, which records call counts,
+failures and a latency histogram per operation name, plus rows/s for the loaders.
+Instrumentation is off by default; a disabled wrapper only checks one flag before
+calling straight through.
+"""
+
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable
+
+# Upper bounds of the histogram buckets in seconds, the last bucket is unbounded
+BUCKET_BOUNDS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+_enabled = False
+_lock = threading.Lock()
+_operations = {}
+
+
+def _is_false(result: Any) -> bool:
+    return result is False
+
+
+def any_failed(results: list[bool]) -> bool:
+    """
+    failed test for batch methods, which return one bool per item
+    """
+    return not all(results)
+
+
+def count_rows(result: int | tuple[int, ...]) -> int:
+    """
+    rows test for methods returning a row count or a tuple of row counts
+    """
+    return sum(result) if isinstance(result, tuple) else result
+
+
+class OperationStats:
+    """
+    Counters and latency histogram of one operation
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+
+    def record(self, seconds: float, failed: bool, rows: int):
+        self.count += 1
+        self.errors += failed
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.rows += rows
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Upper bound of the bucket holding the given fraction of calls, capped at the max
+        """
+        rank = fraction * self.count
+        seen = 0
+        for bound, bucket_count in zip(BUCKET_BOUNDS, self.buckets):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bound, self.max_seconds)
+        return self.max_seconds
+
+    def as_dict(self) -> dict:
+        histogram = {
+            f"<={bound * 1000:g}ms": count
+            for bound, count in zip(BUCKET_BOUNDS, self.buckets)
+            if count
+        }
+        if self.buckets[-1]:
+            histogram[f">{BUCKET_BOUNDS[-1] * 1000:g}ms"] = self.buckets[-1]
+        stats = {
+            "count": self.count,
+            "errors": self.errors,
+            "total_seconds": self.total_seconds,
+            "mean_ms": self.total_seconds / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(0.50) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": self.max_seconds * 1000,
+            "histogram": histogram,
+        }
+        if self.rows:
+            stats["rows"] = self.rows
+            stats["rows_per_sec"] = (
+                self.rows / self.total_seconds if self.total_seconds else 0.0
+            )
+        return stats
+
+
+def enable(enabled: bool = True):
+    """
+    Turns recording on or off for every instrumented operation
+    """
+    global _enabled  # pylint: disable=global-statement
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def record(name: str, seconds: float, failed: bool = False, rows: int = 0):
+    """
+    Records one call of an operation
+    """
+    with _lock:
+        stats = _operations.get(name)
+        if stats is None:
+            stats = _operations[name] = OperationStats()
+        stats.record(seconds, failed, rows)
+
+
+def timed(
+    name: str,
+    failed: Callable[[Any], bool] = _is_false,
+    rows: Callable[[Any], int] | None = None,
+):
+    """
+    Decorator recording the latency of every call under name
+    A call counts as an error if it raises or failed(result) is true (by default,
+    if it returns False); rows(result) gives the rows a loader processed
+    """
+
+    def decorate(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                record(name, time.perf_counter() - start, failed=True)
+                raise
+            record(
+                name,
+                time.perf_counter() - start,
+                failed=failed(result),
+                rows=rows(result) if rows is not None and result else 0,
+            )
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+class _Measurement:
+    """
+    Outcome of a measure() block, set rows or failed before the block ends
+    """
+
+    __slots__ = ("rows", "failed")
+
+    def __init__(self):
+        self.rows = 0
+        self.failed = False
+
+
+@contextmanager
+def measure(name: str):
+    """
+    Context manager recording the latency of a block under name
+    """
+    if not _enabled:
+        yield _Measurement()
+        return
+    measurement = _Measurement()
+    start = time.perf_counter()
+    try:
+        yield measurement
+    except BaseException:
+        measurement.failed = True
+        raise
+    finally:
+        record(
+            name,
+            time.perf_counter() - start,
+            failed=measurement.failed,
+            rows=measurement.rows,
+        )
+
+
+def get_stats() -> dict:
+    """
+    Returns the counters, latency percentiles and histogram of every operation
+    Percentiles are estimated from the histogram buckets
+    """
+    with _lock:
+        return {name: stats.as_dict() for name, stats in sorted(_operations.items())}
+
+
+def reset_stats():
+    """
+    Drops everything recorded so far
+    """
+    with _lock:
+        _operations.clear()
+
+
+def format_stats(stats: dict | None = None) -> str:
+    """
+    Formats get_stats() as a table for the terminal
+    """
+    stats = get_stats() if stats is None else stats
+    if not stats:
+        return "No operations recorded."
+    lines = [
+        f"{'operation':<36}{'calls':>8}{'errors':>8}{'mean ms':>10}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>10}{'rows/s':>10}"
+    ]
+    for name, entry in stats.items():
+        rate = f"{entry['rows_per_sec']:.0f}" if "rows_per_sec" in entry else ""
+        lines.append(
+            f"{name:<36}{entry['count']:>8}{entry['errors']:>8}"
+            f"{entry['mean_ms']:>10.3f}{entry['p50_ms']:>9.3f}{entry['p95_ms']:>9.3f}"
+            f"{entry['p99_ms']:>9.3f}{entry['max_ms']:>10.3f}{rate:>10}"
+        )
+    return "\n".join(lines)
@@ -3,17 +3,112 @@ Handles logger management
 """
 
 import os
+import threading
 from datetime import datetime
 from loguru import logger
 
 log_dir = os.path.dirname(os.path.abspath(__file__))
 LOG_FILENAME = f"log_{datetime.now().strftime('%m-%d-%Y')}.log"
 log_path = os.path.join(log_dir, LOG_FILENAME)
+LOG_FORMAT = "{time:YYYY-MM-DD HH:mm:ss} - {level} - [{file}:{line}] - {message}"
+
+# SQL traces get their own files, see database_manager.QueryTracer
+QUERY_LOG_FILENAME = f"queries_{datetime.now().strftime('%m-%d-%Y')}.log"
+SLOW_QUERY_LOG_FILENAME = f"slow_queries_{datetime.now().strftime('%m-%d-%Y')}.log"
+query_log_path = os.path.join(log_dir, QUERY_LOG_FILENAME)
+slow_query_log_path = os.path.join(log_dir, SLOW_QUERY_LOG_FILENAME)
+
+
+def is_business_record(record) -> bool:
+    """
+    True for ordinary log messages, False for records sent to a dedicated channel
+    """
+    return "channel" not in record["extra"]
+
 
 # Setup logger
+# enqueue hands records to a background writer, so logging never waits on the disk
 logger.remove()
 logger.add(
     log_path,
     level="INFO",
-    format="{time:YYYY-MM-DD HH:mm:ss} - {level} - [{file}:{line}] - {message}",
+    format=LOG_FORMAT,
+    filter=is_business_record,
+    enqueue=True,
 )
+
+# A repeated per-row event is logged this many times before sampling starts,
+# then once every LOG_SAMPLE_EVERY occurrences
+LOG_SAMPLE_FIRST = 10
+LOG_SAMPLE_EVERY = 1000
+
+# Sampler of the bulk operation running on each thread
+_active = threading.local()
+
+
+class LogSampler:
+    """
+    Rate-limits repeated per-row log messages during a bulk operation
+    Every occurrence is counted, and a summary per event is logged at the end
+    Use as a context manager to make it the sampler of the current thread
+    """
+
+    def __init__(
+        self,
+        operation: str,
+        first: int = LOG_SAMPLE_FIRST,
+        every: int = LOG_SAMPLE_EVERY,
+    ):
+        self.operation = operation
+        self.first = first
+        self.every = every
+        self.counts = {}
+        self.logged = {}
+        self._lock = threading.Lock()
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = getattr(_active, "sampler", None)
+        _active.sampler = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _active.sampler = self._previous
+        self.summary()
+
+    def allow(self, event: str) -> bool:
+        """
+        Counts one occurrence of event and returns True if it should be logged
+        """
+        with self._lock:
+            count = self.counts[event] = self.counts.get(event, 0) + 1
+            if count <= self.first or count % self.every == 0:
+                self.logged[event] = self.logged.get(event, 0) + 1
+                return True
+            return False
+
+    def summary(self):
+        """
+        Logs how often each event occurred and how many of them were logged
+        """
+        with self._lock:
+            counts = dict(self.counts)
+            logged = dict(self.logged)
+        for event, count in sorted(counts.items()):
+            logger.info(
+                "{}: {} '{}' events, {} logged.",
+                self.operation,
+                count,
+                event,
+                logged.get(event, 0),
+            )
+
+
+def sample(event: str, sampler: LogSampler | None = None) -> bool:
+    """
+    Returns True if a per-row event should be logged
+    Uses the given sampler, else the sampler of the current thread; with neither,
+    every event is logged
+    """
+    sampler = sampler or getattr(_active, "sampler", None)
+    return sampler is None or sampler.allow(event)
@@ -6,68 +6,346 @@ Backend for a simple social network project
 # pylint: disable=W0212, E1101
 
 import csv
-from database_manager import db
-from model_mapper import AccountFields, StatusFields
-from log_helper import logger
+import os
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from enum import Enum
+from typing import Callable, Iterable, Iterator
+
+from peewee import DatabaseError, Model
+
+from cache import LRUCache
+from checkpoint import ImportCheckpoint
+from csv_reader import (
+    RowBatch,
+    read_batches,
+    read_batches_parallel,
+    validate_batch,
+)
+from database_manager import bulk_load_profile
+from database_utils import deferred_status_search
+from delta_sync import DeltaIndex
+from exporter import write_export
+from import_pipeline import ImportPipeline, ThroughputStats
+import instrumentation
+from instrumentation import count_rows, timed
+from follows import FollowCollection
+from model_mapper import AccountFields, FollowFields, StatusFields
+from log_helper import LogSampler, logger, sample
+from socialnetwork_model import FollowsTable, UsersTable, UserStatusTable
+from user_status import BULK_FIELDS as BULK_STATUS_FIELDS
 from user_status import UserStatusCollection, UserStatus
+from users import BULK_FIELDS as BULK_USER_FIELDS
 from users import UserCollection, Users
+from validation import RowValidator
 
+# Number of csv rows validated and written to the database per batch
+BATCH_SIZE = 5000
 
-# initialize a new UserCollection
-def init_user_collection():
-    return UserCollection()
 
+# Loaders and exports return None when they fail
+def _is_none(result) -> bool:
+    return result is None
 
-# initialize a new UserStatusCollection
-def init_status_collection():
-    return UserStatusCollection()
 
+# Exports return (row_count, seconds)
+def _exported_rows(result: tuple[int, float]) -> int:
+    return result[0]
 
+
+# Delta imports return {"new": n, "changed": n, "unchanged": n, "skipped": n}
+def _synced_rows(result: dict[str, int]) -> int:
+    return sum(result.values())
+
+
+# initialize a new UserCollection, optionally with a search cache
+def init_user_collection(
+    cache: LRUCache | None = None, status_cache: LRUCache | None = None
+):
+    return UserCollection(cache, status_cache)
+
+
+# initialize a new UserStatusCollection, optionally with a search cache
+def init_status_collection(cache: LRUCache | None = None):
+    return UserStatusCollection(cache)
+
+
+# initialize a new FollowCollection
+def init_follow_collection():
+    return FollowCollection()
+
+
+def _dedupe(batch: list[tuple[str, ...]], seen_ids: set[str]) -> list[tuple[str, ...]]:
+    """
+    Drops rows whose id (first value) was already seen earlier in the file
+    """
+    unique = []
+    for values in batch:
+        if values[0] not in seen_ids:
+            seen_ids.add(values[0])
+            unique.append(values)
+    return unique
+
+
+def _existing_user_ids() -> set[str]:
+    """
+    Returns the user_id of every user in the database
+    """
+    query = UsersTable.select(UsersTable.user_id).tuples()
+    return {user_id for (user_id,) in query.iterator()}
+
+
+class RejectReport:
+    """
+    Writes rejected csv rows and the reason for each rejection to a report file
+    The report file is only created once the first row is rejected
+    With append, rows are added to an existing report, as when an import resumes
+    """
+
+    def __init__(self, filename: str, fields: type[Enum], append: bool = False):
+        self.filename = filename
+        self.fields = fields
+        self.append = append
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def add(self, values: tuple[str, ...], reason: str):
+        """
+        Records a rejected row
+        """
+        if self._writer is None:
+            # The report stays open across batches and is closed by close()
+            # pylint: disable=consider-using-with
+            self._file = open(
+                self.filename,
+                mode="a" if self.append else "w",
+                newline="",
+                encoding="utf-8",
+            )
+            self._writer = csv.writer(self._file)
+            # Use the same headers as the import files so fixed rows can be re-imported
+            if self._file.tell() == 0:
+                self._writer.writerow(
+                    [field.value.upper() for field in self.fields] + ["REASON"]
+                )
+        self._writer.writerow([*values, reason])
+        self.count += 1
+
+    def close(self):
+        """
+        Closes the report file if one was created
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _reject_filename(filename: str) -> str:
+    """
+    Default reject report of an import file, e.g. accounts.csv -> accounts_rejects.csv
+    """
+    return f"{os.path.splitext(filename)[0]}_rejects.csv"
+
+
+def _drop_orphans(
+    batch: list[tuple[str, ...]], user_ids: set[str], rejects: RejectReport
+) -> list[tuple[str, ...]]:
+    """
+    Returns the statuses whose user exists and reports the rest as rejects
+    """
+    valid = []
+    for values in batch:
+        user_id = values[1]
+        if user_id in user_ids:
+            valid.append(values)
+        else:
+            rejects.add(values, f"user_id '{user_id}' does not exist")
+    return valid
+
+
+def _drop_unknown_follows(
+    batch: list[tuple[str, ...]], user_ids: set[str], rejects: RejectReport
+) -> list[tuple[str, ...]]:
+    """
+    Returns the follows between two distinct existing users and reports the rest
+    as rejects
+    """
+    valid = []
+    for values in batch:
+        follower, followee = values
+        if follower not in user_ids:
+            rejects.add(values, f"user_id '{follower}' does not exist")
+        elif followee not in user_ids:
+            rejects.add(values, f"user_id '{followee}' does not exist")
+        elif follower == followee:
+            rejects.add(values, f"user_id '{follower}' cannot follow itself")
+        else:
+            valid.append(values)
+    return valid
+
+
+def _validated(
+    batches: Iterable[RowBatch], validator: RowValidator
+) -> Iterator[RowBatch]:
+    """
+    Yields every batch with its invalid rows moved to the batch's rejected list
+    """
+    for batch in batches:
+        yield validate_batch(batch, validator)
+
+
+def _import_csv(
+    filename: str,
+    fields: type[Enum],
+    write_batch: Callable[[RowBatch], int],
+    validator: RowValidator,
+    rejects: RejectReport,
+    batch_size: int,
+    pipelined: bool,
+    stats: ThroughputStats | None,
+    resumable: bool,
+    progress: Callable[[int, int], None] | None,
+    parse_workers: int,
+) -> tuple[int, int]:
+    """
+    Streams a csv file through write_batch, batch_size rows at a time
+    Every batch is checked by validator first, on the reader thread when pipelined,
+    and invalid rows go to rejects with their reasons while the rest is imported
+    write_batch inserts a batch of row tuples and returns how many were inserted
+    Without resumable the whole file is one transaction; with it every batch is
+    committed on its own and a checkpoint lets a rerun continue after the last commit
+    progress is called after every batch with the running (new_count, skipped_count)
+    With parse_workers the csv is parsed and validated by that many processes, one
+    byte range at a time, while this thread stays the single writer
+    Returns (new_count, skipped_count), rejected rows count as skipped
+    """
+    database = UsersTable._meta.database
+    checkpoint = ImportCheckpoint(filename) if resumable else None
+    state = checkpoint.load() if checkpoint else None
+    if state is None:
+        state = {"offset": 0, "row": 0, "new_count": 0, "skipped_count": 0}
+    # Collect count of imported rows and skipped rows for logging/output
+    new_count = state["new_count"]
+    skipped_count = state["skipped_count"]
+    # A resumed import adds to the rejects of the runs before it
+    rejects.append = rejects.append or state["offset"] > 0
+
+    # Run the whole import with the bulk load pragmas, restored once it finishes
+    sampler = LogSampler(f"Import of '{filename}'")
+    with open(filename, mode="rb") as csvfile, bulk_load_profile(database), sampler:
+        if parse_workers:
+            batches = read_batches_parallel(
+                filename,
+                fields,
+                batch_size,
+                state["offset"],
+                state["row"],
+                workers=parse_workers,
+                validator=validator,
+            )
+        else:
+            batches = read_batches(
+                csvfile, fields, batch_size, state["offset"], state["row"]
+            )
+            batches = _validated(batches, validator)
+        with ImportPipeline(batches, pipelined, stats=stats) as pipeline:
+            # Use a transaction so that the entire import will rollback if any fail,
+            # unless each batch is committed on its own
+            with nullcontext() if resumable else database.transaction():
+                for batch in pipeline:
+                    for values, reason in batch.rejected:
+                        rejects.add(values, reason)
+                        if sample("rejected_row"):
+                            logger.error("Rejected row {}: {}", values, reason)
+
+                    with pipeline.writing(len(batch)):
+                        with database.atomic() if resumable else nullcontext():
+                            inserted = write_batch(batch)
+                    new_count += inserted
+                    skipped_count += len(batch) - inserted + len(batch.rejected)
+                    if checkpoint:
+                        checkpoint.save(
+                            batch.end_offset, batch.end_row, new_count, skipped_count
+                        )
+                    if progress:
+                        progress(new_count, skipped_count)
+
+    if checkpoint:
+        checkpoint.clear()
+    logger.info(f"Import throughput: {pipeline.stats}")
+    return new_count, skipped_count
+
+
+@timed("load_users", failed=_is_none, rows=count_rows)
 def load_users(
-    filename: str, user_collection: UserCollection
-) -> tuple[int, int] | None:
+    filename: str,
+    user_collection: UserCollection,
+    batch_size: int = BATCH_SIZE,
+    reject_filename: str | None = None,
+    pipelined: bool = False,
+    stats: ThroughputStats | None = None,
+    resumable: bool = False,
+    progress: Callable[[int, int], None] | None = None,
+    parse_workers: int = 0,
+) -> tuple[int, int]:
     """
     Loads users from a csv file into an instance of user_collection
+    Rows are validated and deduplicated in memory and inserted batch_size rows at a time
+    Invalid rows are skipped and written to a reject report with their reasons
+    With pipelined=True the csv is parsed on a reader thread while batches are written
+    Pass a ThroughputStats to collect parse and write rates
+    With resumable=True every batch is committed and checkpointed, and an interrupted
+    import of the same file continues from its last checkpoint
+    progress is called after every batch with the running (new_count, skipped_count)
+    With parse_workers > 0 the csv is split into byte ranges parsed by that many
+    processes, for files large enough that parsing outruns the writer
     """
-    try:
-        with open(filename, mode="r", newline="", encoding="utf-8") as csvfile:
-            reader = csv.DictReader(csvfile)
-            # Collect count of imported rows and skipped rows for logging/output
-            new_count = 0
-            skipped_count = 0
-            # Use a transaction so that the entire batch will rollback if any fail
-            with db.transaction():
-                for row in reader:
-                    row = {key.lower(): value for key, value in row.items()}
-
-                    # Use AccountFields enum for mapping csv to data model columns
-                    if not all(row.get(field.value) for field in AccountFields):
-                        logger.error(f"Incomplete data in row: {row}")
-                        return None
-
-                    user_id = row[AccountFields.USER_ID.value]
-                    email = row[AccountFields.EMAIL.value]
-                    user_name = row[AccountFields.USER_NAME.value]
-                    user_last_name = row[AccountFields.USER_LAST_NAME.value]
-
-                    if user_collection.add_user(
-                        user_id, email, user_name, user_last_name
-                    ):
-                        new_count += 1
-                    else:
-                        skipped_count += 1
-
-        message = f"{new_count} users loaded from '{filename}' successfully."
-        # Conditionally include information about skipped users
-        if skipped_count > 0:
-            message += f" {skipped_count} users skipped."
-        logger.info(message)
-        return new_count, skipped_count
+    if reject_filename is None:
+        reject_filename = _reject_filename(filename)
+    # user_ids already read from this file, so repeats never reach the database
+    seen_ids = set()
 
+    def write_batch(batch: RowBatch) -> int:
+        return user_collection.bulk_add_users(_dedupe(batch, seen_ids))
+
+    try:
+        with RejectReport(reject_filename, AccountFields) as rejects:
+            result = _import_csv(
+                filename,
+                AccountFields,
+                write_batch,
+                USER_VALIDATOR,
+                rejects,
+                batch_size=batch_size,
+                pipelined=pipelined,
+                stats=stats,
+                resumable=resumable,
+                progress=progress,
+                parse_workers=parse_workers,
+            )
     except FileNotFoundError:
         logger.error(f"File not found: '{filename}'")
         return 0, 0
 
+    new_count, skipped_count = result
+    message = f"{new_count} users loaded from '{filename}' successfully."
+    # Conditionally include information about skipped users
+    if skipped_count > 0:
+        message += f" {skipped_count} users skipped."
+    if rejects.count > 0:
+        message += f" {rejects.count} invalid users written to '{reject_filename}'."
+    logger.info(message)
+    return result
+
 
 def add_user(
     user_id: str,
@@ -93,49 +371,215 @@ def delete_user(user_id: str, user_collection: UserCollection) -> bool:
     return user_collection.delete_user(user_id)
 
 
+def add_users(
+    users: Iterable[tuple[str, str, str, str]], user_collection: UserCollection
+) -> list[bool]:
+    return user_collection.add_users(users)
+
+
+def update_users(
+    users: Iterable[tuple[str, str, str, str]], user_collection: UserCollection
+) -> list[bool]:
+    return user_collection.modify_users(users)
+
+
+def delete_users(
+    user_ids: Iterable[str], user_collection: UserCollection
+) -> list[bool]:
+    return user_collection.delete_users(user_ids)
+
+
+@timed("sync_users", failed=_is_none, rows=_synced_rows)
+def sync_users(
+    filename: str,
+    user_collection: UserCollection,
+    batch_size: int = BATCH_SIZE,
+    reject_filename: str | None = None,
+    pipelined: bool = False,
+    stats: ThroughputStats | None = None,
+    parse_workers: int = 0,
+) -> dict[str, int] | None:
+    """
+    Delta import: brings the users table in line with a new version of a users file
+    Every row is classified as new, changed or unchanged by its content hash, and
+    only new and changed rows are written, batch_size rows per multi-row upsert
+    Users missing from the file are kept
+    The options work as in load_users
+    Returns the count of new, changed, unchanged and skipped (repeated or invalid)
+    rows, or None if the file is missing
+    """
+    if reject_filename is None:
+        reject_filename = _reject_filename(filename)
+    delta = DeltaIndex(UsersTable, BULK_USER_FIELDS)
+
+    def write_batch(batch: RowBatch) -> int:
+        delta.counts["skipped"] += len(batch.rejected)
+        return user_collection.bulk_upsert_users(delta.classify(batch))
+
+    try:
+        with RejectReport(reject_filename, AccountFields) as rejects:
+            _import_csv(
+                filename,
+                AccountFields,
+                write_batch,
+                USER_VALIDATOR,
+                rejects,
+                batch_size=batch_size,
+                pipelined=pipelined,
+                stats=stats,
+                resumable=False,
+                progress=None,
+                parse_workers=parse_workers,
+            )
+    except FileNotFoundError:
+        logger.error(f"File not found: '{filename}'")
+        return None
+
+    message = f"Users synced from '{filename}': {delta.counts}."
+    if rejects.count > 0:
+        message += f" {rejects.count} invalid users written to '{reject_filename}'."
+    logger.info(message)
+    return delta.counts
+
+
+def purge_users(
+    user_ids: Iterable[str], user_collection: UserCollection
+) -> tuple[int, int]:
+    return user_collection.purge_users(user_ids)
+
+
 def search_user(user_id: str, log: bool, user_collection: UserCollection) -> Users:
     return user_collection.search_user(user_id, log)
 
 
+@timed("load_status_updates", failed=_is_none, rows=count_rows)
 def load_status_updates(
-    filename: str, status_collection: UserStatusCollection
-) -> tuple[int, int] | None:
+    filename: str,
+    status_collection: UserStatusCollection,
+    batch_size: int = BATCH_SIZE,
+    reject_filename: str | None = None,
+    pipelined: bool = False,
+    stats: ThroughputStats | None = None,
+    resumable: bool = False,
+    progress: Callable[[int, int], None] | None = None,
+    parse_workers: int = 0,
+) -> tuple[int, int]:
+    """
+    Loads statuses from a csv file into an instance of status_collection
+    Invalid statuses and statuses for unknown users are skipped and written to a
+    reject report instead of being sent to the database
+    With pipelined=True the csv is parsed on a reader thread while batches are written
+    Pass a ThroughputStats to collect parse and write rates
+    With resumable=True every batch is committed and checkpointed, and an interrupted
+    import of the same file continues from its last checkpoint
+    progress is called after every batch with the running (new_count, skipped_count)
+    With parse_workers > 0 the csv is split into byte ranges parsed by that many
+    processes, for files large enough that parsing outruns the writer
+    """
+    if reject_filename is None:
+        reject_filename = _reject_filename(filename)
     try:
-        with open(filename, mode="r", newline="", encoding="utf-8") as csvfile:
-            reader = csv.DictReader(csvfile)
-            # Collect count of imported rows and skipped rows for logging/output
-            new_count = 0
-            skipped_count = 0
-            # Use a transaction so that the entire batch will rollback if any fail
-            with db.transaction():
-                for row in reader:
-                    row = {key.lower(): value for key, value in row.items()}
-
-                    # Use StatusFields enum for mapping csv to data model columns
-                    if not all(row.get(field.value) for field in StatusFields):
-                        logger.error(f"Incomplete data in row: {row}")
-                        return None
-
-                    status_id = row[StatusFields.STATUS_ID.value]
-                    user_id = row[StatusFields.USER_ID.value]
-                    status_text = row[StatusFields.STATUS_TEXT.value]
-
-                    if status_collection.add_status(status_id, user_id, status_text):
-                        new_count += 1
-                    else:
-                        skipped_count += 1
-
-        message = f"{new_count} statuses loaded from '{filename}' successfully."
-        # Conditionally include information about skipped statuses
-        if skipped_count > 0:
-            message += f" {skipped_count} statuses skipped."
-        logger.info(message)
-        return new_count, skipped_count
-
+        # Load every user_id once so each status can be checked without a query
+        user_ids = _existing_user_ids()
+        with RejectReport(reject_filename, StatusFields) as rejects:
+            # A large import indexes its statuses and fills the precomputed feeds in
+            # one statement each at the end instead of row by row
+            with deferred_status_search(UserStatusTable._meta.database) as add_rows:
+
+                def write_batch(batch: RowBatch) -> int:
+                    # Repeated status_ids are ignored by the insert itself
+                    valid = _drop_orphans(batch, user_ids, rejects)
+                    add_rows(len(valid))
+                    return status_collection.bulk_add_statuses(valid)
+
+                result = _import_csv(
+                    filename,
+                    StatusFields,
+                    write_batch,
+                    STATUS_VALIDATOR,
+                    rejects,
+                    batch_size=batch_size,
+                    pipelined=pipelined,
+                    stats=stats,
+                    resumable=resumable,
+                    progress=progress,
+                    parse_workers=parse_workers,
+                )
     except FileNotFoundError:
         logger.error(f"File not found: '{filename}'")
         return 0, 0
 
+    new_count, skipped_count = result
+    message = f"{new_count} statuses loaded from '{filename}' successfully."
+    # Conditionally include information about skipped statuses
+    if skipped_count > 0:
+        message += f" {skipped_count} statuses skipped."
+    if rejects.count > 0:
+        message += f" {rejects.count} rejected statuses written to '{reject_filename}'."
+    logger.info(message)
+    return result
+
+
+@timed("sync_status_updates", failed=_is_none, rows=_synced_rows)
+def sync_status_updates(
+    filename: str,
+    status_collection: UserStatusCollection,
+    batch_size: int = BATCH_SIZE,
+    reject_filename: str | None = None,
+    pipelined: bool = False,
+    stats: ThroughputStats | None = None,
+    parse_workers: int = 0,
+) -> dict[str, int] | None:
+    """
+    Delta import: brings the statuses table in line with a new version of a status file
+    Works like sync_users; statuses for unknown users are skipped and written to a
+    reject report, and a changed status that names a different user is skipped, since
+    statuses never move between users
+    The full-text index is kept up to date row by row, as a delta usually writes a
+    small part of the table
+    Returns the count of new, changed, unchanged and skipped rows, or None if the
+    file is missing
+    """
+    if reject_filename is None:
+        reject_filename = _reject_filename(filename)
+    delta = DeltaIndex(UserStatusTable, BULK_STATUS_FIELDS)
+    user_ids = _existing_user_ids()
+    try:
+        with RejectReport(reject_filename, StatusFields) as rejects:
+
+            def write_batch(batch: RowBatch) -> int:
+                valid = _drop_orphans(batch, user_ids, rejects)
+                delta.counts["skipped"] += len(batch) - len(valid) + len(batch.rejected)
+                rows = delta.classify(valid)
+                written = status_collection.bulk_upsert_statuses(rows)
+                # Only a status owned by another user is ever left unwritten
+                delta.counts["changed"] -= len(rows) - written
+                delta.counts["skipped"] += len(rows) - written
+                return written
+
+            _import_csv(
+                filename,
+                StatusFields,
+                write_batch,
+                STATUS_VALIDATOR,
+                rejects,
+                batch_size=batch_size,
+                pipelined=pipelined,
+                stats=stats,
+                resumable=False,
+                progress=None,
+                parse_workers=parse_workers,
+            )
+    except FileNotFoundError:
+        logger.error(f"File not found: '{filename}'")
+        return None
+
+    message = f"Statuses synced from '{filename}': {delta.counts}."
+    if rejects.count > 0:
+        message += f" {rejects.count} rejected statuses written to '{reject_filename}'."
+    logger.info(message)
+    return delta.counts
+
 
 def add_status(
     status_id: str,
@@ -147,7 +591,8 @@ def add_status(
     # Check if valid user was provided before attempting to add status
     user = search_user(user_id, False, user_collection)
     if not user.user_id:
-        logger.error(f"Cannot add status because user '{user_id}' does not exist.")
+        if sample("missing_user"):
+            logger.error("Cannot add status because user '{}' does not exist.", user_id)
         return False
     return status_collection.add_status(status_id, user_id, status_text)
 
@@ -164,7 +609,260 @@ def delete_status(status_id: str, status_collection: UserStatusCollection) -> bo
     return status_collection.delete_status(status_id)
 
 
+def add_statuses(
+    statuses: Iterable[tuple[str, str, str]],
+    status_collection: UserStatusCollection,
+    user_collection: UserCollection,
+) -> list[bool]:
+    """
+    Adds (status_id, user_id, status_text) tuples in one transaction
+    The owners are checked with one query for the whole batch, so every status
+    costs a single INSERT
+    Returns one result per status, in order
+    """
+    statuses = list(statuses)
+    results = []
+    with LogSampler("add_statuses"):
+        with UserStatusTable._meta.database.atomic():
+            user_ids = user_collection.existing_user_ids(
+                user_id for _, user_id, _ in statuses
+            )
+            for status_id, user_id, status_text in statuses:
+                if user_id not in user_ids:
+                    if sample("missing_user"):
+                        logger.error(
+                            "Cannot add status because user '{}' does not exist.",
+                            user_id,
+                        )
+                    results.append(False)
+                else:
+                    results.append(
+                        status_collection.add_status(status_id, user_id, status_text)
+                    )
+    return results
+
+
+def update_statuses(
+    statuses: Iterable[tuple[str, str]], status_collection: UserStatusCollection
+) -> list[bool]:
+    return status_collection.modify_statuses(statuses)
+
+
+def delete_statuses(
+    status_ids: Iterable[str], status_collection: UserStatusCollection
+) -> list[bool]:
+    return status_collection.delete_statuses(status_ids)
+
+
 def search_status(
     status_id: str, log: bool, status_collection: UserStatusCollection
 ) -> UserStatus:
     return status_collection.search_status(status_id, log)
+
+
+def search_statuses(
+    query: str, limit: int, status_collection: UserStatusCollection
+) -> list[UserStatus]:
+    return status_collection.search_statuses(query, limit)
+
+
+def get_user_statuses(
+    user_id: str,
+    after: str | None,
+    limit: int,
+    status_collection: UserStatusCollection,
+) -> list[UserStatus]:
+    return status_collection.get_user_statuses(user_id, after, limit)
+
+
+def get_user_timeline(
+    user_id: str,
+    before: tuple[datetime, str] | None,
+    limit: int,
+    status_collection: UserStatusCollection,
+) -> list[UserStatus]:
+    return status_collection.get_user_timeline(user_id, before, limit)
+
+
+@timed("load_follows", failed=_is_none, rows=count_rows)
+def load_follows(
+    filename: str,
+    follow_collection: FollowCollection,
+    batch_size: int = BATCH_SIZE,
+    reject_filename: str | None = None,
+    pipelined: bool = False,
+    stats: ThroughputStats | None = None,
+    resumable: bool = False,
+    progress: Callable[[int, int], None] | None = None,
+    parse_workers: int = 0,
+) -> tuple[int, int]:
+    """
+    Loads (follower_id, followee_id) follows from a csv file into follow_collection
+    Invalid follows, follows of unknown users and self-follows are skipped and
+    written to a reject report; repeated follows are ignored by the insert itself
+    Once loaded, the users following the most accounts get precomputed news feeds
+    Takes the same options as load_status_updates
+    """
+    if reject_filename is None:
+        reject_filename = _reject_filename(filename)
+    try:
+        user_ids = _existing_user_ids()
+        with RejectReport(reject_filename, FollowFields) as rejects:
+
+            def write_batch(batch: RowBatch) -> int:
+                valid = _drop_unknown_follows(batch, user_ids, rejects)
+                return follow_collection.bulk_add_follows(valid)
+
+            result = _import_csv(
+                filename,
+                FollowFields,
+                write_batch,
+                FOLLOW_VALIDATOR,
+                rejects,
+                batch_size=batch_size,
+                pipelined=pipelined,
+                stats=stats,
+                resumable=resumable,
+                progress=progress,
+                parse_workers=parse_workers,
+            )
+    except FileNotFoundError:
+        logger.error(f"File not found: '{filename}'")
+        return 0, 0
+
+    follow_collection.refresh_fanout()
+    new_count, skipped_count = result
+    message = f"{new_count} follows loaded from '{filename}' successfully."
+    if skipped_count > 0:
+        message += f" {skipped_count} follows skipped."
+    if rejects.count > 0:
+        message += f" {rejects.count} rejected follows written to '{reject_filename}'."
+    logger.info(message)
+    return result
+
+
+def follow_user(
+    follower: str, followee: str, follow_collection: FollowCollection
+) -> bool:
+    return follow_collection.follow(follower, followee)
+
+
+def unfollow_user(
+    follower: str, followee: str, follow_collection: FollowCollection
+) -> bool:
+    return follow_collection.unfollow(follower, followee)
+
+
+def refresh_fanout(follow_collection: FollowCollection) -> int:
+    """
+    Recomputes which users get a precomputed news feed from their follow counts
+    follow_user and unfollow_user keep this current on their own; it is only needed
+    after follows were written some other way, load_follows runs it itself
+    """
+    return follow_collection.refresh_fanout()
+
+
+def get_news_feed(
+    user_id: str,
+    limit: int,
+    cursor: tuple[datetime, str] | None,
+    follow_collection: FollowCollection,
+) -> list[UserStatus]:
+    return follow_collection.get_news_feed(user_id, limit, cursor)
+
+
+# Columns of each export, in the order of the accounts.csv and status_updates.csv headers
+USER_EXPORT_COLUMNS = {
+    AccountFields.USER_ID: UsersTable.user_id,
+    AccountFields.USER_NAME: UsersTable.user_name,
+    AccountFields.USER_LAST_NAME: UsersTable.user_last_name,
+    AccountFields.EMAIL: UsersTable.user_email,
+}
+STATUS_EXPORT_COLUMNS = {
+    StatusFields.STATUS_ID: UserStatusTable.status_id,
+    StatusFields.USER_ID: UserStatusTable.user_id,
+    StatusFields.STATUS_TEXT: UserStatusTable.status_text,
+}
+
+# Import rows are checked against the same model columns
+USER_VALIDATOR = RowValidator(
+    AccountFields, USER_EXPORT_COLUMNS, email_fields=[AccountFields.EMAIL]
+)
+STATUS_VALIDATOR = RowValidator(StatusFields, STATUS_EXPORT_COLUMNS)
+FOLLOW_VALIDATOR = RowValidator(
+    FollowFields,
+    {
+        FollowFields.FOLLOWER_ID: FollowsTable.follower,
+        FollowFields.FOLLOWEE_ID: FollowsTable.followee,
+    },
+)
+
+
+def _export(
+    filename: str, model: type[Model], columns: dict, label: str, **options
+) -> tuple[int, float] | None:
+    """
+    Streams every row of model to filename and logs the throughput
+    Rows come straight off the cursor with .tuples().iterator(), so the query never
+    caches its results and memory stays flat whatever the table size
+    Returns the (row_count, seconds) of the export, or None if it failed
+    """
+    query = (
+        model.select(*columns.values())
+        .order_by(model._meta.primary_key)
+        .tuples()
+        .iterator()
+    )
+    header = [field.value.upper() for field in columns]
+    start = time.perf_counter()
+    try:
+        count = write_export(filename, header, query, **options)
+    except (OSError, ValueError, DatabaseError) as e:
+        logger.error(f"Export to '{filename}' failed: {e}")
+        return None
+    seconds = time.perf_counter() - start
+    rate = count / seconds if seconds else 0.0
+    logger.info(
+        f"{count} {label} exported to '{filename}' in {seconds:.2f}s "
+        f"({rate:.0f} rows/s)."
+    )
+    return count, seconds
+
+
+@timed("export_users", failed=_is_none, rows=_exported_rows)
+def export_users(
+    filename: str, fmt: str | None = None, compress: bool | None = None
+) -> tuple[int, float] | None:
+    """
+    Exports every user to a csv file with the accounts.csv header, or to jsonl
+    The format and gzip compression follow the extension (.csv, .jsonl, .csv.gz,
+    .jsonl.gz) unless fmt or compress are given
+    """
+    return _export(
+        filename, UsersTable, USER_EXPORT_COLUMNS, "users", fmt=fmt, compress=compress
+    )
+
+
+@timed("export_status_updates", failed=_is_none, rows=_exported_rows)
+def export_status_updates(
+    filename: str, fmt: str | None = None, compress: bool | None = None
+) -> tuple[int, float] | None:
+    """
+    Exports every status like export_users, with the status_updates.csv header
+    """
+    return _export(
+        filename,
+        UserStatusTable,
+        STATUS_EXPORT_COLUMNS,
+        "statuses",
+        fmt=fmt,
+        compress=compress,
+    )
+
+
+def get_stats() -> dict:
+    """
+    Returns the per-operation counters and latency histograms recorded so far
+    Recording is off until instrumentation.enable() is called
+    """
+    return instrumentation.get_stats()
@@ -1,5 +1,7 @@
 """
 Provides a basic frontend
+One database connection stays open for the whole session; run with --reconnect
+to open and close it around every menu action instead
 """
 
 import atexit
@@ -7,14 +9,17 @@ import sys
 
 import database_manager as dbm
 import database_utils
+import instrumentation
 import main
+from cache import LRUCache
 
 # Assign database connection from database manager
 active_database = dbm.db
-# Initialize fresh user_collection at startup
-user_collection = main.init_user_collection()
-# Initialize fresh status_collection at startup
-status_collection = main.init_status_collection()
+# Initialize fresh status_collection at startup, caching hot statuses
+status_collection = main.init_status_collection(LRUCache())
+# Initialize fresh user_collection at startup, caching hot users
+# Deleting a user also drops that user's cached statuses
+user_collection = main.init_user_collection(LRUCache(), status_collection.cache)
 # Register close_db to be called when program exits to prevent hanging database connections
 atexit.register(lambda: dbm.close_db(active_database))
 
@@ -28,6 +33,13 @@ MAX_LENGTHS = {
 }
 
 
+# Number of statuses shown per page when listing a user's statuses
+STATUS_PAGE_SIZE = 10
+
+# Number of best matches shown by a status text search
+STATUS_SEARCH_LIMIT = 10
+
+
 # Use helper function to standardize user input checks
 def _get_input(prompt, field_name):
     while True:
@@ -210,6 +222,88 @@ def delete_status():
         print("Status was successfully deleted")
 
 
+def list_user_statuses():
+    """
+    Pages through the status records of a user
+    """
+    user_id = input("\nEnter user ID to list statuses: ").strip()
+    last_status_id = None
+    while True:
+        page = main.get_user_statuses(
+            user_id, last_status_id, STATUS_PAGE_SIZE, status_collection
+        )
+        if not page and last_status_id is None:
+            print("No statuses found for this user")
+            return
+        for status in page:
+            print(f"{status.status_id}: {status.status_text}")
+        if len(page) < STATUS_PAGE_SIZE:
+            print("End of statuses")
+            return
+        # Continue after the last status shown (keyset pagination)
+        last_status_id = page[-1].status_id
+        if input("Press Enter for more or Q to stop: ").strip().upper() == "Q":
+            return
+
+
+def search_statuses():
+    """
+    Finds status records whose text matches the entered words
+    """
+    query = input("\nEnter words to search status text: ").strip()
+    if not query:
+        print("Search text can't be empty.")
+        return
+    results = main.search_statuses(query, STATUS_SEARCH_LIMIT, status_collection)
+    if not results:
+        print("No matching statuses found")
+        return
+    for status in results:
+        print(f"{status.status_id} ({status.user_id}): {status.status_text}")
+
+
+def _export(export, label):
+    """
+    Prompts for an export file and streams the records into it
+    """
+    filename = input(
+        f"\nEnter filename for the {label} export "
+        "(.csv or .jsonl, add .gz to compress): "
+    ).strip()
+    result = export(filename)
+    if result is None:
+        print(f"An error occurred while trying to export {label}")
+        return
+    count, seconds = result
+    rate = count / seconds if seconds else 0
+    print(
+        f"{count} {label} exported to {filename} "
+        f"in {seconds:.2f}s ({rate:.0f} rows/s)."
+    )
+
+
+def export_users():
+    """
+    Exports all user records from the database to a file
+    """
+    _export(main.export_users, "users")
+
+
+def export_status_updates():
+    """
+    Exports all status records from the database to a file
+    """
+    _export(main.export_status_updates, "statuses")
+
+
+def show_stats():
+    """
+    Shows call counts, errors and latencies of the operations run this session
+    """
+    print()
+    print(instrumentation.format_stats(main.get_stats()))
+
+
 def quit_program():
     """
     Quits program
@@ -218,11 +312,20 @@ def quit_program():
 
 
 if __name__ == "__main__":
-    # Connect to database, verify tables exist, disconnect
+    # Keeping the connection open saves the connect per action and keeps SQLite's
+    # page cache warm between actions
+    persistent = "--reconnect" not in sys.argv[1:]
+
+    # Connect to database and verify tables exist, skipped when the recorded
+    # schema version is current
     print("\nVerifying database...")
-    database_utils.ensure_tables(active_database)
-    dbm.close_db(active_database)
+    dbm.open_db(active_database)
+    database_utils.ensure_schema(active_database)
+    if not persistent:
+        dbm.close_db(active_database)
     print("Database verified!")
+    # Record operation latencies for the statistics option
+    instrumentation.enable()
 
     # Use dictionary to map user input to functions
     menu_options = {
@@ -236,6 +339,11 @@ if __name__ == "__main__":
         "H": update_status,
         "I": search_status,
         "J": delete_status,
+        "K": list_user_statuses,
+        "L": search_statuses,
+        "M": export_users,
+        "N": export_status_updates,
+        "O": show_stats,
         "Q": quit_program,
     }
     # Use 'while True' to keep the menu open until the user makes a selection or chooses to exit
@@ -252,16 +360,23 @@ if __name__ == "__main__":
                             H: Update status
                             I: Search status
                             J: Delete status
+                            K: List user statuses
+                            L: Search status text
+                            M: Export users to file
+                            N: Export statuses to file
+                            O: Show operation statistics
                             Q: Quit
 
                             Please enter your choice: """
         ).upper()
         if user_selection in menu_options:
-            # Open database connection and execute user selection
+            # Open database connection (a no-op while it is still open) and
+            # execute user selection
             dbm.open_db(active_database)
             menu_options[user_selection]()
         else:
             print("Invalid option")
 
         # Disconnect from database after the selected option is finished
-        dbm.close_db(active_database)
+        if not persistent:
+            dbm.close_db(active_database)
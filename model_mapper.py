@@ -14,3 +14,9 @@ class StatusFields(Enum):
     STATUS_ID = "status_id"
     USER_ID = "user_id"
     STATUS_TEXT = "status_text"
+
+
+# Class for mapping FollowsTable to follows.csv
+class FollowFields(Enum):
+    FOLLOWER_ID = "follower_id"
+    FOLLOWEE_ID = "followee_id"
@@ -4,7 +4,9 @@ Using peewee for a simple, lightweight database library
 Modeling documentation available at: https://docs.peewee-orm.com/en/latest/peewee/models.html
 """
 
-from peewee import Model, CharField, ForeignKeyField
+from datetime import datetime
+
+from peewee import CharField, CompositeKey, DateTimeField, ForeignKeyField, Model
 
 from database_manager import db
 
@@ -20,11 +22,85 @@ class UsersTable(BaseModel):
     user_id = CharField(primary_key=True, max_length=30)
     user_last_name = CharField(max_length=100)
     user_name = CharField(max_length=30)
+    # Hash of the row as last written by a delta import, cleared by other updates
+    content_hash = CharField(max_length=16, null=True)
 
 
 class UserStatusTable(BaseModel):
     status_id = CharField(primary_key=True)
     status_text = CharField(max_length=1000)
+    # Indexed by the (user_id, status_id) index below
+    user_id = ForeignKeyField(
+        UsersTable,
+        backref="statuses",
+        column_name="user_id",
+        on_delete="CASCADE",
+        index=False,
+    )
+    # Hash of the row as last written by a delta import, cleared by other updates
+    content_hash = CharField(max_length=16, null=True)
+    # Filled from the default on every insert; existing rows get the migration time
+    created_at = DateTimeField(default=datetime.now)
+
+    class Meta:
+        indexes = (
+            # Serves per-user lookups, the delete cascade and keyset pagination by status_id
+            (("user_id", "status_id"), False),
+            # Serves timelines newest first, status_id breaks ties within one instant
+            (("user_id", "created_at", "status_id"), False),
+        )
+
+
+class FollowsTable(BaseModel):
+    follower = ForeignKeyField(
+        UsersTable,
+        backref="following",
+        column_name="follower",
+        on_delete="CASCADE",
+        index=False,
+    )
+    followee = ForeignKeyField(
+        UsersTable,
+        backref="followers",
+        column_name="followee",
+        on_delete="CASCADE",
+        index=False,
+    )
+
+    class Meta:
+        # The primary key index serves who a user follows, the index below who follows them
+        primary_key = CompositeKey("follower", "followee")
+        indexes = ((("followee", "follower"), False),)
+
+
+class FanoutTable(BaseModel):
+    # Users whose news feed is precomputed in FeedTable instead of merged on read
+    user_id = ForeignKeyField(
+        UsersTable,
+        backref="+",
+        column_name="user_id",
+        primary_key=True,
+        on_delete="CASCADE",
+    )
+
+
+class FeedTable(BaseModel):
+    # Kept in sync by the triggers in database_utils
     user_id = ForeignKeyField(
-        UsersTable, backref="statuses", column_name="user_id", on_delete="CASCADE"
+        UsersTable,
+        backref="+",
+        column_name="user_id",
+        on_delete="CASCADE",
+        index=False,
+    )
+    # Indexed for the delete cascade
+    status_id = ForeignKeyField(
+        UserStatusTable, backref="+", column_name="status_id", on_delete="CASCADE"
     )
+    # Copied from the status, so a page is read from this table's index alone
+    created_at = DateTimeField()
+
+    class Meta:
+        primary_key = CompositeKey("user_id", "status_id")
+        # Serves feeds newest first, like the status timeline index
+        indexes = ((("user_id", "created_at", "status_id"), False),)
@@ -0,0 +1,176 @@
+"""
+Testing suite for the asyncio facade
+Uses a file-backed pool configured like the main database, because the calls run on
+worker threads that pass pooled connections between them
+Patching the logger to avoid writing tests to the log file
+"""
+
+# pylint: disable=E1120,W0621
+
+import asyncio
+import csv
+import time
+from unittest.mock import patch
+
+import pytest
+
+from async_api import AsyncSocialNetwork
+from database_manager import pooled_db
+from socialnetwork_model import (
+    FanoutTable,
+    FeedTable,
+    FollowsTable,
+    UsersTable,
+    UserStatusTable,
+)
+
+MODELS = [UsersTable, UserStatusTable, FollowsTable, FanoutTable, FeedTable]
+
+
+@pytest.fixture(autouse=True)
+def file_db(tmp_path):
+    database = pooled_db(str(tmp_path / "async.db"))
+    with database.bind_ctx(MODELS):
+        database.create_tables(MODELS)
+        # Return the connection so worker threads can check it out
+        database.close()
+        with patch("users.logger"), patch("user_status.logger"), patch("main.logger"):
+            yield database
+    database.close_all()
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_crud_round_trip():
+    async def scenario():
+        async with AsyncSocialNetwork() as network:
+            assert await network.add_user("u1", "e@test.com", "First", "Last")
+            assert await network.update_user("u1", "new@test.com", "F", "L")
+            user = await network.search_user("u1")
+            assert user.user_email == "new@test.com"
+            assert await network.add_status("s1", "u1", "hello")
+            assert await network.update_status("s1", "updated")
+            status = await network.search_status("s1")
+            assert status.status_text == "updated"
+            assert [s.status_id for s in await network.get_user_statuses("u1")] == [
+                "s1"
+            ]
+            timeline = await network.get_user_timeline("u1", limit=1)
+            assert [s.status_id for s in timeline] == ["s1"]
+            assert timeline[0].created_at is not None
+            assert await network.add_user("u2", "e@test.com", "Second", "Last")
+            assert await network.follow_user("u2", "u1")
+            feed = await network.get_news_feed("u2")
+            assert [s.status_id for s in feed] == ["s1"]
+            with patch("follows.logger"):
+                assert await network.refresh_fanout() == 0
+            assert await network.unfollow_user("u2", "u1")
+            assert await network.delete_status("s1")
+            assert await network.delete_user("u1")
+
+    run(scenario())
+
+
+def test_batch_variants():
+    async def scenario():
+        async with AsyncSocialNetwork(max_workers=2) as network:
+            users = [(f"u{i}", "e@test.com", "N", "L") for i in range(5)]
+            assert await network.add_users(users + [users[0]]) == [True] * 5 + [False]
+            found = await network.search_users(["u0", "missing"])
+            assert [user.user_id for user in found] == ["u0", None]
+            statuses = [("s1", "u0", "a"), ("s2", "ghost", "b")]
+            assert await network.add_statuses(statuses) == [True, False]
+            found = await network.search_status_ids(["s1", "s2"])
+            assert [status.status_id for status in found] == ["s1", None]
+            assert await network.delete_users(["u4", "missing"]) == [True, False]
+            assert await network.purge_users(["u0", "u1"]) == (2, 1)
+
+    run(scenario())
+
+
+def test_concurrent_calls_respect_limit():
+    async def scenario():
+        async with AsyncSocialNetwork(max_workers=4, max_concurrency=2) as network:
+            results = await asyncio.gather(
+                *(network.add_user(f"u{i}", "e@test.com", "N", "L") for i in range(10))
+            )
+            assert all(results)
+
+    run(scenario())
+    assert UsersTable.select().count() == 10
+
+
+def test_concurrent_reads_and_writes_share_the_pool(file_db):
+    async def scenario():
+        async with AsyncSocialNetwork(max_workers=4) as network:
+            assert await network.add_user("owner", "e@test.com", "N", "L")
+            rounds = []
+            for _ in range(2):
+                results = await asyncio.gather(
+                    *(
+                        network.add_user(f"u{i}", "e@test.com", "N", "L")
+                        for i in range(20)
+                    ),
+                    *(network.add_status(f"s{i}", "owner", "text") for i in range(20)),
+                    *(network.search_user("owner") for _ in range(20)),
+                    *(network.get_user_timeline("owner") for _ in range(20)),
+                )
+                assert all(user.user_id == "owner" for user in results[40:60])
+                assert all(len(timeline) <= 20 for timeline in results[60:])
+                rounds.append(results[:40])
+            return rounds
+
+    first, second = run(scenario())
+    # The second round repeats every primary key
+    assert first == [True] * 40
+    assert second == [False] * 40
+    # Every call checked out a pooled connection and gave it back
+    stats = file_db.pool_stats()
+    assert stats["checkouts"] > 160
+    assert stats["in_use"] == 0
+    assert UsersTable.select().count() == 21
+    assert UserStatusTable.select().count() == 20
+
+
+def test_iter_load_users_streams_progress(tmp_path):
+    path = tmp_path / "users.csv"
+    with open(path, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["USER_ID", "NAME", "LASTNAME", "EMAIL"])
+        writer.writerows([f"u{i}", "N", "L", "e@test.com"] for i in range(7))
+
+    async def scenario():
+        async with AsyncSocialNetwork() as network:
+            return [
+                counts
+                async for counts in network.iter_load_users(str(path), batch_size=3)
+            ]
+
+    assert run(scenario()) == [(3, 0), (6, 0), (7, 0)]
+
+
+def test_iter_load_users_stops_the_load_when_abandoned():
+    finished = []
+
+    def endless_load(filename, _collection, progress):
+        try:
+            for count in range(1, 10_000):
+                progress(count, 0)
+                time.sleep(0.001)
+        finally:
+            finished.append(filename)
+
+    async def scenario():
+        async with AsyncSocialNetwork() as network:
+            with patch("main.load_users", endless_load):
+                stream = network.iter_load_users("users.csv")
+                async for counts in stream:
+                    assert counts == (1, 0)
+                    break
+                await stream.aclose()
+                # The load was stopped and awaited, not left running
+                assert finished == ["users.csv"]
+
+    run(scenario())
@@ -0,0 +1,91 @@
+"""
+Testing suite for the cache file
+"""
+
+from cache import MISSING, LRUCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_put_and_stats():
+    cache = LRUCache(max_size=2)
+    assert cache.get("a") is MISSING
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_none_is_cacheable():
+    cache = LRUCache()
+    cache.put("a", None)
+    assert cache.get("a") is None
+
+
+def test_least_recently_used_is_evicted():
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+    assert len(cache) == 2
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = LRUCache(ttl=10, clock=clock)
+    cache.put("a", 1)
+    clock.now = 9.9
+    assert cache.get("a") == 1
+    clock.now = 10.0
+    assert cache.get("a") is MISSING
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidate_and_invalidate_tag():
+    cache = LRUCache()
+    cache.put("s1", 1, tag="u1")
+    cache.put("s2", 2, tag="u1")
+    cache.put("s3", 3, tag="u2")
+    cache.invalidate("s3")
+    cache.invalidate("missing")
+    cache.invalidate_tag("u1")
+    assert len(cache) == 0
+    assert cache.stats()["invalidations"] == 3
+
+
+def test_replacing_an_entry_moves_its_tag():
+    cache = LRUCache()
+    cache.put("s1", 1, tag="u1")
+    cache.put("s1", 2, tag="u2")
+    cache.invalidate_tag("u1")
+    assert cache.get("s1") == 2
+
+
+def test_put_skips_values_read_before_an_invalidation():
+    cache = LRUCache()
+    generation = cache.generation("a")
+    cache.invalidate("a")
+    cache.put("a", "stale", generation=generation)
+    assert cache.get("a") is MISSING
+
+    generation = cache.generation("a")
+    cache.put("a", "fresh", generation=generation)
+    assert cache.get("a") == "fresh"
+
+    generation = cache.generation("s1")
+    cache.invalidate_tag("u1")
+    cache.put("s1", "stale", tag="u1", generation=generation)
+    assert cache.get("s1") is MISSING
@@ -0,0 +1,48 @@
+"""
+Testing suite for the checkpoint file
+Patching the logger to avoid writing tests to the log file
+"""
+
+from unittest.mock import patch
+
+from checkpoint import ImportCheckpoint
+
+
+def test_save_load_clear(tmp_path):
+    data_file = tmp_path / "data.csv"
+    data_file.write_bytes(b"A,B\n1,2\n3,4\n")
+    checkpoint = ImportCheckpoint(str(data_file))
+    assert checkpoint.load() is None
+
+    checkpoint.save(8, 1, 1, 0)
+    with patch("checkpoint.logger.info"):
+        state = checkpoint.load()
+    assert state["offset"] == 8
+    assert state["row"] == 1
+    assert state["new_count"] == 1
+
+    checkpoint.clear()
+    assert checkpoint.load() is None
+
+
+def test_changed_file_invalidates_checkpoint(tmp_path):
+    data_file = tmp_path / "data.csv"
+    data_file.write_bytes(b"A,B\n1,2\n3,4\n")
+    checkpoint = ImportCheckpoint(str(data_file))
+    checkpoint.save(8, 1, 1, 0)
+
+    data_file.write_bytes(b"A,B\n9,9\n3,4\n")
+    with patch("checkpoint.logger.error"):
+        assert checkpoint.load() is None
+
+
+def test_changes_after_offset_keep_checkpoint(tmp_path):
+    data_file = tmp_path / "data.csv"
+    data_file.write_bytes(b"A,B\n1,2\n3,\n")
+    checkpoint = ImportCheckpoint(str(data_file))
+    checkpoint.save(8, 1, 1, 0)
+
+    # Fixing a row after the checkpoint still allows the import to resume
+    data_file.write_bytes(b"A,B\n1,2\n3,4\n")
+    with patch("checkpoint.logger.info"):
+        assert checkpoint.load()["offset"] == 8
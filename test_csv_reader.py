@@ -0,0 +1,152 @@
+"""
+Testing suite for the csv_reader file
+Patching the logger to avoid writing tests to the log file
+"""
+
+import csv
+import io
+
+from csv_reader import (
+    read_batches,
+    read_batches_parallel,
+    read_header,
+    split_ranges,
+    validate_batch,
+)
+from main import STATUS_VALIDATOR
+from model_mapper import StatusFields
+
+CSV_BYTES = (
+    b"STATUS_ID,USER_ID,STATUS_TEXT\r\n"
+    b"s1,u1,hello\r\n"
+    b's2,u1,"multi\r\nline"\r\n'
+    b"\r\n"
+    b"s3,u2,bye\r\n"
+)
+
+
+def test_read_header_lowercases_and_reports_offset():
+    header, offset = read_header(io.BytesIO(CSV_BYTES))
+    assert header == ["status_id", "user_id", "status_text"]
+    assert offset == len(b"STATUS_ID,USER_ID,STATUS_TEXT\r\n")
+
+
+def test_read_batches_tracks_offsets():
+    batches = list(read_batches(io.BytesIO(CSV_BYTES), StatusFields, 2))
+    assert [list(batch) for batch in batches] == [
+        [("s1", "u1", "hello"), ("s2", "u1", "multi\r\nline")],
+        [("s3", "u2", "bye")],
+    ]
+    assert batches[0].end_row == 2
+    assert CSV_BYTES[batches[0].end_offset :].startswith(b"\r\ns3")
+    assert batches[1].end_row == 3
+    assert batches[1].end_offset == len(CSV_BYTES)
+
+
+def test_read_batches_resumes_from_offset():
+    first = next(read_batches(io.BytesIO(CSV_BYTES), StatusFields, 2))
+    resumed = list(
+        read_batches(
+            io.BytesIO(CSV_BYTES), StatusFields, 2, first.end_offset, first.end_row
+        )
+    )
+    assert [list(batch) for batch in resumed] == [[("s3", "u2", "bye")]]
+    assert resumed[0].end_row == 3
+
+
+def test_read_batches_passes_incomplete_rows_through():
+    data = b"STATUS_ID,USER_ID,STATUS_TEXT\ns1,,hello\ns2,u1\n"
+    batches = list(read_batches(io.BytesIO(data), StatusFields, 10))
+    # Checking values is left to the validation stage
+    assert list(batches[0]) == [("s1", "", "hello"), ("s2", "u1", None)]
+    assert batches[0].rejected == []
+
+
+def _write(tmp_path, data: bytes) -> str:
+    path = tmp_path / "statuses.csv"
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_split_ranges_never_splits_quoted_newlines():
+    data = (
+        b"STATUS_ID,USER_ID,STATUS_TEXT\n"
+        + b's1,u1,"a\nlong\nquoted ""text""\nfield"\n' * 20
+        + b"s2,u1,plain\n" * 20
+    )
+    _, header_end = read_header(io.BytesIO(data))
+    for range_bytes in (1, 7, 50, 1000):
+        ranges = split_ranges(io.BytesIO(data), header_end, range_bytes)
+        assert ranges[0][0] == header_end
+        assert ranges[-1][1] == len(data)
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            assert end == start
+        rows = []
+        for start, end in ranges:
+            rows.extend(csv.reader(io.StringIO(data[start:end].decode())))
+        assert len(rows) == 40
+        assert all(len(row) == 3 for row in rows)
+
+
+def test_read_batches_parallel_matches_read_batches(tmp_path):
+    data = CSV_BYTES + b"".join(
+        f's{i},u{i % 3},"text {i}\r\nsecond line"\r\n'.encode() for i in range(4, 60)
+    )
+    path = _write(tmp_path, data)
+    expected = list(read_batches(io.BytesIO(data), StatusFields, 7))
+    batches = list(
+        read_batches_parallel(path, StatusFields, 7, workers=2, range_bytes=200)
+    )
+    assert [row for batch in batches for row in batch] == [
+        row for batch in expected for row in batch
+    ]
+    assert batches[-1].end_row == expected[-1].end_row == 59
+    assert batches[-1].end_offset == len(data)
+    # Every batch ends on a record boundary that a resumed import can start from
+    for batch in batches:
+        resumed = next(
+            read_batches(io.BytesIO(data), StatusFields, 1, batch.end_offset), None
+        )
+        if resumed is not None:
+            assert resumed[0][0] == f"s{batch.end_row + 1}"
+
+
+def test_read_batches_parallel_resumes_from_offset(tmp_path):
+    path = _write(tmp_path, CSV_BYTES + b"s4,,missing\r\n")
+    first = next(read_batches(io.BytesIO(CSV_BYTES), StatusFields, 2))
+    batches = list(
+        read_batches_parallel(
+            path, StatusFields, 10, first.end_offset, first.end_row, workers=1
+        )
+    )
+    assert [list(batch) for batch in batches] == [
+        [("s3", "u2", "bye"), ("s4", "", "missing")]
+    ]
+    assert batches[0].end_row == 4
+
+
+def test_read_batches_parallel_validates_in_workers(tmp_path):
+    data = CSV_BYTES + b"".join(
+        f"s{i},{'' if i % 5 == 0 else 'u1'},text {i}\r\n".encode() for i in range(4, 40)
+    )
+    path = _write(tmp_path, data)
+    expected = [
+        validate_batch(batch, STATUS_VALIDATOR)
+        for batch in read_batches(io.BytesIO(data), StatusFields, 7)
+    ]
+    batches = list(
+        read_batches_parallel(
+            path,
+            StatusFields,
+            7,
+            workers=2,
+            range_bytes=200,
+            validator=STATUS_VALIDATOR,
+        )
+    )
+    assert [row for batch in batches for row in batch] == [
+        row for batch in expected for row in batch
+    ]
+    rejected = [row for batch in batches for row in batch.rejected]
+    assert rejected == [row for batch in expected for row in batch.rejected]
+    assert rejected[0] == (("s5", "", "text 5"), "missing user_id")
@@ -3,6 +3,10 @@ Testing suite for the database_manager
 Patching the logger to avoid writing tests to the log file
 """
 
+# pylint: disable=W0212
+
+import threading
+import time
 from unittest.mock import MagicMock, patch
 from peewee import SqliteDatabase
 
@@ -57,3 +61,212 @@ def test_temp_db_is_sqlite_and_in_memory():
 def test_main_db_is_sqlite_and_file_based():
     assert isinstance(database_manager.db, SqliteDatabase)
     assert database_manager.db.database == "socialnetwork.db"
+
+
+def test_profiles_cover_the_same_pragmas():
+    keys = set(database_manager.PRAGMA_PROFILES["default"])
+    for profile in database_manager.PRAGMA_PROFILES.values():
+        assert set(profile) == keys
+
+
+def test_apply_profile_sets_pragmas():
+    database_manager.temp_db.connect()
+    try:
+        database_manager.apply_profile(database_manager.temp_db, "read_heavy")
+        pragmas = database_manager.get_pragmas(database_manager.temp_db)
+        assert pragmas["cache_size"] == -131072
+        assert pragmas["synchronous"] == 1
+        assert pragmas["temp_store"] == 2
+    finally:
+        database_manager.temp_db.close()
+
+
+def test_bulk_load_profile_restores_pragmas(tmp_path):
+    file_db = SqliteDatabase(str(tmp_path / "test.db"))
+    file_db.connect()
+    before = database_manager.get_pragmas(file_db)
+    with database_manager.bulk_load_profile(file_db):
+        assert file_db.pragma("journal_mode") == "wal"
+        assert file_db.pragma("synchronous") == 0
+    assert database_manager.get_pragmas(file_db) == before
+    file_db.close()
+
+
+def test_bulk_load_profile_skipped_in_transaction():
+    database_manager.temp_db.connect()
+    try:
+        before = database_manager.get_pragmas(database_manager.temp_db)
+        with database_manager.temp_db.atomic():
+            with patch("database_manager.logger") as mock_logger:
+                with database_manager.bulk_load_profile(database_manager.temp_db):
+                    mock_logger.info.assert_called_once()
+        assert database_manager.get_pragmas(database_manager.temp_db) == before
+    finally:
+        database_manager.temp_db.close()
+
+
+def test_main_db_is_pooled():
+    assert isinstance(database_manager.db, database_manager.MeteredPooledSqliteDatabase)
+    assert database_manager.db._max_connections == database_manager.POOL_MAX_CONNECTIONS
+
+
+def make_pool(tmp_path, **kwargs):
+    return database_manager.MeteredPooledSqliteDatabase(
+        str(tmp_path / "pool.db"), pragmas={"foreign_keys": 1}, **kwargs
+    )
+
+
+def test_pool_reuses_connections(tmp_path):
+    pool = make_pool(tmp_path, max_connections=2)
+    pool.connect()
+    first = pool.connection()
+    pool.close()
+    pool.connect()
+    assert pool.connection() is first
+    pool.close()
+    stats = pool.pool_stats()
+    assert stats["checkouts"] == 2
+    assert stats["idle"] == 1
+    assert stats["in_use"] == 0
+    pool.close_all()
+
+
+def test_pool_gives_each_thread_its_own_connection(tmp_path):
+    pool = make_pool(tmp_path, max_connections=4)
+    connections = []
+    barrier = threading.Barrier(3)
+
+    def worker():
+        pool.connect()
+        connections.append(pool.connection())
+        # Hold the connection until every thread has one
+        barrier.wait()
+        pool.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(conn) for conn in connections}) == 3
+    assert pool.pool_stats()["idle"] == 3
+    pool.close_all()
+
+
+def test_pool_connection_reused_by_another_thread(tmp_path):
+    pool = make_pool(tmp_path, max_connections=1)
+    pool.execute_sql("CREATE TABLE items (name TEXT)")
+    first = pool.connection()
+    pool.close()
+    results = []
+
+    def worker():
+        # The only pooled connection was opened and released by the main thread
+        pool.connect()
+        results.append(pool.connection() is first)
+        pool.execute_sql("INSERT INTO items VALUES ('thread')")
+        results.append(pool.execute_sql("SELECT name FROM items").fetchall())
+        pool.close()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    assert results == [True, [("thread",)]]
+    pool.close_all()
+
+
+def test_main_db_allows_cross_thread_connections():
+    assert database_manager.db.connect_params["check_same_thread"] is False
+
+
+def test_pool_records_waits(tmp_path):
+    pool = make_pool(tmp_path, max_connections=1, timeout=5)
+    pool.connect()
+    waited = threading.Event()
+
+    def worker():
+        pool.connect()
+        waited.set()
+        pool.close()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    time.sleep(0.2)
+    assert not waited.is_set()
+    pool.close()
+    thread.join()
+    stats = pool.pool_stats()
+    assert stats["waits"] == 1
+    assert stats["wait_seconds"] > 0
+    pool.close_all()
+
+
+def test_pool_closes_idle_connections(tmp_path):
+    pool = make_pool(tmp_path, idle_timeout=0.05)
+    pool.connect()
+    first = pool.connection()
+    pool.close()
+    time.sleep(0.1)
+    pool.connect()
+    assert pool.connection() is not first
+    pool.close()
+    assert pool.pool_stats()["recycled"] == 1
+    pool.close_all()
+
+
+def _traced_database(tmp_path):
+    database = SqliteDatabase(str(tmp_path / "trace.db"))
+    database.execute_sql("CREATE TABLE item (id INTEGER PRIMARY KEY, name TEXT)")
+    database.execute_sql("CREATE INDEX item_name ON item (name)")
+    database.execute_sql("CREATE TABLE note (body TEXT)")
+    return database
+
+
+def test_query_tracer_logs_statements_and_slow_plans(tmp_path):
+    database = _traced_database(tmp_path)
+    query_log = tmp_path / "queries.log"
+    slow_log = tmp_path / "slow.log"
+    tracer = database_manager.QueryTracer(
+        database,
+        slow_seconds=0,
+        query_log=str(query_log),
+        slow_query_log=str(slow_log),
+    )
+    with tracer:
+        database.execute_sql("SELECT id FROM item WHERE name = ?", ("a",))
+        database.execute_sql("SELECT body FROM note WHERE body = ?", ("b",))
+        database.execute_sql("INSERT INTO note (body) VALUES (?)", ("c",))
+    assert tracer not in database.query_hooks
+
+    indexed, scan, insert = tracer.slow_queries
+    assert not indexed["full_scan"]
+    assert any("USING COVERING INDEX item_name" in step for step in indexed["plan"])
+    assert scan["full_scan"]
+    assert insert["plan"] == []
+    assert tracer.stats()["statements"] == 3
+
+    assert "SELECT body FROM note" in query_log.read_text()
+    assert "FULL TABLE SCAN" in slow_log.read_text()
+    # Traces stay out of the main log
+    with patch("database_manager.logger.info"):
+        database.execute_sql("SELECT 1")
+    assert query_log.read_text().count("SELECT") == 2
+
+
+def test_query_tracer_threshold(tmp_path):
+    database = _traced_database(tmp_path)
+    tracer = database_manager.QueryTracer(
+        database,
+        slow_seconds=60,
+        log_statements=False,
+        query_log=str(tmp_path / "queries.log"),
+        slow_query_log=str(tmp_path / "slow.log"),
+    )
+    with tracer:
+        database.execute_sql("SELECT * FROM note")
+    assert tracer.stats() == {
+        "statements": 1,
+        "total_seconds": tracer.total_seconds,
+        "slow": 0,
+    }
+    assert not (tmp_path / "queries.log").exists()
@@ -0,0 +1,282 @@
+"""
+Testing suite for the database_utils file
+Patching the logger to avoid writing tests to the log file
+"""
+
+# pylint: disable=E1120, W0212
+
+from unittest.mock import patch
+
+from peewee import SqliteDatabase
+
+import database_utils
+from socialnetwork_model import (
+    FanoutTable,
+    FeedTable,
+    FollowsTable,
+    UsersTable,
+    UserStatusTable,
+)
+
+MODELS = [UsersTable, UserStatusTable, FollowsTable, FanoutTable, FeedTable]
+
+
+def test_ensure_tables_creates_tables_and_indexes():
+    database = SqliteDatabase(":memory:")
+    with database.bind_ctx(MODELS):
+        with patch("database_utils.logger"):
+            database_utils.ensure_tables(database)
+        assert {"userstable", "userstatustable"} <= set(database.get_tables())
+        assert "userstatustable_user_id_status_id" in database_utils.current_indexes(
+            database, "userstatustable"
+        )
+
+
+def test_ensure_tables_adds_missing_index_to_existing_table():
+    database = SqliteDatabase(":memory:")
+    with database.bind_ctx(MODELS):
+        database.create_tables(MODELS)
+        database.execute_sql('DROP INDEX "userstatustable_user_id_status_id"')
+        with patch("database_utils.logger") as mock_logger:
+            database_utils.ensure_tables(database)
+            mock_logger.info.assert_any_call(
+                "Created indexes: ['userstatustable_user_id_status_id']"
+            )
+        assert "userstatustable_user_id_status_id" in database_utils.current_indexes(
+            database, "userstatustable"
+        )
+
+
+def _search(database, query):
+    cursor = database.execute_sql(
+        f"SELECT rowid FROM {database_utils.STATUS_SEARCH_TABLE} "
+        f"WHERE {database_utils.STATUS_SEARCH_TABLE} MATCH ?",
+        (query,),
+    )
+    return cursor.fetchall()
+
+
+def test_ensure_tables_indexes_existing_statuses():
+    database = SqliteDatabase(":memory:")
+    with database.bind_ctx(MODELS):
+        database.create_tables(MODELS)
+        UsersTable.create(
+            user_id="u1", user_email="e", user_name="n", user_last_name="l"
+        )
+        UserStatusTable.create(status_id="s1", user_id="u1", status_text="hello world")
+        with patch("database_utils.logger"):
+            database_utils.ensure_tables(database)
+        assert len(_search(database, "hello")) == 1
+        assert set(database_utils.STATUS_SEARCH_TRIGGERS) <= (
+            database_utils.current_triggers(database)
+        )
+
+
+def test_deferred_status_search_indexes_only_new_rows():
+    database = SqliteDatabase(":memory:")
+    with database.bind_ctx(MODELS):
+        with patch("database_utils.logger"):
+            database_utils.ensure_tables(database)
+        UsersTable.create(
+            user_id="u1", user_email="e", user_name="n", user_last_name="l"
+        )
+        UserStatusTable.create(status_id="s0", user_id="u1", status_text="before")
+        with patch("database_utils.rebuild_status_search") as mock_rebuild:
+            with database_utils.deferred_status_search(database, min_rows=0):
+                triggers = database_utils.current_triggers(database)
+                assert database_utils.STATUS_SEARCH_INSERT_TRIGGER not in triggers
+                UserStatusTable.create(status_id="s1", user_id="u1", status_text="bulk")
+                assert not _search(database, "bulk")
+            mock_rebuild.assert_not_called()
+        assert len(_search(database, "bulk")) == 1
+        assert len(_search(database, "before")) == 1
+        # The triggers are back for ordinary writes
+        UserStatusTable.update(status_text="edited").where(
+            UserStatusTable.status_id == "s1"
+        ).execute()
+        assert not _search(database, "bulk")
+        assert len(_search(database, "edited")) == 1
+
+
+def test_deferred_status_search_defers_above_min_rows():
+    database = SqliteDatabase(":memory:")
+    with database.bind_ctx(MODELS):
+        with patch("database_utils.logger"):
+            database_utils.ensure_tables(database)
+        UsersTable.create(
+            user_id="u1", user_email="e", user_name="n", user_last_name="l"
+        )
+        with database_utils.deferred_status_search(database, min_rows=3) as add_rows:
+            add_rows(2)
+            UserStatusTable.create(status_id="s1", user_id="u1", status_text="small")
+            # Below min_rows the triggers index every row
+            assert len(_search(database, "small")) == 1
+            add_rows(1)
+            triggers = database_utils.current_triggers(database)
+            assert database_utils.STATUS_SEARCH_INSERT_TRIGGER not in triggers
+            UserStatusTable.create(status_id="s2", user_id="u1", status_text="large")
+        assert len(_search(database, "small")) == 1
+        assert len(_search(database, "large")) == 1
+        assert set(database_utils.STATUS_SEARCH_TRIGGERS) <= (
+            database_utils.current_triggers(database)
+        )
+
+
+def test_deferred_status_search_leaves_small_writes_to_triggers():
+    database = SqliteDatabase(":memory:")
+    with database.bind_ctx(MODELS):
+        with patch("database_utils.logger"):
+            database_utils.ensure_tables(database)
+        with patch("database_utils.index_new_statuses") as mock_index:
+            with database_utils.deferred_status_search(database) as add_rows:
+                add_rows(database_utils.DEFER_SEARCH_MIN_ROWS - 1)
+            mock_index.assert_not_called()
+
+
+def test_deferred_status_search_fans_out_statuses_once():
+    database = SqliteDatabase(":memory:")
+    with database.bind_ctx(MODELS):
+        with patch("database_utils.logger"):
+            database_utils.ensure_tables(database)
+        for user_id in ("author", "reader"):
+            UsersTable.create(
+                user_id=user_id, user_email="e", user_name="n", user_last_name="l"
+            )
+        FollowsTable.create(follower="reader", followee="author")
+        FanoutTable.create(user_id="reader")
+        UserStatusTable.create(status_id="s1", user_id="author", status_text="old")
+        with database_utils.deferred_status_search(database, min_rows=0):
+            assert database_utils.STATUS_FEED_TRIGGER not in (
+                database_utils.current_triggers(database)
+            )
+            UserStatusTable.create(status_id="s2", user_id="author", status_text="new")
+            assert FeedTable.select().count() == 1
+        feed = FeedTable.select(FeedTable.status_id).order_by(FeedTable.status_id)
+        assert [status_id for (status_id,) in feed.tuples()] == ["s1", "s2"]
+        # The trigger is back for ordinary writes
+        UserStatusTable.create(status_id="s3", user_id="author", status_text="next")
+        assert FeedTable.select().count() == 3
+
+
+def test_deferred_status_search_keeps_schema_version():
+    database = SqliteDatabase(":memory:")
+    with database.bind_ctx(MODELS):
+        with patch("database_utils.logger"):
+            database_utils.ensure_tables(database)
+        with database_utils.deferred_status_search(database, min_rows=0):
+            assert database_utils.schema_version(database) == 0
+        assert database_utils.schema_version(database) == database_utils.SCHEMA_VERSION
+
+
+def test_ensure_schema_repairs_interrupted_deferred_search():
+    database = SqliteDatabase(":memory:")
+    with database.bind_ctx(MODELS):
+        with patch("database_utils.logger"):
+            database_utils.ensure_schema(database)
+        UsersTable.create(
+            user_id="u1", user_email="e", user_name="n", user_last_name="l"
+        )
+        # Entered and never exited, as when the import process is killed
+        interrupted = database_utils.deferred_status_search(database, min_rows=0)
+        interrupted.__enter__()
+        UserStatusTable.create(status_id="s1", user_id="u1", status_text="lost")
+
+        with patch("database_utils.logger"):
+            assert database_utils.ensure_schema(database) is True
+        assert len(_search(database, "lost")) == 1
+        assert set(database_utils.STATUS_SEARCH_TRIGGERS) <= (
+            database_utils.current_triggers(database)
+        )
+
+
+def test_ensure_tables_repairs_missing_trigger():
+    database = SqliteDatabase(":memory:")
+    with database.bind_ctx(MODELS):
+        with patch("database_utils.logger"):
+            database_utils.ensure_tables(database)
+        trigger = next(iter(database_utils.STATUS_SEARCH_TRIGGERS))
+        database.execute_sql(f"DROP TRIGGER {trigger}")
+        UsersTable.create(
+            user_id="u1", user_email="e", user_name="n", user_last_name="l"
+        )
+        UserStatusTable.create(status_id="s1", user_id="u1", status_text="missed")
+        with patch("database_utils.logger"):
+            database_utils.ensure_tables(database)
+        assert len(_search(database, "missed")) == 1
+
+
+def test_ensure_tables_records_schema_version():
+    database = SqliteDatabase(":memory:")
+    with database.bind_ctx(MODELS):
+        assert database_utils.schema_version(database) == 0
+        with patch("database_utils.logger"):
+            database_utils.ensure_tables(database)
+        assert database_utils.schema_version(database) == database_utils.SCHEMA_VERSION
+
+
+def test_ensure_schema_skips_verified_database():
+    database = SqliteDatabase(":memory:")
+    with database.bind_ctx(MODELS):
+        with patch("database_utils.logger"):
+            assert database_utils.ensure_schema(database) is True
+            with patch("database_utils.ensure_tables") as mock_ensure:
+                assert database_utils.ensure_schema(database) is False
+                mock_ensure.assert_not_called()
+
+
+def test_ensure_schema_upgrades_older_version():
+    database = SqliteDatabase(":memory:")
+    with database.bind_ctx(MODELS):
+        database.create_tables(MODELS)
+        database.pragma("user_version", database_utils.SCHEMA_VERSION - 1)
+        with patch("database_utils.logger"):
+            assert database_utils.ensure_schema(database) is True
+        assert database_utils.STATUS_SEARCH_TABLE in database.get_tables()
+        assert database_utils.schema_version(database) == database_utils.SCHEMA_VERSION
+
+
+def test_drop_tables_resets_schema_version():
+    database = SqliteDatabase(":memory:")
+    with database.bind_ctx(MODELS):
+        with patch("database_utils.logger"):
+            database_utils.ensure_tables(database)
+            database_utils.drop_tables(database)
+        assert database_utils.schema_version(database) == 0
+
+
+def test_ensure_tables_adds_missing_column():
+    database = SqliteDatabase(":memory:")
+    with database.bind_ctx(MODELS):
+        database.create_tables(MODELS)
+        database.execute_sql("ALTER TABLE userstable DROP COLUMN content_hash")
+        UsersTable.insert(
+            user_id="u1", user_email="e", user_name="n", user_last_name="l"
+        ).execute()
+        with patch("database_utils.logger") as mock_logger:
+            database_utils.ensure_tables(database)
+            mock_logger.info.assert_any_call(
+                "Added columns: ['userstable.content_hash']"
+            )
+        assert "content_hash" in database_utils.current_columns(database, "userstable")
+        assert UsersTable.get_by_id("u1").content_hash is None
+
+
+def test_ensure_tables_backfills_created_at():
+    database = SqliteDatabase(":memory:")
+    with database.bind_ctx(MODELS):
+        database.create_tables(MODELS)
+        database.execute_sql("DROP INDEX userstatustable_user_id_created_at_status_id")
+        database.execute_sql("ALTER TABLE userstatustable DROP COLUMN created_at")
+        UsersTable.insert(
+            user_id="u1", user_email="e", user_name="n", user_last_name="l"
+        ).execute()
+        database.execute_sql(
+            "INSERT INTO userstatustable (status_id, user_id, status_text) "
+            "VALUES ('s1', 'u1', 'old')"
+        )
+        with patch("database_utils.logger"):
+            database_utils.ensure_tables(database)
+        assert UserStatusTable.get_by_id("s1").created_at is not None
+        assert "userstatustable_user_id_created_at_status_id" in (
+            database_utils.current_indexes(database, "userstatustable")
+        )
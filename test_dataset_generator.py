@@ -0,0 +1,96 @@
+"""
+Testing suite for the dataset_generator file
+"""
+
+import csv
+import random
+from collections import Counter
+
+import pytest
+
+from dataset_generator import (
+    STATUS_HEADER,
+    USER_HEADER,
+    ZipfSampler,
+    generate_statuses,
+    generate_users,
+)
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as csvfile:
+        return list(csv.reader(csvfile))
+
+
+def test_same_seed_same_files(tmp_path):
+    for name in ("a", "b"):
+        generate_users(str(tmp_path / f"{name}_users.csv"), 50, seed=7)
+        generate_statuses(str(tmp_path / f"{name}_statuses.csv"), 50, 200, seed=7)
+    assert read_rows(tmp_path / "a_users.csv") == read_rows(tmp_path / "b_users.csv")
+    assert read_rows(tmp_path / "a_statuses.csv") == read_rows(
+        tmp_path / "b_statuses.csv"
+    )
+    generate_users(str(tmp_path / "c_users.csv"), 50, seed=8)
+    assert read_rows(tmp_path / "c_users.csv") != read_rows(tmp_path / "a_users.csv")
+
+
+def test_clean_files_match_the_schemas(tmp_path):
+    users_path, statuses_path = tmp_path / "users.csv", tmp_path / "statuses.csv"
+    assert generate_users(str(users_path), 100, seed=1)["rows"] == 100
+    assert generate_statuses(str(statuses_path), 100, 500, seed=1)["rows"] == 500
+
+    users = read_rows(users_path)
+    statuses = read_rows(statuses_path)
+    assert users[0] == USER_HEADER
+    assert statuses[0] == STATUS_HEADER
+    user_ids = {row[0] for row in users[1:]}
+    assert len(user_ids) == 100
+    # Every status belongs to a generated user and has a unique id
+    assert {row[1] for row in statuses[1:]} <= user_ids
+    assert len({row[0] for row in statuses[1:]}) == 500
+    assert all(all(row) for row in users + statuses)
+
+
+def test_statuses_per_user_are_skewed(tmp_path):
+    path = tmp_path / "statuses.csv"
+    generate_statuses(str(path), 1000, 20000, seed=3, zipf_exponent=1.2)
+    per_user = Counter(row[1] for row in read_rows(path)[1:])
+    busiest = per_user.most_common(10)
+    # The ten busiest of 1000 users post over a third of the statuses
+    assert sum(count for _, count in busiest) > 20000 / 3
+
+
+def test_injected_faults(tmp_path):
+    path = tmp_path / "statuses.csv"
+    counts = generate_statuses(
+        str(path),
+        100,
+        5000,
+        seed=5,
+        duplicate_rate=0.05,
+        missing_rate=0.02,
+        orphan_rate=0.03,
+    )
+    rows = read_rows(path)[1:]
+    assert len(rows) == counts["rows"] == 5000 + counts["duplicates"]
+    assert sum(1 for row in rows if not all(row)) >= counts["missing"]
+    assert sum(1 for row in rows if row[1].startswith("Ghost.")) >= 1
+    for key, rate, total in (
+        ("duplicates", 0.05, 5000),
+        ("missing", 0.02, 5000),
+        ("orphans", 0.03, 5000),
+    ):
+        assert abs(counts[key] - rate * total) < rate * total * 0.5
+
+
+def test_zipf_sampler_matches_distribution():
+    sampler = ZipfSampler(100, 1.0, random.Random(0))
+    counts = Counter(sampler.sample() for _ in range(50000))
+    harmonic = sum(1 / k for k in range(1, 101))
+    assert counts[1] / 50000 == pytest.approx(1 / harmonic, rel=0.05)
+    assert set(counts) <= set(range(1, 101))
+
+
+def test_zipf_sampler_rejects_bad_arguments():
+    with pytest.raises(ValueError):
+        ZipfSampler(0, 1.1, random.Random(0))
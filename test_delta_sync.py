@@ -0,0 +1,81 @@
+"""
+Testing suite for the delta_sync file
+"""
+
+# pylint: disable=E1101, E1120, W0212
+
+from unittest.mock import patch
+
+import pytest
+
+from database_manager import temp_db
+from delta_sync import DeltaIndex, row_hash
+from socialnetwork_model import UsersTable
+from users import BULK_FIELDS
+
+
+@pytest.fixture(scope="function", autouse=True)
+def setup_and_teardown_db():
+    UsersTable._meta.database = temp_db
+    temp_db.bind([UsersTable], bind_refs=False, bind_backrefs=False)
+    temp_db.connect()
+    temp_db.create_tables([UsersTable])
+    yield
+    temp_db.drop_tables([UsersTable])
+    temp_db.close()
+
+
+def test_row_hash_is_stable_and_separates_values():
+    assert row_hash(("a", "b")) == row_hash(("a", "b"))
+    assert len(row_hash(("a", "b"))) == 16
+    assert row_hash(("ab", "c")) != row_hash(("a", "bc"))
+
+
+def test_delta_index_classifies_rows():
+    stored = ("u1", "a@test.com", "A", "L")
+    UsersTable.insert(
+        dict(zip(BULK_FIELDS, stored)), content_hash=row_hash(stored)
+    ).execute()
+    delta = DeltaIndex(UsersTable, BULK_FIELDS)
+    changed = ("u1", "new@test.com", "A", "L")
+    new = ("u2", "b@test.com", "B", "L")
+    assert delta.classify([stored, new]) == [(*new, row_hash(new))]
+    assert delta.classify([changed]) == []
+    assert delta.counts == {"new": 1, "changed": 0, "unchanged": 1, "skipped": 1}
+
+
+def test_delta_index_hashes_rows_without_stored_hash():
+    stored = ("u1", "a@test.com", "A", "L")
+    UsersTable.insert(dict(zip(BULK_FIELDS, stored))).execute()
+    delta = DeltaIndex(UsersTable, BULK_FIELDS)
+    assert delta.stored_hashes(["u1", "u2"]) == ({"u1": row_hash(stored)}, {"u1"})
+    # Unchanged, but written once so its hash gets stored
+    assert delta.classify([stored]) == [(*stored, row_hash(stored))]
+    assert delta.counts["unchanged"] == 1
+
+
+def test_delta_index_looks_up_hashes_per_batch():
+    rows = [(f"u{i}", "a@test.com", "A", "L") for i in range(3)]
+    UsersTable.insert_many(
+        [(*row, row_hash(row)) for row in rows],
+        fields=[*BULK_FIELDS, UsersTable.content_hash],
+    ).execute()
+    delta = DeltaIndex(UsersTable, BULK_FIELDS)
+    with patch.object(delta, "stored_hashes", wraps=delta.stored_hashes) as mock_lookup:
+        assert delta.classify(rows[:1]) == []
+        assert delta.classify(rows[1:] + rows[:1]) == []
+    assert [call.args for call in mock_lookup.call_args_list] == [
+        (["u0"],),
+        (["u1", "u2"],),
+    ]
+    assert delta.counts == {"new": 0, "changed": 0, "unchanged": 3, "skipped": 1}
+
+
+def test_delta_index_chunks_large_lookups():
+    rows = [(f"u{i}", "a@test.com", "A", "L") for i in range(5)]
+    UsersTable.insert_many(rows, fields=BULK_FIELDS).execute()
+    delta = DeltaIndex(UsersTable, BULK_FIELDS)
+    with patch("delta_sync.SQLITE_MAX_VARIABLES", 2):
+        hashes, unstored = delta.stored_hashes([row[0] for row in rows])
+    assert hashes == {row[0]: row_hash(row) for row in rows}
+    assert len(unstored) == 5
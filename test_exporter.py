@@ -0,0 +1,67 @@
+"""
+Testing suite for the exporter file
+"""
+
+import csv
+import gzip
+import json
+
+import pytest
+
+from exporter import export_format, write_export
+
+HEADER = ["USER_ID", "NAME"]
+ROWS = [("u1", "Ann"), ("u2", 'Bo, "Jr"\nthe second')]
+
+
+@pytest.mark.parametrize(
+    "filename, expected",
+    [
+        ("users.csv", ("csv", False)),
+        ("users.CSV.gz", ("csv", True)),
+        ("dir.v2/statuses.jsonl", ("jsonl", False)),
+        ("statuses.jsonl.gz", ("jsonl", True)),
+    ],
+)
+def test_export_format(filename, expected):
+    assert export_format(filename) == expected
+
+
+@pytest.mark.parametrize("filename", ["users.txt", "users.gz", "users"])
+def test_export_format_rejects_unknown(filename):
+    with pytest.raises(ValueError):
+        export_format(filename)
+
+
+def test_write_csv_round_trips(tmp_path):
+    path = tmp_path / "users.csv"
+    assert write_export(str(path), HEADER, iter(ROWS)) == 2
+    with open(path, newline="", encoding="utf-8") as csvfile:
+        assert list(csv.reader(csvfile)) == [HEADER] + [list(row) for row in ROWS]
+
+
+def test_write_jsonl_gzip(tmp_path):
+    path = tmp_path / "users.jsonl.gz"
+    assert write_export(str(path), HEADER, iter(ROWS)) == 2
+    with gzip.open(path, mode="rt", encoding="utf-8") as export_file:
+        lines = [json.loads(line) for line in export_file]
+    assert lines[1] == {"user_id": "u2", "name": 'Bo, "Jr"\nthe second'}
+
+
+def test_explicit_format_overrides_extension(tmp_path):
+    path = tmp_path / "backup.dat"
+    write_export(str(path), HEADER, iter(ROWS), fmt="csv", compress=True)
+    with gzip.open(path, mode="rt", encoding="utf-8") as export_file:
+        assert export_file.readline().strip() == "USER_ID,NAME"
+
+
+def test_failed_export_removes_partial_file(tmp_path):
+    path = tmp_path / "users.csv"
+
+    def rows():
+        yield ROWS[0]
+        raise RuntimeError("cursor died")
+
+    with pytest.raises(RuntimeError):
+        write_export(str(path), HEADER, rows())
+    assert not path.exists()
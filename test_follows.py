@@ -0,0 +1,199 @@
+"""
+Testing suite for the follows file
+Patching the logger to avoid writing tests to the log file
+"""
+
+# Disabling some noisy linting for peewee
+# pylint: disable=E1101,E1120,W0212,W0613,W0621
+
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from database_manager import temp_db
+from database_utils import ensure_feed_triggers
+from follows import FollowCollection
+from socialnetwork_model import (
+    FanoutTable,
+    FeedTable,
+    FollowsTable,
+    UsersTable,
+    UserStatusTable,
+)
+
+MODELS = [UsersTable, UserStatusTable, FollowsTable, FanoutTable, FeedTable]
+START = datetime(2026, 1, 1)
+
+
+@pytest.fixture(scope="function", autouse=True)
+def setup_and_teardown_db():
+    """
+    Sets up an in-memory database with the feed triggers before each test
+    """
+    temp_db.bind(MODELS, bind_refs=False, bind_backrefs=False)
+    temp_db.connect()
+    temp_db.create_tables(MODELS)
+    with patch("database_utils.logger"):
+        ensure_feed_triggers(temp_db)
+
+    yield
+
+    temp_db.drop_tables(MODELS)
+    temp_db.close()
+
+
+@pytest.fixture
+def follow_collection():
+    return FollowCollection()
+
+
+def add_users(*user_ids):
+    UsersTable.insert_many(
+        [(user_id, "e@test.com", "N", "L") for user_id in user_ids],
+        fields=[
+            UsersTable.user_id,
+            UsersTable.user_email,
+            UsersTable.user_name,
+            UsersTable.user_last_name,
+        ],
+    ).execute()
+
+
+def add_statuses(user_id, minutes):
+    """
+    Adds one status of user_id per minute offset, named <user_id>_<minute>
+    """
+    UserStatusTable.insert_many(
+        [
+            (
+                f"{user_id}_{minute:02}",
+                user_id,
+                "text",
+                START + timedelta(minutes=minute),
+            )
+            for minute in minutes
+        ],
+        fields=[
+            UserStatusTable.status_id,
+            UserStatusTable.user_id,
+            UserStatusTable.status_text,
+            UserStatusTable.created_at,
+        ],
+    ).execute()
+
+
+@pytest.fixture
+def graph(follow_collection):
+    """
+    reader follows a and b, whose statuses interleave; c is not followed
+    """
+    add_users("reader", "a", "b", "c")
+    add_statuses("a", [0, 2, 4, 6])
+    add_statuses("b", [1, 3, 5])
+    add_statuses("c", [7])
+    assert follow_collection.bulk_add_follows([("reader", "a"), ("reader", "b")]) == 2
+
+
+def ids(statuses):
+    return [status.status_id for status in statuses]
+
+
+def test_follow_and_unfollow(follow_collection):
+    add_users("u1", "u2")
+    assert follow_collection.follow("u1", "u2")
+    assert follow_collection.get_following("u1") == ["u2"]
+    assert follow_collection.get_followers("u2") == ["u1"]
+
+    with patch("follows.logger.error") as mock_error:
+        assert not follow_collection.follow("u1", "u2")
+        mock_error.assert_called_once_with(
+            "Follow failed: '{}' already follows '{}'.", "u1", "u2"
+        )
+        assert not follow_collection.follow("u1", "ghost")
+
+    assert follow_collection.unfollow("u1", "u2")
+    with patch("follows.logger.error") as mock_error:
+        assert not follow_collection.unfollow("u1", "u2")
+        mock_error.assert_called_once_with(
+            "Unfollow failed: '{}' does not follow '{}'.", "u1", "u2"
+        )
+    assert not follow_collection.get_following("u1")
+
+
+def test_bulk_add_follows_ignores_repeats(follow_collection):
+    add_users("u1", "u2", "u3")
+    follows = [("u1", "u2"), ("u1", "u3"), ("u1", "u2")]
+    assert follow_collection.bulk_add_follows(follows) == 2
+    assert sorted(follow_collection.get_following("u1")) == ["u2", "u3"]
+
+
+def test_merged_news_feed_pages(graph, follow_collection):
+    first = follow_collection.get_news_feed("reader", limit=4)
+    assert ids(first) == ["a_06", "b_05", "a_04", "b_03"]
+
+    cursor = (first[-1].created_at, first[-1].status_id)
+    rest = follow_collection.get_news_feed("reader", limit=4, cursor=cursor)
+    assert ids(rest) == ["a_02", "b_01", "a_00"]
+    assert rest[0].created_at == START + timedelta(minutes=2)
+    assert rest[0].user_id == "a"
+    assert not follow_collection.get_news_feed("c")
+
+
+def test_precomputed_news_feed_matches_merged(graph, follow_collection):
+    merged = ids(follow_collection.get_news_feed("reader", limit=10))
+    with patch("follows.logger"):
+        assert follow_collection.refresh_fanout(min_following=2) == 1
+    assert FeedTable.select().count() == 7
+
+    with patch.object(follow_collection, "get_following") as mock_following:
+        first = follow_collection.get_news_feed("reader", limit=4)
+        cursor = (first[-1].created_at, first[-1].status_id)
+        rest = follow_collection.get_news_feed("reader", limit=4, cursor=cursor)
+        mock_following.assert_not_called()
+    assert ids(first) + ids(rest) == merged
+    assert first[0].status_text == "text"
+
+
+def test_precomputed_news_feed_follows_writes(graph, follow_collection):
+    follow_collection.min_following = 2
+    with patch("follows.logger"):
+        follow_collection.refresh_fanout()
+
+    # New statuses, follows and unfollows reach the feed through the triggers
+    add_statuses("a", [8])
+    follow_collection.follow("reader", "c")
+    assert ids(follow_collection.get_news_feed("reader", limit=3)) == [
+        "a_08",
+        "c_07",
+        "a_06",
+    ]
+    follow_collection.unfollow("reader", "a")
+    assert ids(follow_collection.get_news_feed("reader", limit=3)) == [
+        "c_07",
+        "b_05",
+        "b_03",
+    ]
+    UserStatusTable.delete().where(UserStatusTable.status_id == "c_07").execute()
+    assert ids(follow_collection.get_news_feed("reader", limit=1)) == ["b_05"]
+
+    # Dropping below the threshold goes back to merging on read
+    with patch("follows.logger"):
+        assert follow_collection.refresh_fanout(min_following=3) == 0
+    assert not FeedTable.select().count()
+    assert ids(follow_collection.get_news_feed("reader", limit=1)) == ["b_05"]
+
+
+def test_follow_and_unfollow_keep_fanout_membership(graph):
+    follow_collection = FollowCollection(min_following=3)
+    assert not FanoutTable.select().count()
+
+    # Reaching min_following builds the feed, dropping below it removes the feed
+    assert follow_collection.follow("reader", "c")
+    assert FanoutTable.select().count() == 1
+    assert FanoutTable.get_or_none(FanoutTable.user_id == "reader")
+    assert FeedTable.select().count() == 8
+    assert follow_collection.unfollow("reader", "a")
+    assert not FanoutTable.select().count()
+    assert not FeedTable.select().count()
+    assert ids(follow_collection.get_news_feed("reader", limit=2)) == ["c_07", "b_05"]
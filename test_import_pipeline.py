@@ -0,0 +1,56 @@
+"""
+Testing suite for the import pipeline
+"""
+
+import pytest
+
+from import_pipeline import ImportPipeline, ThroughputStats
+
+
+def make_batches(count, size):
+    return ([f"row{i}_{j}" for j in range(size)] for i in range(count))
+
+
+@pytest.mark.parametrize("threaded", (True, False))
+def test_pipeline_yields_batches_in_order(threaded):
+    with ImportPipeline(make_batches(10, 3), threaded, queue_size=2) as pipeline:
+        batches = list(pipeline)
+    assert batches == list(make_batches(10, 3))
+    assert pipeline.stats.rows_parsed == 30
+
+
+def test_pipeline_counts_written_rows():
+    stats = ThroughputStats()
+    with ImportPipeline(make_batches(4, 5), stats=stats) as pipeline:
+        for batch in pipeline:
+            with pipeline.writing(len(batch)):
+                pass
+    assert stats.rows_parsed == 20
+    assert stats.rows_written == 20
+    assert stats.write_rate >= 0
+    assert "parsed 20 rows" in str(stats)
+
+
+def test_pipeline_reraises_parse_errors():
+    def failing_batches():
+        yield ["ok"]
+        raise ValueError("bad csv")
+
+    with pytest.raises(ValueError, match="bad csv"):
+        with ImportPipeline(failing_batches()) as pipeline:
+            for _ in pipeline:
+                pass
+
+
+def test_pipeline_stops_reader_when_writer_exits_early():
+    # The reader blocks on the full queue until the pipeline is closed
+    with ImportPipeline(make_batches(1000, 1), queue_size=1) as pipeline:
+        for _ in pipeline:
+            break
+    assert pipeline.stats.rows_parsed < 1000
+
+
+def test_empty_stats_rates_are_zero():
+    stats = ThroughputStats()
+    assert stats.parse_rate == 0.0
+    assert stats.write_rate == 0.0
@@ -0,0 +1,100 @@
+"""
+Testing suite for the instrumentation file
+"""
+
+# pylint: disable=W0621
+
+import pytest
+
+import instrumentation
+from instrumentation import any_failed, count_rows, measure, timed
+
+
+@pytest.fixture(autouse=True)
+def clean_stats():
+    instrumentation.reset_stats()
+    instrumentation.enable()
+    yield
+    instrumentation.enable(False)
+    instrumentation.reset_stats()
+
+
+@timed("op")
+def operation(result):
+    return result
+
+
+@timed("batch", failed=any_failed)
+def batch(results):
+    return results
+
+
+@timed("load", rows=count_rows)
+def load(new_count, skipped_count):
+    return new_count, skipped_count
+
+
+@timed("boom")
+def boom():
+    raise RuntimeError("boom")
+
+
+def test_counts_calls_and_failures():
+    operation(True)
+    operation(False)
+    operation(None)
+    stats = instrumentation.get_stats()["op"]
+    assert stats["count"] == 3
+    assert stats["errors"] == 1
+    assert sum(stats["histogram"].values()) == 3
+    assert stats["p50_ms"] <= stats["p99_ms"] <= stats["max_ms"]
+
+
+def test_exceptions_count_as_errors():
+    with pytest.raises(RuntimeError):
+        boom()
+    assert instrumentation.get_stats()["boom"]["errors"] == 1
+
+
+def test_rows_per_second():
+    load(90, 10)
+    load(50, 0)
+    stats = instrumentation.get_stats()["load"]
+    assert stats["rows"] == 150
+    assert stats["rows_per_sec"] > 0
+
+
+def test_batch_failures():
+    batch([True, True])
+    batch([True, False])
+    assert instrumentation.get_stats()["batch"]["errors"] == 1
+
+
+def test_measure_block():
+    with measure("block") as measurement:
+        measurement.rows = 5
+    with pytest.raises(KeyError):
+        with measure("block"):
+            raise KeyError("missing")
+    stats = instrumentation.get_stats()["block"]
+    assert (stats["count"], stats["errors"], stats["rows"]) == (2, 1, 5)
+
+
+def test_disabled_records_nothing():
+    instrumentation.enable(False)
+    operation(True)
+    with measure("block"):
+        pass
+    assert instrumentation.get_stats() == {}
+    assert instrumentation.format_stats() == "No operations recorded."
+
+
+def test_percentiles_use_bucket_bounds():
+    for seconds in [0.0002] * 98 + [0.02, 3.0]:
+        instrumentation.record("manual", seconds)
+    stats = instrumentation.get_stats()["manual"]
+    assert stats["p50_ms"] == pytest.approx(0.25)
+    assert stats["p99_ms"] == pytest.approx(25)
+    assert stats["max_ms"] == pytest.approx(3000)
+    assert stats["histogram"] == {"<=0.25ms": 98, "<=25ms": 1, "<=5000ms": 1}
+    assert "manual" in instrumentation.format_stats()
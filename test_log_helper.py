@@ -0,0 +1,60 @@
+"""
+Testing suite for the log_helper file
+Patching the logger to avoid writing tests to the log file
+"""
+
+import threading
+from unittest.mock import patch
+
+from log_helper import LogSampler, sample
+
+
+def test_sample_without_sampler_logs_everything():
+    assert all(sample("event") for _ in range(100))
+
+
+def test_sampler_logs_first_then_every_nth():
+    sampler = LogSampler("op", first=2, every=5)
+    allowed = [sampler.allow("event") for _ in range(12)]
+    assert [i + 1 for i, ok in enumerate(allowed) if ok] == [1, 2, 5, 10]
+    assert sampler.counts == {"event": 12}
+    assert sampler.logged == {"event": 4}
+
+
+def test_sampler_counts_events_separately():
+    sampler = LogSampler("op", first=1, every=100)
+    assert sampler.allow("a")
+    assert sampler.allow("b")
+    assert not sampler.allow("a")
+
+
+def test_context_manager_activates_sampler_and_logs_summary():
+    with patch("log_helper.logger.info") as mock_info:
+        with LogSampler("op", first=1, every=100) as sampler:
+            results = [sample("event") for _ in range(3)]
+        assert sample("event")
+    assert results == [True, False, False]
+    assert sampler.counts == {"event": 3}
+    mock_info.assert_called_once_with(
+        "{}: {} '{}' events, {} logged.", "op", 3, "event", 1
+    )
+
+
+def test_nested_samplers_restore_the_outer_one():
+    with patch("log_helper.logger.info"):
+        with LogSampler("outer") as outer:
+            with LogSampler("inner") as inner:
+                sample("event")
+            sample("event")
+    assert inner.counts == {"event": 1}
+    assert outer.counts == {"event": 1}
+
+
+def test_sampler_is_per_thread():
+    seen = []
+    with patch("log_helper.logger.info"):
+        with LogSampler("op", first=0, every=1000):
+            thread = threading.Thread(target=lambda: seen.append(sample("event")))
+            thread.start()
+            thread.join()
+    assert seen == [True]
@@ -3,16 +3,21 @@ Testing suite for the main backend file
 Patching the logger to avoid writing tests to the log file
 """
 
-# pylint: disable=E1101,W0212,W0621
+# pylint: disable=E1101,E1120,W0212,W0621
 
 import tempfile
 import csv
+import gzip
+import json
 import os
 from unittest.mock import patch
 
 import pytest
 
+import instrumentation
 from database_manager import temp_db
+from database_utils import ensure_status_search
+from import_pipeline import ThroughputStats
 from main import (
     init_user_collection,
     init_status_collection,
@@ -21,24 +26,48 @@ from main import (
     add_user,
     update_user,
     delete_user,
+    add_users,
+    update_users,
+    delete_users,
+    purge_users,
     search_user,
     add_status,
     update_status,
     delete_status,
+    add_statuses,
+    update_statuses,
+    delete_statuses,
     search_status,
+    search_statuses,
+    export_users,
+    export_status_updates,
+    get_stats,
+    sync_users,
+    sync_status_updates,
+    init_follow_collection,
+    load_follows,
+    follow_user,
+    unfollow_user,
+    get_news_feed,
 )
-from socialnetwork_model import UsersTable, UserStatusTable
+from socialnetwork_model import (
+    FanoutTable,
+    FeedTable,
+    FollowsTable,
+    UsersTable,
+    UserStatusTable,
+)
+
+MODELS = [UsersTable, UserStatusTable, FollowsTable, FanoutTable, FeedTable]
 
 
 @pytest.fixture(scope="function", autouse=True)
 def setup_and_teardown_db():
-    UsersTable._meta.database = temp_db
-    UserStatusTable._meta.database = temp_db
-    temp_db.bind([UsersTable, UserStatusTable], bind_refs=False, bind_backrefs=False)
+    temp_db.bind(MODELS, bind_refs=False, bind_backrefs=False)
     temp_db.connect()
-    temp_db.create_tables([UsersTable, UserStatusTable])
+    temp_db.create_tables(MODELS)
     yield
-    temp_db.drop_tables([UsersTable, UserStatusTable])
+    temp_db.drop_tables(MODELS)
     temp_db.close()
 
 
@@ -52,6 +81,10 @@ def status_collection():
     return init_status_collection()
 
 
+def _rejects(path):
+    return f"{os.path.splitext(path)[0]}_rejects.csv"
+
+
 def create_temp_csv(headers, rows):
     fd, path = tempfile.mkstemp(suffix=".csv")
     with os.fdopen(fd, "w", newline="", encoding="utf-8") as tmp:
@@ -90,10 +123,16 @@ def test_load_users_failure(user_collection):
             }
         ],
     )
-    with patch("users.logger.error"):
+    with patch("main.logger.error"):
         result = load_users(path, user_collection)
-        assert result is None
-        os.remove(path)
+        assert result == (0, 1)
+    with open(_rejects(path), newline="", encoding="utf-8") as report:
+        rejected = list(csv.DictReader(report))
+    assert rejected[0]["REASON"] == (
+        "missing user_id; missing email; missing name; missing lastname"
+    )
+    os.remove(path)
+    os.remove(_rejects(path))
 
 
 def test_add_update_delete_user(user_collection):
@@ -117,9 +156,11 @@ def test_load_status_updates_success(user_collection, status_collection):
             ["COLUMN1", "COLUMN2", "COLUMN3"],
             [{"COLUMN1": "s1", "COLUMN2": "u1", "COLUMN3": "hello"}],
         )
-        result = load_status_updates(path, status_collection)
-        assert result is None
+        with patch("main.logger.error"):
+            result = load_status_updates(path, status_collection)
+        assert result == (0, 1)
         os.remove(path)
+        os.remove(_rejects(path))
 
 
 def test_load_status_updates_failure(user_collection, status_collection):
@@ -129,9 +170,11 @@ def test_load_status_updates_failure(user_collection, status_collection):
             ["COLUMN1", "COLUMN2", "COLUMN3"],
             [{"COLUMN1": "s1", "COLUMN2": "u1", "COLUMN3": "hello"}],
         )
-        result = load_status_updates(path, status_collection)
-        assert result is None
+        with patch("main.logger.error"):
+            result = load_status_updates(path, status_collection)
+        assert result == (0, 1)
         os.remove(path)
+        os.remove(_rejects(path))
 
 
 def test_add_update_delete_status(user_collection, status_collection):
@@ -150,3 +193,461 @@ def test_search_status(user_collection, status_collection):
         add_status("s1", "u1", "hello", status_collection, user_collection)
         result = search_status("s1", False, status_collection)
         assert result.status_id == "s1"
+
+
+def test_load_users_skips_duplicates(user_collection):
+    with patch("users.logger.info"):
+        add_user("u1", "e@test.com", "First", "Last", user_collection)
+    headers = ["USER_ID", "NAME", "LASTNAME", "EMAIL"]
+    rows = [
+        {"USER_ID": user_id, "NAME": "N", "LASTNAME": "L", "EMAIL": "e@test.com"}
+        for user_id in ("u1", "u2", "u3", "u2")
+    ]
+    path = create_temp_csv(headers, rows)
+    # A tiny batch size forces the duplicates to span several batches
+    result = load_users(path, user_collection, batch_size=2)
+    assert result == (2, 2)
+    assert UsersTable.select().count() == 3
+    os.remove(path)
+
+
+def test_load_users_rejects_invalid_rows_and_continues(user_collection):
+    headers = ["USER_ID", "NAME", "LASTNAME", "EMAIL"]
+    rows = [
+        {"USER_ID": "u1", "NAME": "N", "LASTNAME": "L", "EMAIL": "e@test.com"},
+        {"USER_ID": "u2", "NAME": "", "LASTNAME": "L", "EMAIL": "e@test.com"},
+        {"USER_ID": "u3", "NAME": "N" * 31, "LASTNAME": "L", "EMAIL": "not-an-email"},
+        {"USER_ID": "u4", "NAME": "N", "LASTNAME": "L", "EMAIL": "f@test.com"},
+    ]
+    path = create_temp_csv(headers, rows)
+    with patch("main.logger.error") as mock_error:
+        assert load_users(path, user_collection, batch_size=3) == (2, 2)
+    assert mock_error.call_count == 2
+    assert [user.user_id for user in UsersTable.select()] == ["u1", "u4"]
+    with open(_rejects(path), newline="", encoding="utf-8") as report:
+        rejected = list(csv.DictReader(report))
+    assert [(row["USER_ID"], row["REASON"]) for row in rejected] == [
+        ("u2", "missing name"),
+        ("u3", "invalid email; name longer than 30 characters"),
+    ]
+    os.remove(path)
+    os.remove(_rejects(path))
+
+
+def test_load_status_updates_rejects_orphans(user_collection, status_collection):
+    with patch("users.logger.info"):
+        add_user("u1", "e@test.com", "First", "Last", user_collection)
+    headers = ["STATUS_ID", "USER_ID", "STATUS_TEXT"]
+    rows = [
+        {"STATUS_ID": "s1", "USER_ID": "u1", "STATUS_TEXT": "hello"},
+        {"STATUS_ID": "s2", "USER_ID": "ghost", "STATUS_TEXT": "boo"},
+        {"STATUS_ID": "s1", "USER_ID": "u1", "STATUS_TEXT": "again"},
+        {"STATUS_ID": "s3", "USER_ID": "u1", "STATUS_TEXT": "world"},
+    ]
+    path = create_temp_csv(headers, rows)
+    reject_path = path + ".rejects"
+    result = load_status_updates(
+        path, status_collection, batch_size=2, reject_filename=reject_path
+    )
+    # The orphan and the repeated status_id are both skipped
+    assert result == (2, 2)
+    assert UserStatusTable.select().count() == 2
+    with open(reject_path, newline="", encoding="utf-8") as report:
+        rejected = list(csv.DictReader(report))
+    assert len(rejected) == 1
+    assert rejected[0]["STATUS_ID"] == "s2"
+    assert "ghost" in rejected[0]["REASON"]
+    os.remove(path)
+    os.remove(reject_path)
+
+
+def test_load_follows_rejects_unknown_users(user_collection):
+    with patch("users.logger.info"):
+        add_users(
+            [(u, "e@test.com", "First", "Last") for u in ("u1", "u2", "u3")],
+            user_collection,
+        )
+    headers = ["FOLLOWER_ID", "FOLLOWEE_ID"]
+    rows = [
+        {"FOLLOWER_ID": "u1", "FOLLOWEE_ID": "u2"},
+        {"FOLLOWER_ID": "u1", "FOLLOWEE_ID": "ghost"},
+        {"FOLLOWER_ID": "u2", "FOLLOWEE_ID": "u2"},
+        {"FOLLOWER_ID": "u1", "FOLLOWEE_ID": "u2"},
+        {"FOLLOWER_ID": "u1", "FOLLOWEE_ID": "u3"},
+    ]
+    path = create_temp_csv(headers, rows)
+    reject_path = path + ".rejects"
+    follow_collection = init_follow_collection()
+    with patch("follows.logger.info"):
+        result = load_follows(
+            path, follow_collection, batch_size=2, reject_filename=reject_path
+        )
+    # The unknown followee, the self-follow and the repeat are skipped
+    assert result == (2, 3)
+    assert sorted(follow_collection.get_following("u1")) == ["u2", "u3"]
+    with open(reject_path, newline="", encoding="utf-8") as report:
+        rejected = list(csv.DictReader(report))
+    assert [row["REASON"] for row in rejected] == [
+        "user_id 'ghost' does not exist",
+        "user_id 'u2' cannot follow itself",
+    ]
+    os.remove(path)
+    os.remove(reject_path)
+
+
+def test_news_feed(user_collection, status_collection):
+    follow_collection = init_follow_collection()
+    with patch("users.logger.info"):
+        add_users(
+            [(u, "e@test.com", "First", "Last") for u in ("u1", "u2", "u3")],
+            user_collection,
+        )
+    add_status("s1", "u2", "first", status_collection, user_collection)
+    add_status("s2", "u3", "second", status_collection, user_collection)
+    assert follow_user("u1", "u2", follow_collection)
+    assert follow_user("u1", "u3", follow_collection)
+    feed = get_news_feed("u1", 10, None, follow_collection)
+    assert [status.status_id for status in feed] == ["s2", "s1"]
+
+    assert unfollow_user("u1", "u3", follow_collection)
+    feed = get_news_feed("u1", 10, None, follow_collection)
+    assert [status.status_id for status in feed] == ["s1"]
+
+
+def test_load_status_updates_no_rejects_no_report(user_collection, status_collection):
+    with patch("users.logger.info"):
+        add_user("u1", "e@test.com", "First", "Last", user_collection)
+    path = create_temp_csv(
+        ["STATUS_ID", "USER_ID", "STATUS_TEXT"],
+        [{"STATUS_ID": "s1", "USER_ID": "u1", "STATUS_TEXT": "hello"}],
+    )
+    reject_path = path + ".rejects"
+    result = load_status_updates(path, status_collection, reject_filename=reject_path)
+    assert result == (1, 0)
+    assert not os.path.exists(reject_path)
+    os.remove(path)
+
+
+def test_load_users_pipelined(user_collection):
+    headers = ["USER_ID", "NAME", "LASTNAME", "EMAIL"]
+    rows = [
+        {"USER_ID": f"u{i}", "NAME": "N", "LASTNAME": "L", "EMAIL": "e@test.com"}
+        for i in range(25)
+    ]
+    path = create_temp_csv(headers, rows)
+    stats = ThroughputStats()
+    result = load_users(
+        path, user_collection, batch_size=4, pipelined=True, stats=stats
+    )
+    assert result == (25, 0)
+    assert stats.rows_parsed == 25
+    assert stats.rows_written == 25
+    os.remove(path)
+
+
+def test_load_users_parse_workers(user_collection):
+    headers = ["USER_ID", "NAME", "LASTNAME", "EMAIL"]
+    rows = [
+        {"USER_ID": f"u{i}", "NAME": "N", "LASTNAME": "L", "EMAIL": "e@test.com"}
+        for i in range(25)
+    ]
+    path = create_temp_csv(headers, rows)
+    # Small ranges so the file is parsed as several worker tasks
+    with patch("csv_reader.PARSE_RANGE_BYTES", 100):
+        result = load_users(path, user_collection, batch_size=4, parse_workers=2)
+    assert result == (25, 0)
+    assert UsersTable.select().count() == 25
+    os.remove(path)
+
+
+def test_load_users_resumes_from_checkpoint(user_collection):
+    headers = ["USER_ID", "NAME", "LASTNAME", "EMAIL"]
+    rows = [
+        {"USER_ID": f"u{i}", "NAME": "N", "LASTNAME": "L", "EMAIL": "e@test.com"}
+        for i in range(10)
+    ]
+    path = create_temp_csv(headers, rows)
+    real_bulk_add = user_collection.bulk_add_users
+    calls = []
+
+    def crash_on_third_batch(users):
+        calls.append(users)
+        if len(calls) == 3:
+            raise RuntimeError("simulated crash")
+        return real_bulk_add(users)
+
+    with patch.object(user_collection, "bulk_add_users", crash_on_third_batch):
+        with pytest.raises(RuntimeError):
+            load_users(path, user_collection, batch_size=3, resumable=True)
+    # The first two batches were committed and checkpointed
+    assert UsersTable.select().count() == 6
+    assert os.path.exists(path + ".checkpoint")
+
+    result = load_users(path, user_collection, batch_size=3, resumable=True)
+    # Counts cover the whole file and no row was re-read
+    assert result == (10, 0)
+    assert UsersTable.select().count() == 10
+    assert not os.path.exists(path + ".checkpoint")
+    os.remove(path)
+
+
+def test_load_users_resumable_keeps_committed_batches(user_collection):
+    headers = ["USER_ID", "NAME", "LASTNAME", "EMAIL"]
+    rows = [
+        {"USER_ID": "u1", "NAME": "N", "LASTNAME": "L", "EMAIL": "e@test.com"},
+        {"USER_ID": "u2", "NAME": "", "LASTNAME": "L", "EMAIL": "e@test.com"},
+    ]
+    path = create_temp_csv(headers, rows)
+    with patch("main.logger.error"):
+        assert load_users(path, user_collection, batch_size=1, resumable=True) == (
+            1,
+            1,
+        )
+    assert UsersTable.select().count() == 1
+    assert not os.path.exists(path + ".checkpoint")
+    os.remove(path)
+    os.remove(_rejects(path))
+
+
+def test_purge_users_removes_statuses_in_chunks(user_collection, status_collection):
+    with patch("users.logger.info"):
+        for user_id in ("u1", "u2", "u3"):
+            add_user(user_id, "e@test.com", "First", "Last", user_collection)
+    status_collection.bulk_add_statuses(
+        [(f"a{i}", "u1", "text") for i in range(7)]
+        + [(f"b{i}", "u2", "text") for i in range(3)]
+        + [("c0", "u3", "text")]
+    )
+    with patch("users.logger.info"):
+        result = user_collection.purge_users(["u1", "u2", "missing"], chunk_size=2)
+    assert result == (2, 10)
+    assert [row.user_id for row in UsersTable.select()] == ["u3"]
+    assert UserStatusTable.select().count() == 1
+
+
+def test_purge_users_wrapper(user_collection):
+    with patch("users.logger.info"):
+        add_user("u1", "e@test.com", "First", "Last", user_collection)
+        assert purge_users(["u1"], user_collection) == (1, 0)
+
+
+def test_user_batch_wrappers(user_collection):
+    users = [("u1", "e@test.com", "First", "Last"), ("u2", "f@test.com", "A", "B")]
+    with patch("users.logger.info"), patch("users.logger.error"):
+        assert add_users(users + [users[0]], user_collection) == [True, True, False]
+        assert update_users(
+            [("u1", "new@test.com", "New", "Name"), ("u9", "x@test.com", "X", "Y")],
+            user_collection,
+        ) == [True, False]
+        assert delete_users(["u2", "u9"], user_collection) == [True, False]
+    assert [row.user_email for row in UsersTable.select()] == ["new@test.com"]
+
+
+def test_status_batch_wrappers(user_collection, status_collection):
+    with patch("users.logger.info"), patch("users.logger.error"):
+        add_user("u1", "e@test.com", "First", "Last", user_collection)
+        statuses = [("s1", "u1", "a"), ("s2", "u1", "b"), ("s3", "ghost", "c")]
+        # The owners are checked once for the batch, not per status
+        with patch.object(user_collection, "search_user") as mock_search:
+            assert add_statuses(statuses, status_collection, user_collection) == [
+                True,
+                True,
+                False,
+            ]
+            mock_search.assert_not_called()
+        assert update_statuses(
+            [("s1", "edited"), ("s9", "missing")], status_collection
+        ) == [True, False]
+        assert delete_statuses(["s2", "s9"], status_collection) == [True, False]
+    assert [row.status_text for row in UserStatusTable.select()] == ["edited"]
+
+
+def test_load_status_updates_indexes_text(user_collection, status_collection):
+    with patch("database_utils.logger"):
+        ensure_status_search(temp_db)
+    with patch("users.logger.info"):
+        add_user("u1", "e@test.com", "First", "Last", user_collection)
+    headers = ["STATUS_ID", "USER_ID", "STATUS_TEXT"]
+    rows = [
+        {"STATUS_ID": f"s{i}", "USER_ID": "u1", "STATUS_TEXT": f"word{i % 2}"}
+        for i in range(6)
+    ]
+    path = create_temp_csv(headers, rows)
+    assert load_status_updates(path, status_collection, batch_size=2) == (6, 0)
+    results = search_statuses("word1", 10, status_collection)
+    assert sorted(status.status_id for status in results) == ["s1", "s3", "s5"]
+    os.remove(path)
+
+
+def test_export_round_trips_through_load(tmp_path, user_collection, status_collection):
+    user_collection.bulk_add_users(
+        [("u2", "b@test.com", "Bea", "Two"), ("u1", "a@test.com", "Al", "One")]
+    )
+    status_collection.bulk_add_statuses([("s1", "u1", "hi, there")])
+    users_path = str(tmp_path / "users.csv")
+    statuses_path = str(tmp_path / "statuses.csv.gz")
+    with patch("main.logger.info"):
+        assert export_users(users_path)[0] == 2
+        assert export_status_updates(statuses_path)[0] == 1
+    with open(users_path, encoding="utf-8") as export_file:
+        assert export_file.readline().strip() == "USER_ID,NAME,LASTNAME,EMAIL"
+        assert export_file.readline().strip() == "u1,Al,One,a@test.com"
+    with gzip.open(statuses_path, mode="rt", encoding="utf-8") as export_file:
+        assert export_file.read().splitlines() == [
+            "STATUS_ID,USER_ID,STATUS_TEXT",
+            's1,u1,"hi, there"',
+        ]
+
+    # An exported user file loads back into an empty table
+    UserStatusTable.delete().execute()
+    UsersTable.delete().execute()
+    assert load_users(users_path, user_collection) == (2, 0)
+
+
+def test_export_jsonl(tmp_path, user_collection):
+    user_collection.bulk_add_users([("u1", "a@test.com", "Al", "One")])
+    path = str(tmp_path / "users.jsonl")
+    with patch("main.logger.info"):
+        export_users(path)
+    with open(path, encoding="utf-8") as export_file:
+        assert json.loads(export_file.readline()) == {
+            "user_id": "u1",
+            "name": "Al",
+            "lastname": "One",
+            "email": "a@test.com",
+        }
+
+
+def test_export_failure(tmp_path):
+    with patch("main.logger.error") as mock_error:
+        assert export_users(str(tmp_path / "users.xml")) is None
+        assert export_users(str(tmp_path / "missing" / "users.csv")) is None
+        assert mock_error.call_count == 2
+
+
+def test_get_stats_records_collection_and_loader_calls(user_collection):
+    instrumentation.reset_stats()
+    instrumentation.enable()
+    try:
+        with patch("users.logger.info"), patch("users.logger.error"):
+            add_user("u1", "e@test.com", "First", "Last", user_collection)
+            add_user("u1", "e@test.com", "First", "Last", user_collection)
+            load_users("missing.csv", user_collection)
+        stats = get_stats()
+    finally:
+        instrumentation.enable(False)
+        instrumentation.reset_stats()
+    assert stats["UserCollection.add_user"]["count"] == 2
+    assert stats["UserCollection.add_user"]["errors"] == 1
+    assert stats["load_users"]["count"] == 1
+
+
+def _user_rows(*users):
+    return [
+        {"USER_ID": user_id, "NAME": name, "LASTNAME": "L", "EMAIL": email}
+        for user_id, name, email in users
+    ]
+
+
+def test_sync_users_applies_only_the_delta(user_collection):
+    headers = ["USER_ID", "NAME", "LASTNAME", "EMAIL"]
+    # u1 comes from a plain import, so it has no stored hash yet
+    path = create_temp_csv(headers, _user_rows(("u1", "A", "a@test.com")))
+    load_users(path, user_collection)
+    os.remove(path)
+
+    path = create_temp_csv(
+        headers,
+        _user_rows(
+            ("u1", "A", "a@test.com"),
+            ("u2", "B", "b@test.com"),
+            ("u2", "B", "repeat@test.com"),
+        ),
+    )
+    assert sync_users(path, user_collection, batch_size=2) == {
+        "new": 1,
+        "changed": 0,
+        "unchanged": 1,
+        "skipped": 1,
+    }
+    assert UsersTable.select().where(UsersTable.content_hash.is_null()).count() == 0
+    os.remove(path)
+
+    path = create_temp_csv(
+        headers,
+        _user_rows(("u1", "A", "a@test.com"), ("u2", "B", "new@test.com")),
+    )
+    with patch("main.UserCollection.bulk_upsert_users", return_value=1) as mock_upsert:
+        sync_users(path, user_collection)
+    # Only the changed row is written
+    assert [row[0] for row in mock_upsert.call_args.args[0]] == ["u2"]
+    assert sync_users(path, user_collection) == {
+        "new": 0,
+        "changed": 1,
+        "unchanged": 1,
+        "skipped": 0,
+    }
+    assert UsersTable.get_by_id("u2").user_email == "new@test.com"
+    os.remove(path)
+
+
+def test_sync_users_sees_edits_made_since(user_collection):
+    headers = ["USER_ID", "NAME", "LASTNAME", "EMAIL"]
+    path = create_temp_csv(headers, _user_rows(("u1", "A", "a@test.com")))
+    sync_users(path, user_collection)
+    with patch("users.logger.info"):
+        update_user("u1", "edited@test.com", "A", "L", user_collection)
+    assert sync_users(path, user_collection)["changed"] == 1
+    assert UsersTable.get_by_id("u1").user_email == "a@test.com"
+    os.remove(path)
+
+
+def test_sync_users_failures(user_collection):
+    with patch("main.logger.error"):
+        assert sync_users("missing.csv", user_collection) is None
+    path = create_temp_csv(
+        ["USER_ID", "NAME", "LASTNAME", "EMAIL"], _user_rows(("u1", "", "a@test.com"))
+    )
+    with patch("main.logger.error"):
+        assert sync_users(path, user_collection)["skipped"] == 1
+    assert UsersTable.select().count() == 0
+    os.remove(path)
+    os.remove(_rejects(path))
+
+
+def test_sync_status_updates(user_collection, status_collection):
+    ensure_status_search(temp_db)
+    with patch("users.logger.info"):
+        add_user("u1", "a@test.com", "A", "L", user_collection)
+        add_user("u2", "b@test.com", "B", "L", user_collection)
+    headers = ["STATUS_ID", "USER_ID", "STATUS_TEXT"]
+    path = create_temp_csv(
+        headers,
+        [
+            {"STATUS_ID": "s1", "USER_ID": "u1", "STATUS_TEXT": "hello"},
+            {"STATUS_ID": "s2", "USER_ID": "u1", "STATUS_TEXT": "world"},
+        ],
+    )
+    reject_path = path + ".rejects"
+    sync_status_updates(path, status_collection, reject_filename=reject_path)
+    os.remove(path)
+
+    path = create_temp_csv(
+        headers,
+        [
+            {"STATUS_ID": "s1", "USER_ID": "u1", "STATUS_TEXT": "hello again"},
+            {"STATUS_ID": "s2", "USER_ID": "u2", "STATUS_TEXT": "moved"},
+            {"STATUS_ID": "s3", "USER_ID": "ghost", "STATUS_TEXT": "boo"},
+            {"STATUS_ID": "s4", "USER_ID": "u2", "STATUS_TEXT": "new"},
+        ],
+    )
+    result = sync_status_updates(path, status_collection, reject_filename=reject_path)
+    # The orphan and the status that would move to u2 are skipped
+    assert result == {"new": 1, "changed": 1, "unchanged": 0, "skipped": 2}
+    assert UserStatusTable.get_by_id("s2").status_text == "world"
+    assert [
+        status.status_id for status in search_statuses("again", 10, status_collection)
+    ] == ["s1"]
+    assert os.path.exists(reject_path)
+    os.remove(path)
+    os.remove(reject_path)
@@ -146,3 +146,60 @@ def test_load_status_updates_no(monkeypatch):
     inputs = iter(["status.csv", "no"])
     monkeypatch.setattr("builtins.input", lambda _: next(inputs))
     menu.load_status_updates()
+
+
+def test_list_user_statuses_pages(monkeypatch):
+    inputs = iter(["u1", "", "q"])
+    monkeypatch.setattr("builtins.input", lambda _: next(inputs))
+    full_page = [
+        mock.Mock(status_id=f"s{i}", status_text="Text")
+        for i in range(menu.STATUS_PAGE_SIZE)
+    ]
+    with mock.patch(
+        "main.get_user_statuses", side_effect=[full_page, full_page]
+    ) as mock_get:
+        menu.list_user_statuses()
+        assert mock_get.call_count == 2
+        # The second page starts after the last status of the first page
+        assert mock_get.call_args_list[1].args[1] == full_page[-1].status_id
+
+
+def test_list_user_statuses_none(monkeypatch):
+    monkeypatch.setattr("builtins.input", lambda _: "u1")
+    with mock.patch("main.get_user_statuses", return_value=[]) as mock_get:
+        menu.list_user_statuses()
+        mock_get.assert_called_once()
+
+
+def test_search_statuses(monkeypatch, capsys):
+    monkeypatch.setattr("builtins.input", lambda _: "coffee")
+    match = mock.Mock(status_id="s1", user_id="u1", status_text="coffee time")
+    with mock.patch("main.search_statuses", return_value=[match]) as mock_search:
+        menu.search_statuses()
+        mock_search.assert_called_once_with(
+            "coffee", menu.STATUS_SEARCH_LIMIT, menu.status_collection
+        )
+    assert "s1 (u1): coffee time" in capsys.readouterr().out
+
+
+def test_export_users(monkeypatch, capsys):
+    monkeypatch.setattr("builtins.input", lambda _: "users.csv.gz")
+    with mock.patch("main.export_users", return_value=(200, 0.5)) as mock_export:
+        menu.export_users()
+        mock_export.assert_called_once_with("users.csv.gz")
+    assert "200 users exported to users.csv.gz in 0.50s (400 rows/s)." in (
+        capsys.readouterr().out
+    )
+
+
+def test_export_status_updates_failure(monkeypatch, capsys):
+    monkeypatch.setattr("builtins.input", lambda _: "statuses.txt")
+    with mock.patch("main.export_status_updates", return_value=None):
+        menu.export_status_updates()
+    assert "error occurred" in capsys.readouterr().out
+
+
+def test_show_stats(capsys):
+    with mock.patch("main.get_stats", return_value={}):
+        menu.show_stats()
+    assert "No operations recorded." in capsys.readouterr().out
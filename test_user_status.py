@@ -4,15 +4,19 @@ Patching the logger to avoid writing tests to the log file
 """
 
 # Disabling some noisy linting for peewee
-# pylint: disable=E1101,,R0801,W0212,W0613,W0621
+# pylint: disable=E1101,E1120,R0801,W0212,W0613,W0621
 
-from unittest.mock import patch, MagicMock
-from peewee import DatabaseError
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from peewee import DatabaseError, Tuple
 import pytest
 
+from cache import LRUCache
 from database_manager import temp_db
+from database_utils import ensure_status_search
 from socialnetwork_model import UserStatusTable, UsersTable
 from user_status import UserStatusCollection, UserStatus
+from users import UserCollection
 
 
 @pytest.fixture(scope="function", autouse=True)
@@ -79,6 +83,19 @@ def test_add_status_failure(user_status_collection):
             assert result is False
 
 
+def test_bulk_add_statuses_ignores_existing(user_status_collection):
+    generate_test_status()
+    statuses = [
+        ("s1", "u1", "Replacement"),
+        ("s2", "u1", "Second"),
+        ("s3", "u1", "Third"),
+    ]
+    assert user_status_collection.bulk_add_statuses(statuses) == 2
+    # The existing status is left untouched
+    assert UserStatusTable.get_by_id("s1").status_text == "Hello"
+    assert UserStatusTable.get_by_id("s3").status_text == "Third"
+
+
 def test_modify_status_success(user_status_collection):
     generate_test_status()
     with patch("users.logger.info"):
@@ -126,18 +143,13 @@ def test_delete_status_not_found(user_status_collection):
 
 def test_delete_status_failure(user_status_collection):
     generate_test_status()
-    with patch("user_status.UserStatusTable.get") as mock_get:
-        # Simulate that get returns a mock status  when called
-        mock_user = MagicMock(spec=UserStatusTable)
-        mock_user.status_id = "s1"
-        mock_get.return_value = mock_user
-
-        # Simulate DB error when calling delete_instance()
-        mock_user.delete_instance.side_effect = DatabaseError("DB error")
-
+    # Mock the delete to force a DatabaseError
+    with patch("user_status.UserStatusTable.delete") as mock_delete:
+        mock_delete.return_value.where.return_value.execute.side_effect = DatabaseError(
+            "DB error"
+        )
         with patch("users.logger.error"):
-            # Call the delete_user method and assert it returns False due to DB error
-            result = user_status_collection.delete_status("u1")
+            result = user_status_collection.delete_status("s1")
             assert result is False
 
 
@@ -148,8 +160,8 @@ def test_search_status_found(user_status_collection):
         assert isinstance(result, UserStatus)
         assert result.status_id == "s1"
         assert result.status_text == "Hello"
-        # Foreign keys in peewee create a nested model object, UsersTable in this case
-        assert result.user_id == UsersTable.get_by_id("u1")
+        # The raw user_id is returned, not a nested UsersTable instance
+        assert result.user_id == "u1"
 
 
 def test_search_status_not_found(user_status_collection):
@@ -157,3 +169,246 @@ def test_search_status_not_found(user_status_collection):
         result = user_status_collection.search_status("missing", log=True)
         assert isinstance(result, UserStatus)
         assert result.status_id is None
+
+
+def generate_many_statuses(count):
+    generate_test_user()
+    UsersTable.create(
+        user_id="u2",
+        user_email="two@test.com",
+        user_name="Two",
+        user_last_name="User",
+    )
+    rows = [(f"s{i:03}", "u1", f"Status {i}") for i in range(count)]
+    rows.append(("s999", "u2", "Other user"))
+    UserStatusTable.insert_many(
+        rows,
+        fields=[
+            UserStatusTable.status_id,
+            UserStatusTable.user_id,
+            UserStatusTable.status_text,
+        ],
+    ).execute()
+
+
+def test_get_user_statuses_pages(user_status_collection):
+    generate_many_statuses(25)
+    first = user_status_collection.get_user_statuses("u1", limit=10)
+    assert [status.status_id for status in first] == [f"s{i:03}" for i in range(10)]
+    assert first[0].user_id == "u1"
+
+    last = user_status_collection.get_user_statuses("u1", after="s019", limit=10)
+    assert [status.status_id for status in last] == [f"s{i:03}" for i in range(20, 25)]
+
+
+def test_iter_user_statuses_streams_all(user_status_collection):
+    generate_many_statuses(25)
+    statuses = list(user_status_collection.iter_user_statuses("u1", page_size=10))
+    assert len(statuses) == 25
+    assert all(status.user_id == "u1" for status in statuses)
+
+
+def test_get_user_statuses_uses_index():
+    query = (
+        UserStatusTable.select()
+        .where(UserStatusTable.user_id == "u1", UserStatusTable.status_id > "s1")
+        .order_by(UserStatusTable.status_id)
+        .limit(10)
+    )
+    sql, params = query.sql()
+    plan = " ".join(
+        str(row[-1]) for row in temp_db.execute_sql(f"EXPLAIN QUERY PLAN {sql}", params)
+    )
+    assert "userstatustable_user_id_status_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def generate_timeline(count: int):
+    """
+    Adds count statuses of u1 a second apart, s000 oldest, with two sharing a time
+    """
+    generate_test_user()
+    start = datetime(2026, 1, 1)
+    UserStatusTable.insert_many(
+        [
+            (f"s{i:03}", "u1", f"Status {i}", start + timedelta(seconds=min(i, 5)))
+            for i in range(count)
+        ],
+        fields=[
+            UserStatusTable.status_id,
+            UserStatusTable.user_id,
+            UserStatusTable.status_text,
+            UserStatusTable.created_at,
+        ],
+    ).execute()
+
+
+def test_get_user_timeline_pages_newest_first(user_status_collection):
+    generate_timeline(8)
+    first = user_status_collection.get_user_timeline("u1", limit=3)
+    # s005 to s007 share a time and are ordered by status_id
+    assert [status.status_id for status in first] == ["s007", "s006", "s005"]
+    assert first[0].created_at == datetime(2026, 1, 1, 0, 0, 5)
+
+    cursor = (first[-1].created_at, first[-1].status_id)
+    second = user_status_collection.get_user_timeline("u1", before=cursor, limit=3)
+    assert [status.status_id for status in second] == ["s004", "s003", "s002"]
+
+    cursor = (second[-1].created_at, second[-1].status_id)
+    last = user_status_collection.get_user_timeline("u1", before=cursor, limit=3)
+    assert [status.status_id for status in last] == ["s001", "s000"]
+    assert not user_status_collection.get_user_timeline("u2")
+
+
+def test_add_status_sets_created_at(user_status_collection):
+    generate_test_user()
+    before = datetime.now()
+    assert user_status_collection.add_status("s1", "u1", "First")
+    assert user_status_collection.bulk_add_statuses([("s2", "u1", "Second")]) == 1
+    timeline = user_status_collection.get_user_timeline("u1")
+    assert [status.status_id for status in timeline] == ["s2", "s1"]
+    assert all(before <= status.created_at <= datetime.now() for status in timeline)
+
+
+def test_bulk_upsert_keeps_created_at(user_status_collection):
+    generate_timeline(1)
+    user_status_collection.bulk_upsert_statuses([("s000", "u1", "Changed", "hash")])
+    (status,) = user_status_collection.get_user_timeline("u1")
+    assert status.status_text == "Changed"
+    assert status.created_at == datetime(2026, 1, 1)
+
+
+def test_get_user_timeline_uses_index():
+    query = (
+        UserStatusTable.select()
+        .where(
+            UserStatusTable.user_id == "u1",
+            Tuple(UserStatusTable.created_at, UserStatusTable.status_id)
+            < Tuple(datetime(2026, 1, 1), "s1"),
+        )
+        .order_by(UserStatusTable.created_at.desc(), UserStatusTable.status_id.desc())
+        .limit(10)
+    )
+    sql, params = query.sql()
+    plan = " ".join(
+        str(row[-1]) for row in temp_db.execute_sql(f"EXPLAIN QUERY PLAN {sql}", params)
+    )
+    assert "userstatustable_user_id_created_at_status_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_search_status_cache_invalidated_by_writes():
+    cached_collection = UserStatusCollection(LRUCache())
+    generate_test_user()
+    assert cached_collection.search_status("s1", False).status_id is None
+    assert cached_collection.add_status("s1", "u1", "Hello")
+    assert cached_collection.search_status("s1", False).status_text == "Hello"
+
+    with patch("user_status.logger.info"):
+        cached_collection.modify_status("s1", "Changed")
+        assert cached_collection.search_status("s1", False).status_text == "Changed"
+        cached_collection.delete_status("s1")
+        assert cached_collection.search_status("s1", False).status_id is None
+
+
+def test_search_status_does_not_cache_a_read_overtaken_by_a_write():
+    cached_collection = UserStatusCollection(LRUCache())
+    generate_test_status()
+
+    def read_then_update(*row):
+        # The update commits after the row was read but before it is cached
+        with patch("user_status.logger.info"):
+            cached_collection.modify_status("s1", "Changed")
+        return UserStatus(*row)
+
+    with patch("user_status.UserStatus", side_effect=read_then_update):
+        assert cached_collection.search_status("s1", False).status_text != "Changed"
+    assert cached_collection.search_status("s1", False).status_text == "Changed"
+
+
+def test_deleting_user_drops_cached_statuses():
+    status_collection = UserStatusCollection(LRUCache())
+    user_collection = UserCollection(LRUCache(), status_collection.cache)
+    generate_test_status()
+    assert status_collection.search_status("s1", False).status_id == "s1"
+    with patch("users.logger.info"):
+        assert user_collection.delete_user("u1")
+    # The cascade removed the status, so it must not be served from the cache
+    assert status_collection.search_status("s1", False).status_id is None
+
+
+def test_batch_methods_return_per_item_results(user_status_collection):
+    generate_test_user()
+    with patch("user_status.logger.info"), patch("user_status.logger.error"):
+        assert user_status_collection.add_statuses(
+            [("s1", "u1", "a"), ("s1", "u1", "b")]
+        ) == [True, False]
+        assert user_status_collection.modify_statuses(
+            [("s1", "edited"), ("s2", "missing")]
+        ) == [True, False]
+        assert user_status_collection.delete_statuses(["s2", "s1"]) == [False, True]
+    assert UserStatusTable.select().count() == 0
+
+
+@pytest.fixture
+def searchable_collection(user_status_collection):
+    with patch("database_utils.logger"):
+        ensure_status_search(temp_db)
+    generate_test_user()
+    UserStatusTable.create(status_id="s1", user_id="u1", status_text="coffee")
+    UserStatusTable.create(status_id="s2", user_id="u1", status_text="coffee coffee")
+    UserStatusTable.create(status_id="s3", user_id="u1", status_text="tea time")
+    return user_status_collection
+
+
+def test_search_statuses_ranks_matches(searchable_collection):
+    results = searchable_collection.search_statuses("coffee")
+    assert [status.status_id for status in results] == ["s2", "s1"]
+    assert results[0].user_id == "u1"
+    assert len(searchable_collection.search_statuses("coffee", limit=1)) == 1
+    assert [s.status_id for s in searchable_collection.search_statuses("te*")] == ["s3"]
+
+
+def test_search_statuses_follows_writes(searchable_collection):
+    with patch("user_status.logger.info"):
+        searchable_collection.modify_status("s3", "iced coffee")
+        searchable_collection.delete_status("s2")
+    results = searchable_collection.search_statuses("coffee")
+    assert {status.status_id for status in results} == {"s1", "s3"}
+    assert not searchable_collection.search_statuses("tea")
+
+
+def test_search_statuses_invalid_query(searchable_collection):
+    with patch("user_status.logger.error") as mock_error:
+        assert searchable_collection.search_statuses('"unbalanced') == []
+        mock_error.assert_called_once()
+
+
+def test_iter_statuses_streams_slotted_records(user_status_collection):
+    generate_test_status()
+    UserStatusTable.create(status_id="s0", user_id="u1", status_text="First")
+    statuses = list(user_status_collection.iter_statuses())
+    assert [status.status_id for status in statuses] == ["s0", "s1"]
+    assert statuses[0].user_id == "u1"
+    assert not hasattr(statuses[0], "__dict__")
+
+
+def test_bulk_upsert_statuses_never_moves_a_status(user_status_collection):
+    generate_test_user()
+    UsersTable.create(user_id="u2", user_email="e", user_name="n", user_last_name="l")
+    user_status_collection.add_status("s1", "u1", "hello")
+    written = user_status_collection.bulk_upsert_statuses(
+        [("s1", "u2", "moved", "h1"), ("s2", "u1", "new", "h2")]
+    )
+    assert written == 1
+    status = UserStatusTable.get_by_id("s1")
+    assert (status.user_id_id, status.status_text, status.content_hash) == (
+        "u1",
+        "hello",
+        None,
+    )
+    written = user_status_collection.bulk_upsert_statuses(
+        [("s1", "u1", "edited", "h3")]
+    )
+    assert written == 1
+    assert UserStatusTable.get_by_id("s1").content_hash == "h3"
@@ -4,12 +4,13 @@ Patching the logger to avoid writing tests to the log file
 """
 
 # Disabling some noisy linting for peewee
-# pylint: disable=E1101,R0801,W0212,W0621
+# pylint: disable=E1101,E1120,R0801,W0212,W0621
 
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 from peewee import DatabaseError
 import pytest
 
+from cache import LRUCache
 from database_manager import temp_db
 from socialnetwork_model import UsersTable
 from users import Users, UserCollection
@@ -82,6 +83,23 @@ def test_add_user_failure(user_collection):
                 assert result is False
 
 
+def test_bulk_add_users_ignores_existing(user_collection):
+    generate_test_user()
+    users = [
+        ("u1", "other@test.com", "Other", "User"),
+        ("u2", "two@test.com", "Two", "User"),
+        ("u3", "three@test.com", "Three", "User"),
+    ]
+    assert user_collection.bulk_add_users(users) == 2
+    # The existing user is left untouched
+    assert UsersTable.get_by_id("u1").user_email == "email@test.com"
+    assert UsersTable.get_by_id("u3").user_name == "Three"
+
+
+def test_bulk_add_users_empty(user_collection):
+    assert user_collection.bulk_add_users([]) == 0
+
+
 @pytest.mark.parametrize(
     "should_find_user, expected, log_level",
     [(True, True, "info"), (False, False, "error")],
@@ -129,15 +147,12 @@ def test_delete_user(should_find_user, expected, log_level, user_collection):
 
 
 def test_delete_user_failure(user_collection):
-    with patch("users.UsersTable.get") as mock_get:
-        # Simulate that get returns a mock user when called
-        mock_user = MagicMock(spec=UsersTable)
-        mock_user.user_id = "u1"
-        mock_get.return_value = mock_user
-
-        # Simulate DB error when calling delete_instance()
-        mock_user.delete_instance.side_effect = DatabaseError("DB error")
-
+    generate_test_user()
+    # Mock the delete to force a DatabaseError
+    with patch("users.UsersTable.delete") as mock_delete:
+        mock_delete.return_value.where.return_value.execute.side_effect = DatabaseError(
+            "DB error"
+        )
         with patch("users.logger.error"):
             # Call the delete_user method and assert it returns False due to DB error
             result = user_collection.delete_user("u1")
@@ -160,3 +175,99 @@ def test_search_user(should_find_user, user_collection):
             assert result.user_last_name == "Lname"
         else:
             assert result.user_id is None
+
+
+def test_search_user_uses_cache():
+    cache = LRUCache()
+    cached_collection = UserCollection(cache)
+    generate_test_user()
+    with patch("users.UsersTable.select", wraps=UsersTable.select) as mock_select:
+        first = cached_collection.search_user("u1", False)
+        second = cached_collection.search_user("u1", False)
+        assert mock_select.call_count == 1
+    assert first is second
+    assert cache.stats()["hits"] == 1
+
+
+def test_search_user_does_not_cache_a_read_overtaken_by_a_write():
+    cached_collection = UserCollection(LRUCache())
+    generate_test_user()
+
+    def read_then_update(*row):
+        # The update commits after the row was read but before it is cached
+        with patch("users.logger.info"):
+            cached_collection.modify_user("u1", "new@test.com", "F", "L")
+        return Users(*row)
+
+    with patch("users.Users", side_effect=read_then_update):
+        assert cached_collection.search_user("u1", False).user_email == (
+            "email@test.com"
+        )
+    assert cached_collection.search_user("u1", False).user_email == "new@test.com"
+
+
+def test_cache_invalidated_by_writes():
+    cached_collection = UserCollection(LRUCache())
+    # A cached miss is dropped once the user is added
+    assert cached_collection.search_user("u1", False).user_id is None
+    assert cached_collection.add_user("u1", "e@test.com", "First", "Last")
+    assert cached_collection.search_user("u1", False).user_id == "u1"
+
+    with patch("users.logger.info"):
+        cached_collection.modify_user("u1", "new@test.com", "First", "Last")
+        assert cached_collection.search_user("u1", False).user_email == "new@test.com"
+
+        cached_collection.delete_user("u1")
+        assert cached_collection.search_user("u1", False).user_id is None
+
+    assert cached_collection.search_user("u2", False).user_id is None
+    cached_collection.bulk_add_users([("u2", "e@test.com", "N", "L")])
+    assert cached_collection.search_user("u2", False).user_id == "u2"
+
+
+def test_batch_methods_return_per_item_results(user_collection):
+    with patch("users.logger.info"), patch("users.logger.error"):
+        assert user_collection.add_users(
+            [("u1", "a@test.com", "A", "B"), ("u1", "c@test.com", "C", "D")]
+        ) == [True, False]
+        assert user_collection.modify_users(
+            [("u1", "new@test.com", "N", "M"), ("u2", "x@test.com", "X", "Y")]
+        ) == [True, False]
+        assert user_collection.delete_users(["u2", "u1"]) == [False, True]
+    assert UsersTable.select().count() == 0
+
+
+def test_existing_user_ids_queries_in_chunks(user_collection):
+    user_collection.bulk_add_users(
+        [(f"u{i}", "e@test.com", "N", "L") for i in range(5)]
+    )
+    with patch("users.SQLITE_MAX_VARIABLES", 2):
+        existing = user_collection.existing_user_ids(["u0", "u4", "u9", "u0", "u2"])
+    assert existing == {"u0", "u2", "u4"}
+
+
+def test_iter_users_streams_slotted_records(user_collection):
+    user_collection.bulk_add_users(
+        [(f"u{i}", "e@test.com", "N", "L") for i in (2, 0, 1)]
+    )
+    users = list(user_collection.iter_users())
+    assert [user.user_id for user in users] == ["u0", "u1", "u2"]
+    assert not hasattr(users[0], "__dict__")
+
+
+def test_batch_failures_are_sampled_and_summarized(user_collection):
+    generate_test_user()
+    users = [("u1", "email@test.com", "First", "Last")] * 30
+    with patch("users.logger.error") as mock_error, patch(
+        "log_helper.logger.info"
+    ) as mock_info:
+        results = user_collection.add_users(users)
+    assert results == [False] * 30
+    assert mock_error.call_count == 10
+    mock_info.assert_called_once_with(
+        "{}: {} '{}' events, {} logged.",
+        "UserCollection.add_users",
+        30,
+        "duplicate_user",
+        10,
+    )
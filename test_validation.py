@@ -0,0 +1,57 @@
+"""
+Testing suite for the validation file
+"""
+
+from model_mapper import AccountFields, StatusFields
+from socialnetwork_model import UsersTable, UserStatusTable
+from validation import RowValidator
+
+USER_COLUMNS = {
+    AccountFields.USER_ID: UsersTable.user_id,
+    AccountFields.EMAIL: UsersTable.user_email,
+    AccountFields.USER_NAME: UsersTable.user_name,
+    AccountFields.USER_LAST_NAME: UsersTable.user_last_name,
+}
+STATUS_COLUMNS = {
+    StatusFields.STATUS_ID: UserStatusTable.status_id,
+    StatusFields.USER_ID: UserStatusTable.user_id,
+    StatusFields.STATUS_TEXT: UserStatusTable.status_text,
+}
+
+
+def user_validator():
+    return RowValidator(AccountFields, USER_COLUMNS, email_fields=[AccountFields.EMAIL])
+
+
+def test_max_lengths_come_from_the_model():
+    validator = RowValidator(StatusFields, STATUS_COLUMNS)
+    # The foreign key takes the length of UsersTable.user_id
+    assert validator.max_lengths == [255, 30, 1000]
+
+
+def test_clean_batch_is_returned_as_is():
+    batch = [("u1", "a@test.com", "A", "L"), ("u2", "b@mail.example.org", "B", "L")]
+    valid, invalid = user_validator().validate(batch)
+    assert valid is batch
+    assert not invalid
+
+
+def test_invalid_rows_are_reported_with_every_reason():
+    batch = [
+        ("u1", "a@test.com", "A", "L"),
+        ("u2", "", "B", None),
+        ("u3" * 20, "a@b", "C", "L"),
+        ("u4", "a b@test.com", "D" * 31, "L"),
+        ("u5", "c@test.com", "E", "L"),
+    ]
+    valid, invalid = user_validator().validate(batch)
+    assert valid == [batch[0], batch[4]]
+    assert invalid == [
+        (batch[1], "missing email; missing lastname"),
+        (batch[2], "user_id longer than 30 characters; invalid email"),
+        (batch[3], "invalid email; name longer than 30 characters"),
+    ]
+
+
+def test_empty_batch():
+    assert user_validator().validate([]) == ([], [])
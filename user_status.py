@@ -3,108 +3,374 @@ Classes to manage the user status messages
 """
 
 # Disabling some noisy linting for peewee UserStatusTable references
-# pylint: disable=E1120
+# pylint: disable=E1101, E1120, W0212
 
-from peewee import DatabaseError, DoesNotExist
+from datetime import datetime
+from typing import Iterable, Iterator
 
-from log_helper import logger
+from peewee import (
+    EXCLUDED,
+    DatabaseError,
+    DoesNotExist,
+    IntegrityError,
+    Tuple,
+    chunked,
+)
+
+from cache import MISSING, LRUCache
+from database_manager import SQLITE_MAX_VARIABLES
+from database_utils import STATUS_SEARCH_TABLE, is_unique_violation
+from instrumentation import any_failed, count_rows, timed
+from log_helper import LogSampler, logger, sample
 from socialnetwork_model import UserStatusTable
 
+# Number of statuses returned per page when listing a user's statuses
+PAGE_SIZE = 20
+
+# Number of statuses returned by a full-text search unless a limit is given
+SEARCH_LIMIT = 20
+
+# Column order used by the bulk insert path, matches the add_status argument order
+BULK_FIELDS = [
+    UserStatusTable.status_id,
+    UserStatusTable.user_id,
+    UserStatusTable.status_text,
+]
+# Bound parameters per row of a bulk insert, created_at is filled from its default
+BULK_PARAMETERS = len(BULK_FIELDS) + 1
+
+# Columns fetched for a timeline, created_at is part of the next page's cursor
+TIMELINE_FIELDS = [*BULK_FIELDS, UserStatusTable.created_at]
+
 
 class UserStatus:
     """
     Class to hold status message data
+    Slotted like Users
     """
 
-    def __init__(self, status_id, user_id, status_text):
+    __slots__ = ("status_id", "user_id", "status_text", "created_at")
+
+    def __init__(self, status_id, user_id, status_text, created_at=None):
         self.status_id = status_id
         self.user_id = user_id
         self.status_text = status_text
+        # Only filled by timeline queries
+        self.created_at = created_at
 
 
 class UserStatusCollection:
     """
     Collection of UserStatus messages
+    Pass an LRUCache to cache search_status results, including statuses that do not exist
     """
 
-    def __init__(self):
+    def __init__(self, cache: LRUCache | None = None):
         self.database = {}
+        self.cache = cache
 
+    def _invalidate(self, status_id: str):
+        """
+        Drops the cached entry made stale by a write to status_id
+        """
+        if self.cache is not None:
+            self.cache.invalidate(status_id)
+
+    @timed("UserStatusCollection.add_status")
     def add_status(self, status_id: str, user_id: str, status_text: str) -> bool:
         """
         Add a new status message to the collection
+        A single INSERT, an existing status_id is reported by the primary key conflict
         """
-        # Lookup status and fail if status already exists
-        lookup = self.search_status(status_id, False)
-        if lookup.status_id:
-            logger.error(f"Add status failed: status_id '{status_id}' already exists.")
-            return False
-
         try:
             UserStatusTable.insert(
                 status_id=status_id, status_text=status_text, user_id=user_id
             ).execute()
+            self._invalidate(status_id)
             return True
+        except IntegrityError as e:
+            if is_unique_violation(e):
+                if sample("duplicate_status"):
+                    logger.error(
+                        "Add status failed: status_id '{}' already exists.", status_id
+                    )
+            elif sample("save_failed"):
+                logger.error("Failed to save status '{}': {}", status_id, e)
+            return False
         except DatabaseError as e:
-            logger.error(f"Failed to save status '{status_id}': {e}")
+            if sample("save_failed"):
+                logger.error("Failed to save status '{}': {}", status_id, e)
             return False
 
+    @timed("UserStatusCollection.add_statuses", failed=any_failed)
+    def add_statuses(self, statuses: Iterable[tuple[str, str, str]]) -> list[bool]:
+        """
+        Adds (status_id, user_id, status_text) tuples in one transaction
+        Returns one result per status, in order
+        """
+        with LogSampler("UserStatusCollection.add_statuses"):
+            with UserStatusTable._meta.database.atomic():
+                return [self.add_status(*status) for status in statuses]
+
+    @timed("UserStatusCollection.bulk_add_statuses", rows=count_rows)
+    def bulk_add_statuses(self, statuses: Iterable[tuple[str, str, str]]) -> int:
+        """
+        Adds many status messages with multi-row inserts
+        Each status is a (status_id, user_id, status_text) tuple
+        Statuses whose status_id already exists are ignored
+        New statuses are stamped with created_at as they are inserted
+        Returns the number of statuses actually inserted
+        """
+        inserted = 0
+        # Fill each statement up to SQLite's bound parameter limit
+        for chunk in chunked(statuses, SQLITE_MAX_VARIABLES // BULK_PARAMETERS):
+            inserted += (
+                UserStatusTable.insert_many(chunk, fields=BULK_FIELDS)
+                .on_conflict_ignore()
+                .as_rowcount()
+                .execute()
+            )
+            # New statuses may have been cached as not found
+            if self.cache is not None:
+                for status in chunk:
+                    self.cache.invalidate(status[0])
+        return inserted
+
+    @timed("UserStatusCollection.bulk_upsert_statuses", rows=count_rows)
+    def bulk_upsert_statuses(
+        self, statuses: Iterable[tuple[str, str, str, str]]
+    ) -> int:
+        """
+        Inserts or updates many status messages with multi-row upserts
+        Each status is a (status_id, user_id, status_text, content_hash) tuple
+        Like modify_status, an existing status never moves to another user: a
+        status_id already owned by a different user is left unchanged
+        Returns the number of statuses inserted or updated
+        """
+        fields = [*BULK_FIELDS, UserStatusTable.content_hash]
+        written = 0
+        # An update keeps the created_at of the existing status
+        for chunk in chunked(statuses, SQLITE_MAX_VARIABLES // (BULK_PARAMETERS + 1)):
+            written += (
+                UserStatusTable.insert_many(chunk, fields=fields)
+                .on_conflict(
+                    conflict_target=[UserStatusTable.status_id],
+                    preserve=[
+                        UserStatusTable.status_text,
+                        UserStatusTable.content_hash,
+                    ],
+                    where=(UserStatusTable.user_id == EXCLUDED.user_id),
+                )
+                .as_rowcount()
+                .execute()
+            )
+            if self.cache is not None:
+                for status in chunk:
+                    self.cache.invalidate(status[0])
+        return written
+
+    @timed("UserStatusCollection.modify_status")
     def modify_status(self, status_id: str, status_text: str) -> bool:
         """
         Modifies a status message
         Do not allow statuses to move between users
+        A single UPDATE, a missing status_id is reported by a rowcount of zero
         """
-        # Lookup status and fail if no user is found
-        lookup = self.search_status(status_id, False)
-        if not lookup.status_id:
-            logger.error(
-                f"Modify status failed: status_id '{status_id}' does not exist."
+        try:
+            updated = (
+                # The row no longer matches what the last delta import wrote
+                UserStatusTable.update(status_text=status_text, content_hash=None)
+                .where(UserStatusTable.status_id == status_id)
+                .execute()
             )
+        except DatabaseError as e:
+            if sample("update_failed"):
+                logger.error("Failed to update status '{}': {}", status_id, e)
             return False
 
-        try:
-            UserStatusTable.update(status_text=status_text).where(
-                UserStatusTable.status_id == status_id
-            ).execute()
-            logger.info(f"Status '{status_id}' modified successfully.")
-            return True
-        except DatabaseError as e:
-            logger.error(f"Failed to update status '{status_id}': {e}")
+        if not updated:
+            if sample("missing_status"):
+                logger.error(
+                    "Modify status failed: status_id '{}' does not exist.", status_id
+                )
             return False
+        self._invalidate(status_id)
+        if sample("status_modified"):
+            logger.info("Status '{}' modified successfully.", status_id)
+        return True
+
+    @timed("UserStatusCollection.modify_statuses", failed=any_failed)
+    def modify_statuses(self, statuses: Iterable[tuple[str, str]]) -> list[bool]:
+        """
+        Modifies (status_id, status_text) tuples in one transaction
+        Returns one result per status, in order
+        """
+        with LogSampler("UserStatusCollection.modify_statuses"):
+            with UserStatusTable._meta.database.atomic():
+                return [self.modify_status(*status) for status in statuses]
 
+    @timed("UserStatusCollection.delete_status")
     def delete_status(self, status_id: str) -> bool:
         """
         Deletes a status message
+        A single DELETE, a missing status_id is reported by a rowcount of zero
         """
-        # Lookup status and fail if no user is found
-        lookup = self.search_status(status_id, False)
-        if not lookup.status_id:
-            logger.error(
-                f"Delete status failed: status_id '{status_id}' does not exist."
+        try:
+            deleted = (
+                UserStatusTable.delete()
+                .where(UserStatusTable.status_id == status_id)
+                .execute()
             )
+        except DatabaseError as e:
+            if sample("delete_failed"):
+                logger.error("Failed to delete status '{}': {}", status_id, e)
             return False
 
-        try:
-            UserStatusTable.get(
-                UserStatusTable.status_id == status_id
-            ).delete_instance()
-            logger.info(f"User '{status_id}' deleted successfully.")
-            return True
-        except DatabaseError as e:
-            logger.error(f"Failed to delete user '{status_id}': {e}")
+        if not deleted:
+            if sample("missing_status"):
+                logger.error(
+                    "Delete status failed: status_id '{}' does not exist.", status_id
+                )
             return False
+        self._invalidate(status_id)
+        if sample("status_deleted"):
+            logger.info("Status '{}' deleted successfully.", status_id)
+        return True
 
+    @timed("UserStatusCollection.delete_statuses", failed=any_failed)
+    def delete_statuses(self, status_ids: Iterable[str]) -> list[bool]:
+        """
+        Deletes statuses in one transaction
+        Returns one result per status_id, in order
+        """
+        with LogSampler("UserStatusCollection.delete_statuses"):
+            with UserStatusTable._meta.database.atomic():
+                return [self.delete_status(status_id) for status_id in status_ids]
+
+    @timed("UserStatusCollection.search_status")
     def search_status(self, status_id: str, log: bool) -> UserStatus:
         """
         Find and return a status message by its status_id
         Returns an empty UserStatus object if status_id does not exist
         """
+        status = self.cache.get(status_id) if self.cache is not None else MISSING
+        if status is MISSING:
+            # Taken before the read, so a write that lands meanwhile voids the put
+            generation = (
+                self.cache.generation(status_id) if self.cache is not None else None
+            )
+            owner = None
+            try:
+                # Fetch a plain tuple instead of building a model instance to copy from
+                row = (
+                    UserStatusTable.select(*BULK_FIELDS)
+                    .where(UserStatusTable.status_id == status_id)
+                    .tuples()
+                    .get()
+                )
+                status = UserStatus(*row)
+                # Used to drop the entry when its user is deleted
+                owner = status.user_id
+            except DoesNotExist:
+                status = UserStatus(None, None, None)
+            if self.cache is not None:
+                self.cache.put(status_id, status, tag=owner, generation=generation)
+
+        if log:
+            found = "found" if status.status_id else "not found"
+            logger.info(f"Search status: status_id '{status_id}' {found}.")
+        return status
+
+    @timed("UserStatusCollection.search_statuses")
+    def search_statuses(
+        self, query: str, limit: int = SEARCH_LIMIT
+    ) -> list[UserStatus]:
+        """
+        Finds statuses whose text matches an FTS5 query, best matches first
+        Plain words match statuses containing all of them; FTS5 syntax such as
+        "exact phrase", OR and prefix* is supported
+        Returns an empty list if the query is invalid
+        """
+        table = UserStatusTable._meta.table_name
         try:
-            result = UserStatusTable.get(UserStatusTable.status_id == status_id)
-            if log:
-                logger.info(f"Search status: status_id '{status_id}' found.")
-            return UserStatus(result.status_id, result.user_id, result.status_text)
-        except DoesNotExist:
-            if log:
-                logger.info(f"Search status: status_id '{status_id}' not found.")
-            return UserStatus(None, None, None)
+            cursor = UserStatusTable._meta.database.execute_sql(
+                f"SELECT s.status_id, s.user_id, s.status_text "
+                f"FROM {STATUS_SEARCH_TABLE} "
+                f"JOIN {table} AS s ON s.rowid = {STATUS_SEARCH_TABLE}.rowid "
+                f"WHERE {STATUS_SEARCH_TABLE} MATCH ? ORDER BY rank LIMIT ?",
+                (query, limit),
+            )
+            rows = cursor.fetchall()
+        except DatabaseError as e:
+            logger.error(f"Search statuses failed for '{query}': {e}")
+            return []
+        return [UserStatus(*row) for row in rows]
+
+    @timed("UserStatusCollection.get_user_statuses")
+    def get_user_statuses(
+        self, user_id: str, after: str | None = None, limit: int = PAGE_SIZE
+    ) -> list[UserStatus]:
+        """
+        Returns up to limit statuses of a user ordered by status_id
+        Pass the last status_id of the previous page as after to get the next page
+        Uses keyset pagination on the (user_id, status_id) index, so every page
+        costs the same no matter how far into the user's statuses it is
+        """
+        query = UserStatusTable.select(*BULK_FIELDS).where(
+            UserStatusTable.user_id == user_id
+        )
+        if after is not None:
+            query = query.where(UserStatusTable.status_id > after)
+        query = query.order_by(UserStatusTable.status_id).limit(limit)
+        return [UserStatus(*row) for row in query.tuples()]
+
+    def iter_user_statuses(
+        self, user_id: str, page_size: int = PAGE_SIZE
+    ) -> Iterator[UserStatus]:
+        """
+        Streams every status of a user, fetching page_size statuses at a time
+        """
+        after = None
+        while True:
+            page = self.get_user_statuses(user_id, after, page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            after = page[-1].status_id
+
+    @timed("UserStatusCollection.get_user_timeline")
+    def get_user_timeline(
+        self,
+        user_id: str,
+        before: tuple[datetime, str] | None = None,
+        limit: int = PAGE_SIZE,
+    ) -> list[UserStatus]:
+        """
+        Returns up to limit statuses of a user, newest first
+        Pass the (created_at, status_id) of the last status of the previous page as
+        before to get the next, older page; statuses created at the same time are
+        ordered by status_id
+        Walks the (user_id, created_at, status_id) index backwards from the cursor,
+        so every page is a bounded index range with no sort
+        """
+        query = UserStatusTable.select(*TIMELINE_FIELDS).where(
+            UserStatusTable.user_id == user_id
+        )
+        if before is not None:
+            query = query.where(
+                Tuple(UserStatusTable.created_at, UserStatusTable.status_id)
+                < Tuple(*before)
+            )
+        query = query.order_by(
+            UserStatusTable.created_at.desc(), UserStatusTable.status_id.desc()
+        ).limit(limit)
+        return [UserStatus(*row) for row in query.tuples()]
+
+    def iter_statuses(self) -> Iterator[UserStatus]:
+        """
+        Streams every status ordered by status_id
+        Uses the same tuple fetch as iter_users
+        """
+        query = UserStatusTable.select(*BULK_FIELDS).order_by(UserStatusTable.status_id)
+        for row in query.tuples().iterator():
+            yield UserStatus(*row)
@@ -3,19 +3,39 @@ Classes for user information for the social network project
 """
 
 # Disabling some noisy linting for peewee UserTable references
-# pylint: disable=E1120
+# pylint: disable=E1101, E1120, W0212
 
-from peewee import DatabaseError, DoesNotExist
+from typing import Iterable, Iterator
 
-from log_helper import logger
-from socialnetwork_model import UsersTable
+from peewee import DatabaseError, DoesNotExist, IntegrityError, chunked
+
+from cache import MISSING, LRUCache
+from database_manager import SQLITE_MAX_VARIABLES
+from database_utils import is_unique_violation
+from instrumentation import any_failed, count_rows, timed
+from log_helper import LogSampler, logger, sample
+from socialnetwork_model import UsersTable, UserStatusTable
+
+# Number of statuses deleted per transaction when purging users
+DELETE_CHUNK_SIZE = 5000
+
+# Column order used by the bulk insert path, matches the add_user argument order
+BULK_FIELDS = [
+    UsersTable.user_id,
+    UsersTable.user_email,
+    UsersTable.user_name,
+    UsersTable.user_last_name,
+]
 
 
 class Users:
     """
     Contains user information
+    Slotted, so large result sets carry no per-instance __dict__
     """
 
+    __slots__ = ("user_id", "user_email", "user_name", "user_last_name")
+
     def __init__(self, user_id, email, user_name, user_last_name):
         self.user_id = user_id
         self.user_email = email
@@ -26,20 +46,34 @@ class Users:
 class UserCollection:
     """
     Contains a collection of Users objects
+    Pass an LRUCache to cache search_user results, including users that do not exist
+    Pass the status collection's cache as status_cache so deleting a user also drops
+    the cached statuses removed by the cascade
     """
 
+    def __init__(
+        self, cache: LRUCache | None = None, status_cache: LRUCache | None = None
+    ):
+        self.cache = cache
+        self.status_cache = status_cache
+
+    def _invalidate(self, user_id: str, deleted: bool = False):
+        """
+        Drops cached entries made stale by a write to user_id
+        """
+        if self.cache is not None:
+            self.cache.invalidate(user_id)
+        if deleted and self.status_cache is not None:
+            self.status_cache.invalidate_tag(user_id)
+
+    @timed("UserCollection.add_user")
     def add_user(
         self, user_id: str, email: str, user_name: str, user_last_name: str
     ) -> bool:
         """
         Adds a new user to the database
+        A single INSERT, an existing user_id is reported by the primary key conflict
         """
-        # Lookup user and fail if user already exists
-        lookup = self.search_user(user_id, False)
-        if lookup.user_id:
-            logger.error(f"Add user failed: user_id '{user_id}' already exists.")
-            return False
-
         try:
             UsersTable.insert(
                 user_email=email,
@@ -47,69 +81,248 @@ class UserCollection:
                 user_last_name=user_last_name,
                 user_name=user_name,
             ).execute()
+            self._invalidate(user_id)
             return True
+        except IntegrityError as e:
+            if is_unique_violation(e):
+                if sample("duplicate_user"):
+                    logger.error(
+                        "Add user failed: user_id '{}' already exists.", user_id
+                    )
+            elif sample("save_failed"):
+                logger.error("Failed to save user '{}': {}", user_id, e)
+            return False
         except DatabaseError as e:
-            logger.error(f"Failed to save user '{user_id}': {e}")
+            if sample("save_failed"):
+                logger.error("Failed to save user '{}': {}", user_id, e)
             return False
 
+    @timed("UserCollection.add_users", failed=any_failed)
+    def add_users(self, users: Iterable[tuple[str, str, str, str]]) -> list[bool]:
+        """
+        Adds (user_id, email, user_name, user_last_name) tuples in one transaction
+        Returns one result per user, in order
+        """
+        with LogSampler("UserCollection.add_users"):
+            with UsersTable._meta.database.atomic():
+                return [self.add_user(*user) for user in users]
+
+    @timed("UserCollection.bulk_add_users", rows=count_rows)
+    def bulk_add_users(self, users: Iterable[tuple[str, str, str, str]]) -> int:
+        """
+        Adds many users with multi-row inserts
+        Each user is a (user_id, email, user_name, user_last_name) tuple
+        Users whose user_id already exists are ignored
+        Returns the number of users actually inserted
+        """
+        inserted = 0
+        # Fill each statement up to SQLite's bound parameter limit
+        for chunk in chunked(users, SQLITE_MAX_VARIABLES // len(BULK_FIELDS)):
+            inserted += (
+                UsersTable.insert_many(chunk, fields=BULK_FIELDS)
+                .on_conflict_ignore()
+                .as_rowcount()
+                .execute()
+            )
+            # New users may have been cached as not found
+            if self.cache is not None:
+                for user in chunk:
+                    self.cache.invalidate(user[0])
+        return inserted
+
+    @timed("UserCollection.bulk_upsert_users", rows=count_rows)
+    def bulk_upsert_users(self, users: Iterable[tuple[str, str, str, str, str]]) -> int:
+        """
+        Inserts or updates many users with multi-row upserts
+        Each user is a (user_id, email, user_name, user_last_name, content_hash) tuple
+        Returns the number of users inserted or updated
+        """
+        fields = [*BULK_FIELDS, UsersTable.content_hash]
+        written = 0
+        for chunk in chunked(users, SQLITE_MAX_VARIABLES // len(fields)):
+            written += (
+                UsersTable.insert_many(chunk, fields=fields)
+                .on_conflict(conflict_target=[UsersTable.user_id], preserve=fields[1:])
+                .as_rowcount()
+                .execute()
+            )
+            if self.cache is not None:
+                for user in chunk:
+                    self.cache.invalidate(user[0])
+        return written
+
+    @timed("UserCollection.modify_user")
     def modify_user(
         self, user_id: str, email: str, user_name: str, user_last_name: str
     ) -> bool:
         """
         Modifies an existing user
+        A single UPDATE, a missing user_id is reported by a rowcount of zero
         """
-        # Lookup user and fail if no user is found
-        lookup = self.search_user(user_id, False)
-        if not lookup.user_id:
-            logger.error(f"Modify user failed: user_id '{user_id}' does not exist.")
-            return False
-
         try:
-            UsersTable.update(
-                user_email=email,
-                user_last_name=user_last_name,
-                user_name=user_name,
-            ).where(UsersTable.user_id == user_id).execute()
-            logger.info(f"User '{user_id}' modified successfully.")
-            return True
+            updated = (
+                UsersTable.update(
+                    user_email=email,
+                    user_last_name=user_last_name,
+                    user_name=user_name,
+                    # The row no longer matches what the last delta import wrote
+                    content_hash=None,
+                )
+                .where(UsersTable.user_id == user_id)
+                .execute()
+            )
         except DatabaseError as e:
-            logger.error(f"Failed to update user '{user_id}': {e}")
+            if sample("update_failed"):
+                logger.error("Failed to update user '{}': {}", user_id, e)
+            return False
+
+        if not updated:
+            if sample("missing_user"):
+                logger.error(
+                    "Modify user failed: user_id '{}' does not exist.", user_id
+                )
             return False
+        self._invalidate(user_id)
+        if sample("user_modified"):
+            logger.info("User '{}' modified successfully.", user_id)
+        return True
 
+    @timed("UserCollection.modify_users", failed=any_failed)
+    def modify_users(self, users: Iterable[tuple[str, str, str, str]]) -> list[bool]:
+        """
+        Modifies (user_id, email, user_name, user_last_name) tuples in one transaction
+        Returns one result per user, in order
+        """
+        with LogSampler("UserCollection.modify_users"):
+            with UsersTable._meta.database.atomic():
+                return [self.modify_user(*user) for user in users]
+
+    @timed("UserCollection.delete_user")
     def delete_user(self, user_id: str) -> bool:
         """
         Deletes an existing user
+        A single DELETE, a missing user_id is reported by a rowcount of zero
         """
-        # Lookup user and fail if no user is found
-        lookup = self.search_user(user_id, False)
-        if not lookup.user_id:
-            logger.error(f"Delete user failed: user_id '{user_id}' does not exist.")
-            return False
-
         try:
-            UsersTable.get(UsersTable.user_id == user_id).delete_instance()
-            logger.info(f"User '{user_id}' deleted successfully.")
-            return True
+            deleted = UsersTable.delete().where(UsersTable.user_id == user_id).execute()
         except DatabaseError as e:
-            logger.error(f"Failed to delete user '{user_id}': {e}")
+            if sample("delete_failed"):
+                logger.error("Failed to delete user '{}': {}", user_id, e)
+            return False
+
+        if not deleted:
+            if sample("missing_user"):
+                logger.error(
+                    "Delete user failed: user_id '{}' does not exist.", user_id
+                )
             return False
+        self._invalidate(user_id, deleted=True)
+        if sample("user_deleted"):
+            logger.info("User '{}' deleted successfully.", user_id)
+        return True
+
+    @timed("UserCollection.delete_users", failed=any_failed)
+    def delete_users(self, user_ids: Iterable[str]) -> list[bool]:
+        """
+        Deletes users in one transaction
+        Returns one result per user_id, in order
+        """
+        with LogSampler("UserCollection.delete_users"):
+            with UsersTable._meta.database.atomic():
+                return [self.delete_user(user_id) for user_id in user_ids]
 
+    @timed("UserCollection.purge_users", rows=count_rows)
+    def purge_users(
+        self, user_ids: Iterable[str], chunk_size: int = DELETE_CHUNK_SIZE
+    ) -> tuple[int, int]:
+        """
+        Deletes users together with all of their statuses
+        Statuses are deleted chunk_size rows per transaction before the user row,
+        so the write lock is released between chunks instead of being held for
+        one cascade over every status of a heavy poster
+        Returns (users_deleted, statuses_deleted)
+        """
+        database = UsersTable._meta.database
+        users_deleted = 0
+        statuses_deleted = 0
+        for user_id in user_ids:
+            while True:
+                with database.atomic():
+                    chunk = (
+                        UserStatusTable.select(UserStatusTable.status_id)
+                        .where(UserStatusTable.user_id == user_id)
+                        .limit(chunk_size)
+                    )
+                    deleted = (
+                        UserStatusTable.delete()
+                        .where(UserStatusTable.status_id.in_(chunk))
+                        .execute()
+                    )
+                statuses_deleted += deleted
+                if deleted < chunk_size:
+                    break
+
+            with database.atomic():
+                users_deleted += (
+                    UsersTable.delete().where(UsersTable.user_id == user_id).execute()
+                )
+            self._invalidate(user_id, deleted=True)
+
+        logger.info(
+            f"Purged {users_deleted} users and {statuses_deleted} of their statuses."
+        )
+        return users_deleted, statuses_deleted
+
+    @timed("UserCollection.search_user")
     def search_user(self, user_id: str, log: bool) -> Users:
         """
         Searches for a user
         Returns an empty Users object if user_id does not exist
         """
-        try:
-            result = UsersTable.get(UsersTable.user_id == user_id)
-            if log:
-                logger.info(f"Search user: user_id '{user_id}' found.")
-            return Users(
-                result.user_id,
-                result.user_email,
-                result.user_name,
-                result.user_last_name,
+        user = self.cache.get(user_id) if self.cache is not None else MISSING
+        if user is MISSING:
+            # Taken before the read, so a write that lands meanwhile voids the put
+            generation = (
+                self.cache.generation(user_id) if self.cache is not None else None
+            )
+            try:
+                # Fetch a plain tuple instead of building a model instance to copy from
+                row = (
+                    UsersTable.select(*BULK_FIELDS)
+                    .where(UsersTable.user_id == user_id)
+                    .tuples()
+                    .get()
+                )
+                user = Users(*row)
+            except DoesNotExist:
+                user = Users(None, None, None, None)
+            if self.cache is not None:
+                self.cache.put(user_id, user, generation=generation)
+
+        if log:
+            found = "found" if user.user_id else "not found"
+            logger.info(f"Search user: user_id '{user_id}' {found}.")
+        return user
+
+    def existing_user_ids(self, user_ids: Iterable[str]) -> set[str]:
+        """
+        Returns the user_ids among user_ids that exist, with one
+        WHERE user_id IN (...) query per SQLITE_MAX_VARIABLES ids
+        """
+        existing = set()
+        for chunk in chunked(set(user_ids), SQLITE_MAX_VARIABLES):
+            query = UsersTable.select(UsersTable.user_id).where(
+                UsersTable.user_id.in_(chunk)
             )
-        except DoesNotExist:
-            if log:
-                logger.info(f"Search user: user_id '{user_id}' not found.")
-            return Users(None, None, None, None)
+            existing.update(user_id for (user_id,) in query.tuples())
+        return existing
+
+    def iter_users(self) -> Iterator[Users]:
+        """
+        Streams every user ordered by user_id
+        Rows are read as tuples straight from the cursor, so no model instances are
+        built and the result set is never held in memory at once
+        """
+        query = UsersTable.select(*BULK_FIELDS).order_by(UsersTable.user_id)
+        for row in query.tuples().iterator():
+            yield Users(*row)